@@ -1,7 +1,78 @@
+import logging
+import threading
+import time
+from typing import Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DecayingHeavyHitters:
+    """
+    Approximate top-k counter (Space-Saving) with exponential decay.
+
+    Keeps at most `capacity` keys. Counts halve every `half_life` seconds, so
+    keys that were hot a while ago fade out and make room for new ones.
+    """
+
+    def __init__(self, capacity: int = 256, half_life: float = 3600):
+        self.capacity = capacity
+        self.half_life = half_life
+        self._counts: Dict[Hashable, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _decayed(self, count: float, updated_at: float, now: float) -> float:
+        return count * 0.5 ** ((now - updated_at) / self.half_life)
+
+    def add(self, key: Hashable, weight: float = 1.0, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if key in self._counts:
+                count, updated_at = self._counts[key]
+                count = self._decayed(count, updated_at, now)
+            elif len(self._counts) < self.capacity:
+                count = 0.0
+            else:
+                # Replace the smallest key; the newcomer inherits its count
+                victim = min(
+                    self._counts,
+                    key=lambda k: self._decayed(*self._counts[k], now),
+                )
+                count = self._decayed(*self._counts.pop(victim), now)
+            self._counts[key] = (count + weight, now)
+
+    def top(self, n: int, now: Optional[float] = None) -> List[Tuple[Hashable, float]]:
+        """The n keys with the highest decayed count"""
+        now = time.time() if now is None else now
+        with self._lock:
+            items = [
+                (key, self._decayed(count, updated_at, now))
+                for key, (count, updated_at) in self._counts.items()
+            ]
+        items.sort(key=lambda item: -item[1])
+        return items[:n]
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
 class AIPathfinder:
-    def __init__(self):
-        self.path_history = []
-        
+    def __init__(self, capacity: int = 256, half_life: float = 3600):
+        # Aggregated query statistics instead of an unbounded history
+        self.pair_stats = DecayingHeavyHitters(capacity, half_life)
+        self.node_stats = DecayingHeavyHitters(capacity, half_life)
+        # Shortest-path trees for the hottest sources: source -> (version, distances, previous)
+        self.trees: Dict[str, Tuple[int, Dict[str, float], Dict[str, Optional[str]]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def record_query(
+        self, start: str, end: str, waypoints: Optional[List[str]] = None
+    ):
+        """Count a route query towards the hot pairs and hot nodes"""
+        self.pair_stats.add((start, end))
+        for node in [start, end] + (waypoints or []):
+            self.node_stats.add(node)
+
     def suggest_path(self, start: str, end: str) -> str:
         """
         A simple AI component that could be enhanced with machine learning.
@@ -9,12 +80,120 @@ class AIPathfinder:
         """
         # This is a placeholder for more sophisticated AI logic
         # You could integrate machine learning models here
-        
+
         suggestion = (
             f"Consider exploring multiple paths from {start} to {end}. "
             "Look for paths with fewer hops if time is critical, "
             "or paths with lower total weight if efficiency is important."
         )
-        
-        self.path_history.append((start, end))
-        return suggestion 
\ No newline at end of file
+
+        self.record_query(start, end)
+        return suggestion
+
+    def hot_sources(self, n: int) -> List[str]:
+        """Sources of the hottest queries, weighted by how often they are queried"""
+        weights: Dict[str, float] = {}
+        for (start, _), count in self.pair_stats.top(len(self.pair_stats)):
+            weights[start] = weights.get(start, 0) + count
+        return sorted(weights, key=lambda node: -weights[node])[:n]
+
+    def lookup(self, dijkstra, start: str, end: str) -> Optional[Tuple[List[str], float]]:
+        """Answer a query from a precomputed tree, if one is there and still current"""
+        entry = self.trees.get(start)
+        if entry is None or entry[0] != dijkstra.version:
+            self.misses += 1
+            return None
+        self.hits += 1
+        _, distances, previous = entry
+        return dijkstra.path_from_tree(distances, previous, end)
+
+    def revalidate_trees(
+        self,
+        updates: List[Tuple[str, str, float]],
+        old_version: int,
+        new_version: int,
+    ) -> Tuple[int, int]:
+        """
+        Keep the precomputed trees that edge weight updates can't have changed
+        and drop the rest. A tree is unaffected by a new weight on edge u-v if
+        u-v is not one of its tree edges and doesn't offer a shorter path to
+        u or v. Returns (kept, dropped).
+        """
+        kept = {}
+        dropped = 0
+        for source, (version, distances, previous) in self.trees.items():
+            if version == old_version and not self._tree_affected(
+                distances, previous, updates
+            ):
+                kept[source] = (new_version, distances, previous)
+            else:
+                dropped += 1
+        self.trees = kept
+        return len(kept), dropped
+
+    def _tree_affected(
+        self,
+        distances: Dict[str, float],
+        previous: Dict[str, Optional[str]],
+        updates: List[Tuple[str, str, float]],
+    ) -> bool:
+        inf = float("inf")
+        for u, v, weight in updates:
+            if previous.get(v) == u or previous.get(u) == v:
+                return True
+            du = distances.get(u, inf)
+            dv = distances.get(v, inf)
+            if du + weight < dv or dv + weight < du:
+                return True
+        return False
+
+    def precompute(self, routing_service, top_sources: int = 10, top_pairs: int = 20):
+        """
+        Build shortest-path trees for the hottest sources and warm the OSRM
+        route cache for the hottest pairs. Meant to run in the background.
+        """
+        dijkstra = routing_service.dijkstra
+        version = dijkstra.version
+        trees = {}
+        for source in self.hot_sources(top_sources):
+            if source not in dijkstra.graph:
+                continue
+            entry = self.trees.get(source)
+            if entry is not None and entry[0] == version:
+                trees[source] = entry
+                continue
+            distances, previous = dijkstra.shortest_path_tree(source)
+            trees[source] = (version, distances, previous)
+        # Swap in one assignment so lookups never see a half-updated dict
+        self.trees = trees
+
+        warmed = 0
+        for (start, end), _ in self.pair_stats.top(top_pairs):
+            if start not in dijkstra.graph or end not in dijkstra.graph:
+                continue
+            if start in trees:
+                _, distances, previous = trees[start]
+                path = dijkstra.path_from_tree(distances, previous, end)
+            else:
+                path = dijkstra.find_shortest_path(start, end)
+            if path[0]:
+                try:
+                    routing_service.build_route(path[0])
+                    warmed += 1
+                except ValueError as e:
+                    logger.warning("Error warming route %s -> %s: %s", start, end, e)
+        return {"trees": len(trees), "routes_warmed": warmed}
+
+    def get_stats(self, n: int = 10) -> Dict:
+        return {
+            "hot_pairs": [
+                {"start": start, "end": end, "count": count}
+                for (start, end), count in self.pair_stats.top(n)
+            ],
+            "hot_nodes": [
+                {"node": node, "count": count} for node, count in self.node_stats.top(n)
+            ],
+            "precomputed_sources": list(self.trees),
+            "tree_hits": self.hits,
+            "tree_misses": self.misses,
+        }
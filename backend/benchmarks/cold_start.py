@@ -0,0 +1,98 @@
+"""
+Cold start benchmark: time to import main and time until /ready answers 200,
+each measured in a fresh interpreter, plus the slowest imports.
+
+Run from the backend directory, e.g.:
+
+    python -m benchmarks.cold_start --runs 5
+    STARTUP_MODE=background python -m benchmarks.cold_start
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+# Runs in the child interpreter; prints one JSON line
+CHILD = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.01)
+    ready = time.perf_counter()
+print(json.dumps({"import_s": imported - started, "ready_s": ready - started}))
+"""
+
+IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def child_env(db_path: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{db_path}")
+    env.setdefault("LLM_BACKEND", "stub")
+    env.setdefault("PRECOMPUTE_INTERVAL", "0")
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def slowest_imports(env: Dict[str, str], top: int) -> List[Dict]:
+    """Modules imported directly by main, by cumulative import time"""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    modules = []
+    for line in output.splitlines():
+        match = IMPORTTIME.match(line)
+        # main is at depth 1, what it imports at depth 2
+        if match and len(match.group(3)) == 3:
+            modules.append(
+                {"module": match.group(4), "cumulative_ms": int(match.group(2)) / 1000}
+            )
+    modules.sort(key=lambda module: -module["cumulative_ms"])
+    return modules[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = child_env(os.path.join(tmp, "cold_start.db"))
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, "-c", CHILD],
+                env=env,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+        imports = slowest_imports(env, args.top)
+
+    result = {
+        "startup_mode": env.get("STARTUP_MODE", "blocking"),
+        "runs": args.runs,
+        "import_ms_median": statistics.median(r["import_s"] for r in runs) * 1000,
+        "ready_ms_median": statistics.median(r["ready_s"] for r in runs) * 1000,
+        "slowest_imports": imports,
+    }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
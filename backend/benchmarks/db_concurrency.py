@@ -0,0 +1,154 @@
+"""
+Database read throughput under parallel clients: /nodes/, /edges/ and
+/export/ against a real uvicorn server, while a probe measures how long
+/ready (which never touches the database) takes to answer, i.e. whether
+the event loop stays free.
+
+Run from the backend directory, e.g.:
+
+    python -m benchmarks.db_concurrency --nodes 5000 --clients 1,8,32
+    DATABASE_URL=postgresql://... DB_POOL_SIZE=10 python -m benchmarks.db_concurrency
+
+Without DATABASE_URL the server uses a temporary SQLite database.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+import requests
+
+from benchmarks.graph_generators import random_geometric_knn
+from benchmarks.run_benchmarks import percentiles
+from benchmarks.stub_osrm import start_stub_osrm
+
+ENDPOINTS = ["/nodes/", "/edges/", "/export/"]
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(env: Dict[str, str], port: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)]
+        + ["--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{url}/ready", timeout=1).status_code == 200:
+                return server
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Server did not become ready")
+
+
+def load(url: str, path: str, clients: int, duration: float) -> Dict:
+    """clients threads fetching path back to back, plus the /ready probe"""
+    samples: List[float] = []
+    probes: List[float] = []
+    failures = [0]
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def client():
+        session = requests.Session()
+        while not stop.is_set():
+            started = time.perf_counter()
+            response = session.get(url + path)
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples.append(elapsed)
+                failures[0] += response.status_code != 200
+
+    def probe():
+        session = requests.Session()
+        while not stop.is_set():
+            started = time.perf_counter()
+            session.get(url + "/ready")
+            probes.append(time.perf_counter() - started)
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    threads.append(threading.Thread(target=probe))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "clients": clients,
+        "requests_per_s": len(samples) / elapsed,
+        "latency": percentiles(samples),
+        "non_200": failures[0],
+        "ready_probe": percentiles(probes),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--nodes", type=int, default=5000)
+    parser.add_argument("--clients", default="1,8,32")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    args = parser.parse_args(argv)
+
+    osrm_server, osrm_url = start_stub_osrm()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.setdefault("DATABASE_URL", f"sqlite:///{tmp}/db_concurrency.db")
+        env.setdefault("LLM_BACKEND", "stub")
+        env.setdefault("PRECOMPUTE_INTERVAL", "0")
+        env.setdefault("LOG_LEVEL", "WARNING")
+        env["OSRM_BASE_URL"] = osrm_url
+        port = free_port()
+        server = start_server(env, port)
+        url = f"http://127.0.0.1:{port}"
+        try:
+            nodes, _ = random_geometric_knn(args.nodes)
+            requests.post(
+                f"{url}/import/json/", json={"nodes": nodes}
+            ).raise_for_status()
+            results = {
+                "database": env["DATABASE_URL"].split(":", 1)[0],
+                "nodes": args.nodes,
+                "edges": len(requests.get(f"{url}/edges/").json()),
+                "endpoints": {},
+            }
+            for path in args.endpoints.split(","):
+                results["endpoints"][path] = [
+                    load(url, path, int(clients), args.duration)
+                    for clients in args.clients.split(",")
+                ]
+            results["database_pool"] = (
+                requests.get(f"{url}/executor-metrics/").json().get("database_pool")
+            )
+        finally:
+            server.terminate()
+            server.wait()
+            osrm_server.shutdown()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Synthetic graphs for benchmarks, in the same shape as the JSON import format:
+nodes {name: [lat, lon]} and edges [(source, target, weight_km)].
+"""
+import json
+import math
+import os
+import random
+from collections import namedtuple
+from typing import Dict, List, Tuple
+
+from dijkstra import DijkstraAlgorithm
+from graph_builder import find_k_nearest_neighbors
+
+GraphData = Tuple[Dict[str, List[float]], List[Tuple[str, str, float]]]
+
+# Stand-in for database.Node, enough for find_k_nearest_neighbors
+SimpleNode = namedtuple("SimpleNode", ["id", "name", "latitude", "longitude"])
+
+# Roughly the bounding box of Romania
+ROMANIA_BBOX = (43.6, 20.3, 48.3, 29.7)
+
+ROMANIAN_DATASET = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "romanian_dataset.json",
+)
+
+
+def knn_edges(nodes: Dict[str, List[float]], k: int) -> List[Tuple[str, str, float]]:
+    """
+    Connect every node to its k nearest neighbors with find_k_nearest_neighbors,
+    the same logic the API uses. Candidates come from the surrounding grid
+    cells instead of the whole node list, so large graphs build in reasonable time.
+    """
+    simple = [
+        SimpleNode(i, name, lat, lon) for i, (name, (lat, lon)) in enumerate(nodes.items())
+    ]
+    if not simple:
+        return []
+
+    lats = [n.latitude for n in simple]
+    lons = [n.longitude for n in simple]
+    area = max(max(lats) - min(lats), 1e-9) * max(max(lons) - min(lons), 1e-9)
+    # Aim for a few times k nodes per cell
+    cell = math.sqrt(area * max(4 * k, 8) / len(simple))
+
+    cells: Dict[Tuple[int, int], List[SimpleNode]] = {}
+    for n in simple:
+        cells.setdefault((int(n.latitude // cell), int(n.longitude // cell)), []).append(n)
+
+    edges = []
+    for n in simple:
+        row, col = int(n.latitude // cell), int(n.longitude // cell)
+        radius = 1
+        while True:
+            candidates = [
+                other
+                for r in range(row - radius, row + radius + 1)
+                for c in range(col - radius, col + radius + 1)
+                for other in cells.get((r, c), ())
+            ]
+            if len(candidates) > k or len(candidates) >= len(simple):
+                break
+            radius += 1
+        for neighbor, distance in find_k_nearest_neighbors(n, candidates, k):
+            edges.append((n.name, neighbor.name, distance))
+    return edges
+
+
+def random_geometric_knn(n: int, k: int = 3, seed: int = 0, bbox=ROMANIA_BBOX) -> GraphData:
+    """n random points in bbox, each connected to its k nearest neighbors"""
+    rng = random.Random(seed)
+    min_lat, min_lon, max_lat, max_lon = bbox
+    nodes = {
+        f"node-{i}": [rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon)]
+        for i in range(n)
+    }
+    return nodes, knn_edges(nodes, k)
+
+
+def grid(rows: int, cols: int, spacing_deg: float = 0.05, origin=(44.0, 21.0)) -> GraphData:
+    """A rows x cols lattice with edges between horizontal and vertical neighbors"""
+    distance = DijkstraAlgorithm().calculate_distance
+    nodes = {
+        f"grid-{r}-{c}": [origin[0] + r * spacing_deg, origin[1] + c * spacing_deg]
+        for r in range(rows)
+        for c in range(cols)
+    }
+    edges = []
+    for r in range(rows):
+        for c in range(cols):
+            for dr, dc in ((0, 1), (1, 0)):
+                if r + dr < rows and c + dc < cols:
+                    a, b = f"grid-{r}-{c}", f"grid-{r + dr}-{c + dc}"
+                    edges.append((a, b, distance(*nodes[a], *nodes[b])))
+    return nodes, edges
+
+
+def scaled_romanian(factor: int, k: int = 3, seed: int = 0, jitter_deg: float = 0.3) -> GraphData:
+    """The Romanian dataset with `factor` jittered copies of every city"""
+    with open(ROMANIAN_DATASET) as file:
+        cities = json.load(file)["nodes"]
+    rng = random.Random(seed)
+    nodes = {}
+    for name, (lat, lon) in cities.items():
+        nodes[name] = [lat, lon]
+        for i in range(1, factor):
+            nodes[f"{name} {i}"] = [
+                lat + rng.uniform(-jitter_deg, jitter_deg),
+                lon + rng.uniform(-jitter_deg, jitter_deg),
+            ]
+    return nodes, knn_edges(nodes, k)
+
+
+def build_dijkstra(data: GraphData) -> DijkstraAlgorithm:
+    nodes, edges = data
+    dijkstra = DijkstraAlgorithm()
+    for name in nodes:
+        dijkstra.add_node(name)
+    for source, target, weight in edges:
+        dijkstra.add_edge(source, target, weight)
+    return dijkstra
+
+
+GENERATORS = {
+    "knn": lambda size, k, seed: random_geometric_knn(size, k, seed),
+    "grid": lambda size, k, seed: grid(int(math.sqrt(size)), int(math.sqrt(size))),
+    "romania": lambda size, k, seed: scaled_romanian(max(1, size // 42), k, seed),
+}
@@ -0,0 +1,324 @@
+"""
+Routing benchmark suite.
+
+Run from the backend directory, e.g.:
+
+    python -m benchmarks.run_benchmarks --generators knn,grid --sizes 1000,10000
+    python -m benchmarks.run_benchmarks --e2e --compare benchmarks/results/baseline.json
+
+Results (p50/p95/p99 latencies in milliseconds, memory in KiB) are written to
+benchmarks/results/ as JSON; --compare prints the change against an earlier run.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence
+
+from data_manager import DataManager
+from dijkstra import DIJKSTRA_QUEUE
+from partitioning import OverlayRouter
+
+from benchmarks.graph_generators import GENERATORS, build_dijkstra
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean of samples given in seconds, reported in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": statistics.fmean(ordered) * 1000,
+    }
+
+
+@contextmanager
+def measure_memory(result: Dict, key: str):
+    """Record the tracemalloc peak (KiB) of the block under result[key]"""
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result[key] = peak / 1024
+
+
+def time_calls(calls: List[Callable]) -> List[float]:
+    samples = []
+    for call in calls:
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_graph(
+    name: str,
+    data,
+    queries: int,
+    seed: int,
+    overlay_cell_size: int = 0,
+    queues: Sequence[str] = (),
+) -> Dict:
+    nodes, edges = data
+    result: Dict = {"nodes": len(nodes), "edges": len(edges)}
+
+    with measure_memory(result, "build_peak_kib"):
+        started = time.perf_counter()
+        dijkstra = build_dijkstra(data)
+        result["build_s"] = time.perf_counter() - started
+
+    # Import: read the JSON file and build the graph from it
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as file:
+        json.dump({"nodes": nodes, "edges": edges}, file)
+        path = file.name
+    try:
+        started = time.perf_counter()
+        imported = DataManager.import_json(path)
+        build_dijkstra((imported[0], [tuple(edge) for edge in imported[1]]))
+        result["import_s"] = time.perf_counter() - started
+    finally:
+        os.remove(path)
+
+    rng = random.Random(seed)
+    names = list(nodes)
+    pairs = [(rng.choice(names), rng.choice(names)) for _ in range(queries)]
+    with measure_memory(result, "search_peak_kib"):
+        result["find_shortest_path"] = percentiles(
+            time_calls(
+                [lambda a=a, b=b: dijkstra.find_shortest_path(a, b) for a, b in pairs]
+            )
+        )
+
+    # The same searches with each priority queue, to pick DIJKSTRA_QUEUE
+    for queue in queues:
+        dijkstra.queue = queue
+        result[f"find_shortest_path_{queue}"] = percentiles(
+            time_calls(
+                [lambda a=a, b=b: dijkstra.find_shortest_path(a, b) for a, b in pairs]
+            )
+        )
+    dijkstra.queue = DIJKSTRA_QUEUE
+
+    waypoint_queries = [
+        (rng.choice(names), rng.sample(names, 2), rng.choice(names))
+        for _ in range(max(1, queries // 2))
+    ]
+    result["find_path_with_waypoints"] = percentiles(
+        time_calls(
+            [
+                lambda s=s, w=w, e=e: dijkstra.find_path_with_waypoints(s, w, e)
+                for s, w, e in waypoint_queries
+            ]
+        )
+    )
+
+    if overlay_cell_size:
+        # Same queries on the partitioned graph (cells in this process)
+        coordinates = {name: tuple(coords) for name, coords in nodes.items()}
+        started = time.perf_counter()
+        router = OverlayRouter.build(dijkstra.graph, coordinates, overlay_cell_size)
+        result["overlay_build_s"] = time.perf_counter() - started
+        result.update({f"overlay_{k}": v for k, v in router.get_stats().items()})
+        result["overlay_find_shortest_path"] = percentiles(
+            time_calls(
+                [lambda a=a, b=b: router.find_shortest_path(a, b) for a, b in pairs]
+            )
+        )
+    return result
+
+
+class EndToEnd:
+    """Drives the FastAPI app in-process against SQLite, a stub OSRM and a stub LLM"""
+
+    def __init__(self):
+        from benchmarks.stub_osrm import start_stub_osrm
+
+        self.osrm_server, osrm_url = start_stub_osrm()
+        self.db_path = tempfile.mktemp(suffix=".db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{self.db_path}"
+        os.environ["OSRM_BASE_URL"] = osrm_url
+        os.environ["LLM_BACKEND"] = "stub"
+        os.environ["PRECOMPUTE_INTERVAL"] = "0"
+
+        from fastapi.testclient import TestClient
+
+        import main
+
+        self.main = main
+        self.client = TestClient(main.app)
+        self.client.__enter__()
+
+    def run(self, data, queries: int, seed: int) -> Dict:
+        from database import Edge, Node
+
+        nodes, _ = data
+        db = next(self.main.get_db())
+        try:
+            db.query(Edge).delete()
+            db.query(Node).delete()
+            db.commit()
+        finally:
+            db.close()
+
+        result = {}
+        started = time.perf_counter()
+        response = self.client.post("/import/json/", json={"nodes": nodes})
+        result["import_endpoint_s"] = time.perf_counter() - started
+        response.raise_for_status()
+
+        rng = random.Random(seed)
+        names = list(nodes)
+        samples, failures = [], 0
+        for _ in range(queries):
+            body = {"start": rng.choice(names), "end": rng.choice(names)}
+            started = time.perf_counter()
+            response = self.client.post("/path/", json=body)
+            samples.append(time.perf_counter() - started)
+            failures += response.status_code != 200
+        result["path_endpoint"] = percentiles(samples)
+        result["path_endpoint"]["non_200"] = failures
+        return result
+
+    def close(self):
+        self.client.__exit__(None, None, None)
+        self.osrm_server.shutdown()
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> bool:
+    """Print latency changes against a baseline; returns True if any regressed"""
+    regressed = False
+    print(f"\n{'benchmark':<45} {'baseline':>10} {'current':>10} {'change':>8}")
+    for graph, metrics in current["results"].items():
+        base_metrics = baseline.get("results", {}).get(graph)
+        if not base_metrics:
+            continue
+        for metric, value in metrics.items():
+            base = base_metrics.get(metric)
+            if isinstance(value, dict) and isinstance(base, dict):
+                pairs = [(f"{metric}.p50", value.get("p50"), base.get("p50")),
+                         (f"{metric}.p95", value.get("p95"), base.get("p95"))]
+            elif isinstance(value, (int, float)) and metric.endswith(("_s", "_kib")):
+                pairs = [(metric, value, base)]
+            else:
+                continue
+            for label, now, before in pairs:
+                if not now or not before:
+                    continue
+                change = now / before - 1
+                flag = ""
+                if change > threshold:
+                    flag = "  REGRESSION"
+                    regressed = True
+                print(f"{graph + ' ' + label:<45} {before:>10.3f} {now:>10.3f} {change:>+8.1%}{flag}")
+    return regressed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Routing benchmarks")
+    parser.add_argument("--generators", default="knn,grid,romania")
+    parser.add_argument("--sizes", default="1000,5000")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--e2e", action="store_true", help="also benchmark /import/json/ and /path/")
+    parser.add_argument("--e2e-max-size", type=int, default=2000)
+    parser.add_argument(
+        "--queues",
+        default="",
+        help="also time find_shortest_path per priority queue, e.g. binary,dary,radix",
+    )
+    parser.add_argument(
+        "--overlay-cell-size",
+        type=int,
+        default=0,
+        help="also benchmark partitioned routing with cells of this many nodes",
+    )
+    parser.add_argument("--output", help="result file (default: results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="regression threshold")
+    args = parser.parse_args(argv)
+
+    run = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": {},
+    }
+
+    e2e = EndToEnd() if args.e2e else None
+    try:
+        for generator in args.generators.split(","):
+            for size in map(int, args.sizes.split(",")):
+                key = f"{generator}-{size}"
+                started = time.perf_counter()
+                data = GENERATORS[generator](size, args.k, args.seed)
+                generate_s = time.perf_counter() - started
+
+                result = bench_graph(
+                    key,
+                    data,
+                    args.queries,
+                    args.seed,
+                    args.overlay_cell_size,
+                    [queue for queue in args.queues.split(",") if queue],
+                )
+                result["generate_s"] = generate_s
+                if e2e is not None and len(data[0]) <= args.e2e_max_size:
+                    result.update(e2e.run(data, args.queries, args.seed))
+                run["results"][key] = result
+
+                sp = result["find_shortest_path"]
+                print(
+                    f"{key:<16} nodes={result['nodes']:<7} edges={result['edges']:<8} "
+                    f"build={result['build_s']:.3f}s "
+                    f"sp p50={sp['p50']:.2f}ms p95={sp['p95']:.2f}ms p99={sp['p99']:.2f}ms"
+                )
+    finally:
+        if e2e is not None:
+            e2e.close()
+
+    run["meta"]["max_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(run, file, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(run, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
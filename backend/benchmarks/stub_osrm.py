@@ -0,0 +1,85 @@
+"""
+Minimal local OSRM stand-in for benchmarks: answers /route/v1, /nearest/v1
+and /table/v1 with straight-line geometry at 60 km/h, so end-to-end timings
+don't depend on the public OSRM server.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import polyline
+
+from dijkstra import DijkstraAlgorithm
+
+_distance = DijkstraAlgorithm().calculate_distance
+
+
+class StubOSRMHandler(BaseHTTPRequestHandler):
+    def _send(self, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path
+        coords = path.rsplit("/", 1)[-1]
+        points = [tuple(map(float, pair.split(","))) for pair in coords.split(";")]
+
+        if path.startswith("/nearest/"):
+            lon, lat = points[0]
+            self._send({"code": "Ok", "waypoints": [{"location": [lon, lat]}]})
+            return
+
+        latlons = [(lat, lon) for lon, lat in points]
+
+        if path.startswith("/table/"):
+            query = parse_qs(url.query)
+
+            def indices(name):
+                if name not in query:
+                    return range(len(latlons))
+                return [int(i) for i in query[name][0].split(";")]
+
+            durations = [
+                [
+                    _distance(*latlons[s], *latlons[d]) / 60 * 3600
+                    for d in indices("destinations")
+                ]
+                for s in indices("sources")
+            ]
+            self._send({"code": "Ok", "durations": durations})
+            return
+        meters = sum(
+            _distance(*latlons[i], *latlons[i + 1]) * 1000
+            for i in range(len(latlons) - 1)
+        )
+        self._send(
+            {
+                "code": "Ok",
+                "routes": [
+                    {
+                        "geometry": polyline.encode(latlons),
+                        "distance": meters,
+                        "duration": meters / 1000 / 60 * 3600,  # 60 km/h
+                        "legs": [{"steps": [{"name": "Stub road"}]}],
+                    }
+                ],
+            }
+        )
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_osrm(port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stub in a daemon thread; returns the server and its route base URL"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubOSRMHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}/route/v1"
@@ -0,0 +1,100 @@
+import threading
+from typing import Dict, Hashable, List, Mapping
+
+
+class ComponentIndex:
+    """
+    Connected components of an undirected graph as a union-find forest.
+
+    Adding nodes and edges updates the forest directly. Removals can split a
+    component, which union-find can't express, so they only mark the index
+    dirty and it is rebuilt from the graph on the next query, unless the
+    caller rebuilds it right away with rebuild().
+    """
+
+    def __init__(self):
+        self._parent: Dict[Hashable, Hashable] = {}
+        self._size: Dict[Hashable, int] = {}
+        self._dirty = True
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._dirty = True
+
+    def add(self, node: Hashable):
+        with self._lock:
+            if not self._dirty and node not in self._parent:
+                self._parent[node] = node
+                self._size[node] = 1
+
+    def union(self, a: Hashable, b: Hashable):
+        with self._lock:
+            if self._dirty:
+                return
+            for node in (a, b):
+                if node not in self._parent:
+                    self._parent[node] = node
+                    self._size[node] = 1
+            root_a, root_b = self._find(a), self._find(b)
+            if root_a == root_b:
+                return
+            if self._size[root_a] < self._size[root_b]:
+                root_a, root_b = root_b, root_a
+            self._parent[root_b] = root_a
+            self._size[root_a] += self._size.pop(root_b)
+
+    def _find(self, node: Hashable) -> Hashable:
+        parent = self._parent
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        # Path compression
+        while parent[node] != root:
+            parent[node], node = root, parent[node]
+        return root
+
+    def _rebuild(self, graph: Mapping[Hashable, List]):
+        """Label every component with one of its nodes by a graph traversal"""
+        parent: Dict[Hashable, Hashable] = {}
+        size: Dict[Hashable, int] = {}
+        for root in graph:
+            if root in parent:
+                continue
+            parent[root] = root
+            stack = [root]
+            count = 1
+            while stack:
+                for neighbor, _ in graph[stack.pop()]:
+                    if neighbor not in parent:
+                        parent[neighbor] = root
+                        stack.append(neighbor)
+                        count += 1
+            size[root] = count
+        self._parent, self._size = parent, size
+        self._dirty = False
+
+    def rebuild(self, graph: Mapping[Hashable, List]):
+        """Rebuild now, on the calling thread, rather than on the next query"""
+        with self._lock:
+            self._rebuild(graph)
+
+    def _ensure(self, graph: Mapping[Hashable, List]):
+        if self._dirty:
+            self._rebuild(graph)
+
+    def connected(
+        self, graph: Mapping[Hashable, List], a: Hashable, b: Hashable
+    ) -> bool:
+        """Whether a path between a and b exists (nodes not in graph: False)"""
+        with self._lock:
+            self._ensure(graph)
+            if a not in self._parent or b not in self._parent:
+                return False
+            return self._find(a) == self._find(b)
+
+    def sizes(self, graph: Mapping[Hashable, List]) -> List[int]:
+        """Component sizes, largest first"""
+        with self._lock:
+            self._ensure(graph)
+            return sorted(self._size.values(), reverse=True)
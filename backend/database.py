@@ -1,15 +1,62 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey
+from sqlalchemy import (
+    create_engine,
+    Column,
+    Integer,
+    String,
+    Float,
+    ForeignKey,
+    Text,
+    UniqueConstraint,
+)
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+import asyncio
+import contextvars
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
 from dotenv import load_dotenv
 
+import profiling
+
 load_dotenv()
 
 # Use the connection string from docker-compose
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Connection pool: connections kept open, extra ones opened under load,
+# seconds to wait for a free one, and seconds before one is recycled
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Compiled SQL kept per engine, so repeated queries skip compilation
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+
+# Threads running the sessions of async endpoints, at most one per connection
+DB_THREADS = int(os.getenv("DB_THREADS", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """create_engine arguments for the configured pool and statement cache"""
+    options: Dict[str, Any] = {"query_cache_size": DB_STATEMENT_CACHE_SIZE}
+    # SQLite has no server connections to pool (and :memory: can't share one)
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return options
+
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL)
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -48,14 +95,80 @@ class Edge(Base):
     )
 
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
+class TouristInfoCache(Base):
+    __tablename__ = "tourist_info_cache"
+    __table_args__ = (UniqueConstraint("location", "language"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    location = Column(String, index=True)
+    language = Column(String)
+    payload = Column(Text)  # JSON returned by the model
+    created_at = Column(Float)  # Unix timestamp, used for the TTL
+
+
+class EdgeDuration(Base):
+    __tablename__ = "edge_durations"
+    __table_args__ = (UniqueConstraint("source", "target"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String, index=True)  # Node names, source < target
+    target = Column(String)
+    duration = Column(Float)  # OSRM driving time in seconds
+    created_at = Column(Float)  # Unix timestamp
+
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def init_db():
+    """Create missing tables, once per process, on first use rather than on import"""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            Base.metadata.create_all(bind=engine)
+            _schema_ready = True
 
 
 # Dependency
 def get_db():
+    init_db()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+_db_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+
+
+async def run_in_session(fn: Callable[..., Any], *args) -> Any:
+    """
+    The async counterpart of get_db: run fn(session, *args) with a session
+    of its own on a DB thread, so the query never blocks the event loop and
+    no more queries run at once than the pool has connections
+    """
+    # Carry the request's contextvars (e.g. its profile) into the thread
+    ctx = contextvars.copy_context()
+
+    def call():
+        init_db()
+        with SessionLocal() as db:
+            return fn(db, *args)
+
+    return await asyncio.get_running_loop().run_in_executor(
+        _db_executor, ctx.run, profiling.call, call
+    )
+
+
+def pool_status() -> Dict[str, Any]:
+    """Connection pool settings and usage, for the metrics endpoints"""
+    pool = engine.pool
+    status: Dict[str, Any] = {"class": type(pool).__name__, "threads": DB_THREADS}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if hasattr(pool, name):
+            status[name] = getattr(pool, name)()
+    return status
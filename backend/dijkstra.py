@@ -1,12 +1,46 @@
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 import heapq
+import os
+import time
+from collections import Counter
 from math import radians, sin, cos, sqrt, atan2
 
+from components import ComponentIndex
+from metrics import SEARCH_PUSHES, SEARCH_SECONDS, SEARCH_SETTLED
+from priority_queues import QUEUES
+
+# Priority queue of the point and tree searches: binary (heapq), dary,
+# radix, or auto for the fastest measured (see DijkstraAlgorithm.queue_kind)
+DIJKSTRA_QUEUE = os.getenv("DIJKSTRA_QUEUE", "auto")
+
+
+def compile_avoid(avoid) -> frozenset:
+    """
+    Avoided nodes as a frozenset, built once per request: callers that route
+    several segments (or send the set to a worker process) compile it up
+    front and every search reuses it as is.
+    """
+    if not avoid:
+        return frozenset()
+    if isinstance(avoid, frozenset):
+        return avoid
+    return frozenset(avoid)
+
 
 class DijkstraAlgorithm:
     # un constructor pentru a putea crea instante din clasa asta
     def __init__(self):
         self.graph = {}
+        # Bumped on every change, so cached search results can tell they are stale
+        self.version = 0
+        # Travel-time multiplier by time of day (anything with a factor(seconds)
+        # method), used when a search is given a departure time
+        self.time_profile = None
+        # Connected components, so searches between them can be refused at once
+        self.components = ComponentIndex()
+        self.queue = DIJKSTRA_QUEUE
+        if self.queue != "auto" and self.queue not in QUEUES:
+            raise ValueError(f"Unknown priority queue: {self.queue}")
 
     # float = numere cu virgula
     # metoda de calculat distanta dintre 2 puncte
@@ -26,6 +60,69 @@ class DijkstraAlgorithm:
 
         return distance  # Returns distance in kilometers
 
+    # metoda pentru a adauga un nod fara muchii
+    def add_node(self, node: str):
+        """Add a node without edges to the graph"""
+        if node not in self.graph:
+            self.graph[node] = []
+            self.components.add(node)
+            self.version += 1
+
+    # metoda pentru a sterge un nod si toate muchiile lui
+    def remove_node(self, node: str):
+        """Remove a node and every edge pointing to it"""
+        self.remove_nodes([node])
+
+    # metoda pentru a sterge mai multe noduri odata
+    def remove_nodes(self, nodes: List[str]) -> int:
+        """
+        Remove several nodes and every edge pointing to them in one pass.
+        Edges are undirected, so a node's own adjacency list names every node
+        that points back to it; only those neighbors' lists are rewritten,
+        O(sum of their degrees) instead of O(E). Returns the number removed.
+        """
+        graph = self.graph
+        removed = set()
+        neighbors = set()
+        for node in nodes:
+            node_edges = graph.pop(node, None)
+            if node_edges is None:
+                continue
+            removed.add(node)
+            neighbors.update(target for target, _ in node_edges)
+
+        # Remove edges from other nodes that point to the removed nodes
+        for neighbor in neighbors - removed:
+            node_edges = graph.get(neighbor)
+            if node_edges is not None:
+                node_edges[:] = [
+                    (target, weight)
+                    for target, weight in node_edges
+                    if target not in removed
+                ]
+        if removed:
+            self.components.invalidate()
+            self.version += 1
+        return len(removed)
+
+    # metoda pentru a inlocui tot graful dintr-o data
+    def replace_graph(self, graph: Dict[str, List[Tuple[str, float]]]):
+        """
+        Replace the whole graph with an already built adjacency dict.
+        The swap is a single assignment, so searches running in other threads
+        see either the old or the new graph, never a half-built one.
+        """
+        self.graph = graph
+        self.components.invalidate()
+        self.version += 1
+
+    def weights_changed(self):
+        """
+        Note that edge weights changed in the graph itself (a shared graph
+        file updated in place), so results derived from the old ones go stale.
+        """
+        self.version += 1
+
     # metoda pentru adauga o linie intre doua puncte pe harta
     def add_edge(self, source: str, target: str, weight: float):
         """Add an edge to the graph"""
@@ -36,26 +133,102 @@ class DijkstraAlgorithm:
 
         self.graph[source].append((target, weight))
         self.graph[target].append((source, weight))  # For undirected graph
+        self.components.union(source, target)
+        self.version += 1
+
+    # metoda pentru a schimba costul mai multor muchii (ex: trafic)
+    def update_edge_weights(self, updates: List[Tuple[str, str, float]]) -> int:
+        """
+        Set new weights for existing (source, target, weight) edges, in both
+        directions, without rebuilding the graph. Each adjacency entry is
+        replaced atomically, so a concurrent search sees every edge with either
+        its old or its new weight. Returns the number of entries updated.
+        """
+        graph = self.graph
+        updated = 0
+        for source, target, weight in updates:
+            for node, neighbor in ((source, target), (target, source)):
+                node_edges = graph.get(node)
+                if node_edges is None:
+                    continue
+                for i, (other, _) in enumerate(node_edges):
+                    if other == neighbor:
+                        node_edges[i] = (neighbor, weight)
+                        updated += 1
+        if updated:
+            self.version += 1
+        return updated
+
+    # metoda pentru a verifica daca exista un drum intre doua noduri
+    def connected(self, source: str, target: str) -> bool:
+        """Whether source and target are in the same connected component"""
+        return self.components.connected(self.graph, source, target)
+
+    def rebuild_components(self):
+        """Label the components now instead of on the next connected() call"""
+        self.components.rebuild(self.graph)
+
+    def component_sizes(self) -> List[int]:
+        """Sizes of the connected components, largest first"""
+        return self.components.sizes(self.graph)
 
     # metoda pentru a gasi cel mai scurt drum
     def find_shortest_path(
-        self, start: str, end: str, avoid=None
+        self, start: str, end: str, avoid=None, departure_time: Optional[float] = None
     ) -> Tuple[List[str], float]:
         """
         Find the shortest path from start to end, optionally avoiding nodes.
+        With a departure time (seconds since midnight) and a time profile the
+        weights are travel times that vary over the day, and the returned
+        cost is the travel time of the fastest path.
         """
-        if avoid is None:
-            avoid = set()
+        # Different components: no need to exhaust the start component
+        if not self.connected(start, end):
+            return [], float("infinity")
+        if departure_time is not None and self.time_profile is not None:
+            distances, previous = self._search_time_dependent(
+                start, end, avoid, departure_time
+            )
         else:
-            avoid = set(avoid)
+            distances, previous = self._search(start, end, avoid)
+        return self.path_from_tree(distances, previous, end)
+
+    # metoda pentru a calcula distantele de la un nod la toate celelalte
+    def shortest_path_tree(
+        self, start: str, avoid=None
+    ) -> Tuple[Dict[str, float], Dict[str, Optional[str]]]:
+        """
+        Run a full single-source search from start.
+        Returns the distances and previous-node maps, from which the path to
+        any node can be read with path_from_tree.
+        """
+        return self._search(start, None, avoid)
+
+    def _search(
+        self, start: str, end: Optional[str], avoid=None
+    ) -> Tuple[Dict[str, float], Dict[str, Optional[str]]]:
+        """Dijkstra search from start, stopping early once end is settled"""
+        avoid = compile_avoid(avoid)
+
+        # Keep a local reference so a concurrent replace_graph can't change it mid-search
+        graph = self.graph
+
+        queue_kind = self.queue_kind()
+        if queue_kind != "binary":
+            return self._search_with_queue(
+                QUEUES[queue_kind](), graph, start, end, avoid
+            )
 
         # Initialize distances and previous nodes
-        distances = {node: float("infinity") for node in self.graph}
+        distances = {node: float("infinity") for node in graph}
         distances[start] = 0
-        previous = {node: None for node in self.graph}
+        previous = {node: None for node in graph}
 
         # Initialize priority queue with start node
         pq = [(0, start)]
+        started = time.perf_counter()
+        settled = 0
+        pushes = 1
 
         while pq:
             current_distance, current_node = heapq.heappop(pq)
@@ -63,6 +236,7 @@ class DijkstraAlgorithm:
             # Skip if we've found a better path to this node
             if current_distance > distances[current_node]:
                 continue
+            settled += 1
 
             # If we've reached the end, we're done
             if current_node == end:
@@ -73,7 +247,7 @@ class DijkstraAlgorithm:
                 continue
 
             # Check all neighbors
-            for neighbor, weight in self.graph[current_node]:
+            for neighbor, weight in graph[current_node]:
                 # Skip neighbors that are in the avoid list
                 if neighbor in avoid:
                     continue
@@ -86,16 +260,239 @@ class DijkstraAlgorithm:
                     distances[neighbor] = distance
                     previous[neighbor] = current_node
                     heapq.heappush(pq, (distance, neighbor))
+                    pushes += 1
 
-        # Reconstruct path
-        path = []
-        current_node = end
+        kind = "tree" if end is None else "point"
+        SEARCH_SECONDS.observe(time.perf_counter() - started, kind=kind)
+        SEARCH_SETTLED.observe(settled, kind=kind)
+        SEARCH_PUSHES.observe(pushes, kind=kind)
+        return distances, previous
+
+    def queue_kind(self) -> str:
+        """
+        The configured queue. "auto" is heapq at every graph size: it is
+        implemented in C, and in benchmarks (5k-50k nodes, K=3 and 10, grids)
+        the pure Python d-ary and radix heaps were 1.3-2x slower despite
+        holding fewer entries (python -m benchmarks.run_benchmarks --queues).
+        """
+        if self.queue != "auto":
+            return self.queue
+        return "binary"
+
+    def _search_with_queue(
+        self, queue, graph, start: str, end: Optional[str], avoid: frozenset
+    ) -> Tuple[Dict[str, float], Dict[str, Optional[str]]]:
+        """_search with a priority_queues queue instead of the inline heapq"""
+        distances = {node: float("infinity") for node in graph}
+        distances[start] = 0
+        previous = {node: None for node in graph}
+        push, pop = queue.push, queue.pop
+        push(0, start)
+        started = time.perf_counter()
+        settled = 0
+        pushes = 1
+
+        while queue:
+            current_distance, current_node = pop()
+            # Stale entries, for the queues without decrease-key
+            if current_distance > distances[current_node]:
+                continue
+            settled += 1
+            if current_node == end:
+                break
+            if current_node in avoid:
+                continue
+            for neighbor, weight in graph[current_node]:
+                if neighbor in avoid:
+                    continue
+                distance = current_distance + weight
+                if distance < distances[neighbor]:
+                    distances[neighbor] = distance
+                    previous[neighbor] = current_node
+                    push(distance, neighbor)
+                    pushes += 1
+
+        kind = "tree" if end is None else "point"
+        SEARCH_SECONDS.observe(time.perf_counter() - started, kind=kind)
+        SEARCH_SETTLED.observe(settled, kind=kind)
+        SEARCH_PUSHES.observe(pushes, kind=kind)
+        return distances, previous
+
+    def _search_time_dependent(
+        self, start: str, end: Optional[str], avoid, departure_time: float
+    ) -> Tuple[Dict[str, float], Dict[str, Optional[str]]]:
+        """
+        Dijkstra on elapsed time, where an edge entered after t seconds costs
+        weight * time_profile.factor(departure_time + t). Correct as long as
+        the profile is FIFO (leaving later never means arriving earlier).
+        """
+        avoid = compile_avoid(avoid)
+        graph = self.graph
+        factor = self.time_profile.factor
+
+        distances = {node: float("infinity") for node in graph}
+        distances[start] = 0
+        previous = {node: None for node in graph}
+        pq = [(0, start)]
+        started = time.perf_counter()
+        settled = 0
+        pushes = 1
+
+        while pq:
+            elapsed, current_node = heapq.heappop(pq)
+            if elapsed > distances[current_node]:
+                continue
+            settled += 1
+            if current_node == end:
+                break
+            if current_node in avoid:
+                continue
+
+            multiplier = factor(departure_time + elapsed)
+            for neighbor, weight in graph[current_node]:
+                if neighbor in avoid:
+                    continue
+                arrival = elapsed + weight * multiplier
+                if arrival < distances[neighbor]:
+                    distances[neighbor] = arrival
+                    previous[neighbor] = current_node
+                    heapq.heappush(pq, (arrival, neighbor))
+                    pushes += 1
+
+        SEARCH_SECONDS.observe(time.perf_counter() - started, kind="time_dependent")
+        SEARCH_SETTLED.observe(settled, kind="time_dependent")
+        SEARCH_PUSHES.observe(pushes, kind="time_dependent")
+        return distances, previous
+
+    # metoda pentru a gasi toate nodurile la care se ajunge cu un anumit cost
+    def reachable_within(
+        self,
+        start: str,
+        budget: float,
+        avoid=None,
+        departure_time: Optional[float] = None,
+    ) -> Dict[str, float]:
+        """
+        Every node whose shortest path from start costs at most budget, with
+        that cost. The search stops at the budget and only touches the nodes
+        it reaches, so the cost depends on the reachable region, not the graph.
+        With a departure time the time profile applies as in find_shortest_path.
+        Nothing is reachable within a negative (or NaN) budget.
+        """
+        avoid = compile_avoid(avoid)
+        graph = self.graph
+        if start not in graph or start in avoid or not budget >= 0:
+            return {}
+        factor = None
+        if departure_time is not None and self.time_profile is not None:
+            factor = self.time_profile.factor
+
+        best = {start: 0}
+        settled = {}
+        pq = [(0, start)]
+        while pq:
+            cost, current_node = heapq.heappop(pq)
+            if current_node in settled:
+                continue
+            settled[current_node] = cost
 
+            multiplier = factor(departure_time + cost) if factor else 1
+            for neighbor, weight in graph[current_node]:
+                if neighbor in avoid or neighbor in settled:
+                    continue
+                new_cost = cost + weight * multiplier
+                if new_cost <= budget and new_cost < best.get(
+                    neighbor, float("infinity")
+                ):
+                    best[neighbor] = new_cost
+                    heapq.heappush(pq, (new_cost, neighbor))
+
+        return settled
+
+    # metoda pentru a gasi cele mai apropiate surse (ex: depozite) de mai multe noduri
+    def nearest_sources(
+        self, sources: List[str], targets: List[str], k: int = 1, avoid=None
+    ) -> Dict[str, List[Tuple[str, List[str], float]]]:
+        """
+        The k sources nearest to each target as (source, path, cost), nearest
+        first, with paths from the source to the target. One multi-source
+        search answers every target: all sources start at 0 labelled with
+        themselves, and each node is settled once per origin for up to k
+        distinct origins. A source that is not among the k nearest of a node
+        can't be among the k nearest of any node reached through it, so the
+        search is exact and stops once every target has k labels.
+        """
+        avoid = compile_avoid(avoid)
+        graph = self.graph
+
+        # labels[node][origin] = (cost, previous node on the path from origin)
+        labels: Dict[str, Dict[str, Tuple[float, str]]] = {}
+        pq = [
+            (0, source, source, source)
+            for source in dict.fromkeys(sources)
+            if source in graph and source not in avoid
+        ]
+        heapq.heapify(pq)
+        remaining = {target for target in targets if target in graph}
+        started = time.perf_counter()
+        settled = 0
+        pushes = len(pq)
+
+        while pq and remaining:
+            cost, current_node, origin, previous_node = heapq.heappop(pq)
+            node_labels = labels.setdefault(current_node, {})
+            if origin in node_labels or len(node_labels) >= k:
+                continue
+            node_labels[origin] = (cost, previous_node)
+            settled += 1
+            if len(node_labels) == k:
+                remaining.discard(current_node)
+
+            for neighbor, weight in graph[current_node]:
+                if neighbor in avoid:
+                    continue
+                neighbor_labels = labels.get(neighbor)
+                if neighbor_labels is not None and (
+                    origin in neighbor_labels or len(neighbor_labels) >= k
+                ):
+                    continue
+                heapq.heappush(pq, (cost + weight, neighbor, origin, current_node))
+                pushes += 1
+
+        SEARCH_SECONDS.observe(time.perf_counter() - started, kind="multi_source")
+        SEARCH_SETTLED.observe(settled, kind="multi_source")
+        SEARCH_PUSHES.observe(pushes, kind="multi_source")
+
+        nearest = {}
+        for target in targets:
+            found = []
+            for origin, (cost, _) in labels.get(target, {}).items():
+                path = [target]
+                node = target
+                while node != origin:
+                    node = labels[node][origin][1]
+                    path.append(node)
+                path.reverse()
+                found.append((origin, path, cost))
+            found.sort(key=lambda item: item[2])
+            nearest[target] = found
+        return nearest
+
+    # metoda pentru a reconstrui drumul pana la un nod
+    def path_from_tree(
+        self,
+        distances: Dict[str, float],
+        previous: Dict[str, Optional[str]],
+        end: str,
+    ) -> Tuple[List[str], float]:
+        """Read the path to end out of a search result"""
         # If we couldn't reach the end node, return empty path and infinite distance
-        if distances[end] == float("infinity"):
+        if distances.get(end, float("infinity")) == float("infinity"):
             return [], float("infinity")
 
         # Reconstruct the path from end to start
+        path = []
+        current_node = end
         while current_node is not None:
             path.append(current_node)
             current_node = previous[current_node]
@@ -107,33 +504,190 @@ class DijkstraAlgorithm:
 
     # metoda pentru a gasi un drum pe harta, trecand prin toate punctele (waypoints) selectate
     def find_path_with_waypoints(
-        self, start: str, waypoints: List[str], end: str, avoid=None
+        self,
+        start: str,
+        waypoints: List[str],
+        end: str,
+        avoid=None,
+        departure_time: Optional[float] = None,
     ) -> Tuple[List[str], float]:
         """
         Find a path from start to end, passing through all waypoints in order.
         This method prevents backtracking by checking for common nodes between segments.
+        With a departure time, each segment departs when the previous one arrives.
         """
+        # Compiled once, every segment searches with the same set
+        avoid = compile_avoid(avoid)
         if not waypoints:
-            return self.find_shortest_path(start, end, avoid=avoid)
+            return self.find_shortest_path(
+                start, end, avoid=avoid, departure_time=departure_time
+            )
 
         # Create the full sequence of nodes to visit
         full_sequence = [start] + waypoints + [end]
-        complete_path = []
-        total_distance = 0
+        for source, target in zip(full_sequence, full_sequence[1:]):
+            if not self.connected(source, target):
+                return [], float("inf")
+        segments = []
 
         # Calculate path between each consecutive pair
         for i in range(len(full_sequence) - 1):
-            current_start = full_sequence[i]
-            current_end = full_sequence[i + 1]
-
             # Find path between current pair
+            segment_departure = None
+            if departure_time is not None:
+                segment_departure = departure_time + sum(d for _, d in segments)
             subpath, dist = self.find_shortest_path(
-                current_start, current_end, avoid=avoid
+                full_sequence[i],
+                full_sequence[i + 1],
+                avoid=avoid,
+                departure_time=segment_departure,
             )
+            if not subpath:
+                return [], float("inf")
+            segments.append((subpath, dist))
+
+        return self._join_segments(segments)
 
+    # metoda pentru a gasi drumul intre doua puncte de pe muchii
+    def find_path_between_points(
+        self,
+        starts: Dict[str, float],
+        waypoints: List[str],
+        ends: Dict[str, float],
+        avoid=None,
+    ) -> Tuple[List[str], float]:
+        """
+        find_path_with_waypoints for endpoints that need not be nodes. starts
+        and ends map nodes to the cost of reaching them from the real endpoint:
+        a point on an edge enters the graph at either end of the edge, for the
+        part of the edge in between. The cost includes those offsets.
+        """
+        avoid = compile_avoid(avoid)
+        stops = [starts] + [{waypoint: 0} for waypoint in waypoints] + [ends]
+        segments = []
+        for sources, targets in zip(stops, stops[1:]):
+            subpath, cost = self._search_between(sources, targets, avoid)
             if not subpath:
                 return [], float("inf")
+            segments.append((subpath, cost))
+        return self._join_segments(segments)
+
+    def _search_between(
+        self, sources: Dict[str, float], targets: Dict[str, float], avoid: frozenset
+    ) -> Tuple[List[str], float]:
+        """
+        Dijkstra seeded with every source at its offset, stopping once no
+        queued node can beat the best target reached plus its offset
+        """
+        graph = self.graph
+        distances: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        pq = []
+        for node, offset in sources.items():
+            if node in graph and node not in avoid:
+                if offset < distances.get(node, float("infinity")):
+                    distances[node] = offset
+                    previous[node] = None
+                    pq.append((offset, node))
+        heapq.heapify(pq)
+        best, best_node = float("infinity"), None
+        started = time.perf_counter()
+        settled = 0
+        pushes = len(pq)
+
+        while pq:
+            current_distance, current_node = heapq.heappop(pq)
+            if current_distance >= best:
+                break
+            if current_distance > distances[current_node]:
+                continue
+            settled += 1
+            if current_node in targets:
+                total = current_distance + targets[current_node]
+                if total < best:
+                    best, best_node = total, current_node
+            for neighbor, weight in graph[current_node]:
+                if neighbor in avoid:
+                    continue
+                distance = current_distance + weight
+                if distance < distances.get(neighbor, float("infinity")):
+                    distances[neighbor] = distance
+                    previous[neighbor] = current_node
+                    heapq.heappush(pq, (distance, neighbor))
+                    pushes += 1
+
+        SEARCH_SECONDS.observe(time.perf_counter() - started, kind="between_points")
+        SEARCH_SETTLED.observe(settled, kind="between_points")
+        SEARCH_PUSHES.observe(pushes, kind="between_points")
+        if best_node is None:
+            return [], float("infinity")
+        path = []
+        node = best_node
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        path.reverse()
+        return path, best
+
+    def edge_weight(self, source: str, target: str) -> Optional[float]:
+        """Weight of the cheapest edge between source and target, if any"""
+        weights = [w for node, w in self.graph.get(source, ()) if node == target]
+        return min(weights) if weights else None
+
+    # metoda pentru a calcula mai multe drumuri odata
+    def find_paths_batch(
+        self, queries: List[Tuple[str, List[str], str, Optional[List[str]]]]
+    ) -> List[Tuple[List[str], float]]:
+        """
+        Answer many (start, waypoints, end, avoid) queries at once.
+        A (source, avoid) pair that starts several segments is searched only
+        once, and all queries and waypoint segments starting there read their
+        path from the same shortest-path tree. A segment whose source is not
+        shared gets a point-to-point search, which stops at its target.
+        """
+        queries = [
+            (start, waypoints, end, compile_avoid(avoid))
+            for start, waypoints, end, avoid in queries
+        ]
+        uses = Counter(
+            (source, avoid)
+            for start, waypoints, _, avoid in queries
+            for source in [start] + (waypoints or [])
+        )
+        trees = {}
+
+        def segment(source: str, target: str, avoid) -> Tuple[List[str], float]:
+            key = (source, avoid)
+            if uses[key] == 1:
+                return self.find_shortest_path(source, target, avoid)
+            if key not in trees:
+                trees[key] = self.shortest_path_tree(source, avoid)
+            distances, previous = trees[key]
+            return self.path_from_tree(distances, previous, target)
+
+        results = []
+        for start, waypoints, end, avoid in queries:
+            full_sequence = [start] + (waypoints or []) + [end]
+            segments = []
+            for i in range(len(full_sequence) - 1):
+                subpath, dist = segment(full_sequence[i], full_sequence[i + 1], avoid)
+                if not subpath:
+                    segments = None
+                    break
+                segments.append((subpath, dist))
+            results.append(
+                self._join_segments(segments) if segments else ([], float("inf"))
+            )
+        return results
+
+    def _join_segments(
+        self, segments: List[Tuple[List[str], float]]
+    ) -> Tuple[List[str], float]:
+        """Stitch consecutive subpaths together without backtracking"""
+        complete_path = []
+        total_distance = 0
 
+        for i, (subpath, dist) in enumerate(segments):
             # For the first segment, add the entire path
             if i == 0:
                 complete_path = subpath[:]
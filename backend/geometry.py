@@ -0,0 +1,108 @@
+from math import cos, radians
+from typing import List, Optional, Tuple
+
+import polyline
+
+Point = Tuple[float, float]
+
+
+def _cross(o: Point, a: Point, b: Point) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def convex_hull(points: List[Point]) -> List[Point]:
+    """
+    Convex hull of (lat, lon) points in counter-clockwise order (Andrew's
+    monotone chain, O(n log n)). Fewer than three distinct points are
+    returned as they are.
+    """
+    unique = sorted(set(points))
+    if len(unique) < 3:
+        return unique
+
+    lower: List[Point] = []
+    for point in unique:
+        while len(lower) >= 2 and _cross(lower[-2], lower[-1], point) <= 0:
+            lower.pop()
+        lower.append(point)
+
+    upper: List[Point] = []
+    for point in reversed(unique):
+        while len(upper) >= 2 and _cross(upper[-2], upper[-1], point) <= 0:
+            upper.pop()
+        upper.append(point)
+
+    # The last point of each half is the first point of the other
+    return lower[:-1] + upper[:-1]
+
+
+def point_in_polygon(point: Point, polygon: List[Point]) -> bool:
+    """Even-odd rule ray casting; points on the border may go either way"""
+    lat, lon = point
+    inside = False
+    previous = polygon[-1]
+    for current in polygon:
+        (lat1, lon1), (lat2, lon2) = previous, current
+        if (lon1 > lon) != (lon2 > lon):
+            crossing = lat1 + (lon - lon1) * (lat2 - lat1) / (lon2 - lon1)
+            if lat < crossing:
+                inside = not inside
+        previous = current
+    return inside
+
+
+def zoom_tolerance(zoom: int) -> float:
+    """Size of one 256px-tile pixel in degrees at a web map zoom level"""
+    return 360 / (256 * 2**zoom)
+
+
+def simplify(points: List[Point], tolerance: float) -> List[Point]:
+    """
+    Douglas-Peucker simplification of a (lat, lon) line: drops every point
+    closer than tolerance (degrees) to the simplified line. Longitudes are
+    scaled by cos(latitude) so the tolerance is about the same in both axes.
+    """
+    if len(points) < 3 or tolerance <= 0:
+        return list(points)
+
+    scale = cos(radians(sum(lat for lat, _ in points) / len(points)))
+    xy = [(lon * scale, lat) for lat, lon in points]
+    tolerance_sq = tolerance * tolerance
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+
+    # Iterative, so long routes can't hit the recursion limit
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = xy[first], xy[last]
+        dx, dy = x2 - x1, y2 - y1
+        length_sq = dx * dx + dy * dy
+        farthest, max_sq = None, tolerance_sq
+        for i in range(first + 1, last):
+            x, y = xy[i]
+            if length_sq == 0:
+                dist_sq = (x - x1) ** 2 + (y - y1) ** 2
+            else:
+                cross = dx * (y - y1) - dy * (x - x1)
+                dist_sq = cross * cross / length_sq
+            if dist_sq > max_sq:
+                farthest, max_sq = i, dist_sq
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def format_geometry(points: List[Point], fmt: str, zoom: Optional[int] = None):
+    """
+    Route geometry as requested: simplified for the zoom level if one is given,
+    then either (lat, lon) pairs or an encoded polyline (precision 5).
+    """
+    if zoom is not None:
+        points = simplify(points, zoom_tolerance(zoom))
+    if fmt == "polyline":
+        return polyline.encode(points, 5)
+    return points
@@ -0,0 +1,49 @@
+import logging
+from typing import List, Tuple, TypeVar
+
+from dijkstra import DijkstraAlgorithm
+
+# Anything with id, name, latitude and longitude attributes (e.g. database.Node)
+NodeLike = TypeVar("NodeLike")
+
+logger = logging.getLogger(__name__)
+
+_dijkstra = DijkstraAlgorithm()
+
+
+def find_k_nearest_neighbors(
+    node: NodeLike, existing_nodes: List[NodeLike], k: int = 3
+) -> List[Tuple[NodeLike, float]]:
+    """Find the k nearest neighbors for a given node"""
+    distances = []
+    for existing_node in existing_nodes:
+        if existing_node.id != node.id:  # Don't include the node itself
+            # Check if both nodes have coordinates
+            if (
+                node.latitude is None
+                or node.longitude is None
+                or existing_node.latitude is None
+                or existing_node.longitude is None
+            ):
+                logger.debug(
+                    "Skipping edge creation - missing coordinates for %s or %s",
+                    node.name,
+                    existing_node.name,
+                )
+                continue
+
+            distance = _dijkstra.calculate_distance(
+                node.latitude,
+                node.longitude,
+                existing_node.latitude,
+                existing_node.longitude,
+            )
+            distances.append((existing_node, distance))
+
+    # Sort by distance and return k nearest
+    distances.sort(key=lambda x: x[1])
+
+    # Ensure we don't return more neighbors than available
+    k = min(k, len(distances))
+
+    return distances[:k]
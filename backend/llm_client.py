@@ -0,0 +1,135 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import List, Optional
+
+from metrics import LLM_REQUESTS, LLM_SECONDS
+from profiling import phase
+
+DEFAULT_MODEL = "gemini-1.5-flash"
+
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def _gemini():
+    """Import and configure the Gemini SDK on first use, it is slow to import"""
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            import google.generativeai as genai
+
+            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            _genai = genai
+    return _genai
+
+
+def extract_json_from_text(text):
+    # Find JSON-like content in the text
+    json_pattern = r"\{[\s\S]*\}"
+    match = re.search(json_pattern, text)
+    if match:
+        return match.group(0)
+    return None
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubGenerativeModel:
+    """
+    Local stand-in for genai.GenerativeModel, used for tests and benchmarks.
+    Answers the prompts used by the backend with canned JSON, after an optional
+    delay (LLM_STUB_DELAY seconds) to mimic a real round trip.
+    """
+
+    TOURIST_PATTERNS = [
+        re.compile(r"Provide tourist information for (.+?) including"),
+        re.compile(r"Oferă informații turistice pentru (.+?) incluzând"),
+    ]
+    LOCATIONS_PATTERN = re.compile(
+        r"^(?:Available locations|Locații disponibile): (.*)$", re.MULTILINE
+    )
+    QUERY_PATTERN = re.compile(r'^Query: "(.*)"$', re.MULTILINE)
+
+    def __init__(self, delay: Optional[float] = None):
+        self.delay = (
+            delay if delay is not None else float(os.getenv("LLM_STUB_DELAY", "0"))
+        )
+        self.calls = 0
+
+    def generate_content(self, prompt: str) -> StubResponse:
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+
+        for pattern in self.TOURIST_PATTERNS:
+            match = pattern.search(prompt)
+            if match:
+                return StubResponse(json.dumps(self._tourist_info(match.group(1))))
+
+        locations = self.LOCATIONS_PATTERN.search(prompt)
+        query = self.QUERY_PATTERN.search(prompt)
+        if locations and query:
+            names = [name for name in locations.group(1).split(", ") if name]
+            return StubResponse(json.dumps(self._route(names, query.group(1))))
+
+        return StubResponse("This is a stub response.")
+
+    def _tourist_info(self, location: str) -> dict:
+        return {
+            "attractions": [f"{location} Old Town", f"{location} Museum"],
+            "restaurants": [f"Restaurant {location}"],
+            "events": [],
+            "best_time": "May to September",
+        }
+
+    def _route(self, names: List[str], query: str) -> dict:
+        # Locations mentioned in the query, in the order they appear
+        text = query.lower()
+        mentioned = sorted(
+            (text.find(name.lower()), name) for name in names if name.lower() in text
+        )
+        found = [name for _, name in mentioned]
+        if len(found) < 2:
+            return {"message": "Please tell me where you want to start and end."}
+        return {
+            "start": found[0],
+            "end": found[-1],
+            "waypoints": found[1:-1],
+            "avoid": [],
+            "preferences": [],
+        }
+
+
+class InstrumentedModel:
+    """Wraps a model so every generate_content call is counted and timed"""
+
+    def __init__(self, model, backend: str):
+        self.model = model
+        self.backend = backend
+
+    def generate_content(self, prompt: str):
+        started = time.perf_counter()
+        try:
+            with phase("llm"):
+                response = self.model.generate_content(prompt)
+        except Exception:
+            LLM_REQUESTS.inc(backend=self.backend, outcome="error")
+            raise
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - started, backend=self.backend)
+        LLM_REQUESTS.inc(backend=self.backend, outcome="ok")
+        return response
+
+
+def get_generative_model(name: str = DEFAULT_MODEL):
+    """Return the configured LLM model (LLM_BACKEND=gemini|stub)"""
+    backend = os.getenv("LLM_BACKEND", "gemini")
+    if backend == "stub":
+        return InstrumentedModel(StubGenerativeModel(), backend)
+    return InstrumentedModel(_gemini().GenerativeModel(name), backend)
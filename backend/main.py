@@ -1,26 +1,76 @@
-from fastapi import FastAPI, HTTPException, Body, Depends
+import time
+
+# Measured so slow imports show up in the startup_seconds metric
+_import_started = time.perf_counter()
+# Shared graphs published before this process started are from another run
+_process_started_ns = time.time_ns()
+
+from fastapi import FastAPI, HTTPException, Body, Depends, Header, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Dict, Optional, List, Tuple
-from dijkstra import DijkstraAlgorithm
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from pydantic import BaseModel, confloat, conint
+from typing import Any, Callable, Dict, Optional, List, Literal, Tuple, Union
+from datetime import datetime
+from dijkstra import DijkstraAlgorithm, compile_avoid
 from ai_pathfinder import AIPathfinder
 from osrm_service import OSRMService
 from routing_service import RoutingService
-import openai
+from worker_pool import Debouncer, RoutingExecutor
+from shared_graph import SharedGraphStore
+from llm_client import extract_json_from_text, get_generative_model
+from tourist_info import DatabaseTouristInfoStore, TouristInfoService
+from name_index import NodeNameIndex
+from spatial_index import SNAP_MAX_KM, GridIndex
+from graph_builder import find_k_nearest_neighbors
+from profiling import is_requested, phase, profile_request
+from metrics import (
+    DB_PHASE_SECONDS,
+    EXECUTOR_JOBS,
+    GRAPH_NODES,
+    HTTP_REQUESTS,
+    HTTP_SECONDS,
+    REGISTRY,
+    STARTUP_SECONDS,
+)
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
-import re
 import json
-from rapidfuzz import process
-from sqlalchemy.orm import Session
-from database import get_db, Node, Edge
+import base64
+from sqlalchemy.orm import Session, aliased
+from database import (
+    get_db,
+    init_db,
+    pool_status,
+    run_in_session,
+    Node,
+    Edge,
+    SessionLocal,
+    TouristInfoCache,
+    EdgeDuration,
+)
+from travel_times import DatabaseEdgeDurationStore
+from geometry import convex_hull, format_geometry, zoom_tolerance
 import logging
+import threading
 import traceback
+import asyncio
 
 # Load environment variables
 load_dotenv()
 
+# Per-node and per-edge messages are logged at DEBUG, summaries at INFO
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+
 app = FastAPI()
 
 # Enable CORS
@@ -32,73 +82,333 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(RequestValidationError)
+async def validation_error_handler(request, exc: RequestValidationError):
+    """
+    The default 422 body without the rejected input: a NaN or infinite number
+    (which JSON bodies may carry) can't be written back as JSON
+    """
+    errors = [
+        {key: value for key, value in error.items() if key != "input"}
+        for error in exc.errors()
+    ]
+    return JSONResponse(status_code=422, content={"detail": jsonable_encoder(errors)})
+
 # Initialize our components
 dijkstra = DijkstraAlgorithm()
 ai_pathfinder = AIPathfinder()
 osrm = OSRMService()
-routing_service = RoutingService()
+routing_service = RoutingService(
+    os.getenv("OSRM_BASE_URL", "http://router.project-osrm.org/route/v1")
+)
 
-# Set your OpenAI API key
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# OSRM edge durations for "duration" routing are persisted in the DB
+routing_service.travel_times.store = DatabaseEdgeDurationStore(
+    SessionLocal, EdgeDuration
+)
 
-# Load your API key from environment variable
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# Resolves place names from NLP queries, kept in sync with the graph
+node_name_index = NodeNameIndex()
+
+# Node coordinates for viewport queries, kept in sync with the graph
+spatial_index = GridIndex()
+
+# Default and maximum page sizes of /nodes/ and /edges/ viewport queries
+PAGE_LIMIT = int(os.getenv("PAGE_LIMIT", "1000"))
+MAX_PAGE_LIMIT = int(os.getenv("MAX_PAGE_LIMIT", "10000"))
+
+# Below this zoom level /nodes/ groups nodes closer than CLUSTER_PIXELS
+CLUSTER_MAX_ZOOM = int(os.getenv("CLUSTER_MAX_ZOOM", "10"))
+CLUSTER_PIXELS = int(os.getenv("CLUSTER_PIXELS", "64"))
+
+# Web map zoom levels accepted by /path/ and /nodes/
+MAX_ZOOM = 22
+
+# At most this many candidate locations are listed in the NLP prompt
+NLP_PROMPT_MAX_LOCATIONS = int(os.getenv("NLP_PROMPT_MAX_LOCATIONS", "30"))
+
+# Tourist info lookups run concurrently and are cached in memory and in the DB
+tourist_info_service = TouristInfoService(
+    store=DatabaseTouristInfoStore(SessionLocal, TouristInfoCache)
+)
+
+# "memory" keeps a private graph per server worker, "shared" has all workers
+# map one read-only graph file that is rebuilt and swapped atomically
+GRAPH_MODE = os.getenv("GRAPH_MODE", "memory")
+shared_graph_store = SharedGraphStore() if GRAPH_MODE == "shared" else None
+
+# CPU-heavy searches and blocking work run here instead of on the event loop
+routing_executor = RoutingExecutor(
+    routing_service.dijkstra, shared_store=shared_graph_store
+)
 
 # Add at the top with other global variables
 K_VALUE = 3  # Default K value for KNN
 
+# Background precomputation for the hottest queries (interval 0 disables it)
+PRECOMPUTE_INTERVAL = float(os.getenv("PRECOMPUTE_INTERVAL", "60"))
+PRECOMPUTE_TOP_SOURCES = int(os.getenv("PRECOMPUTE_TOP_SOURCES", "10"))
+PRECOMPUTE_TOP_PAIRS = int(os.getenv("PRECOMPUTE_TOP_PAIRS", "20"))
+
+# "blocking" loads the graph before the server accepts requests; "background"
+# starts serving at once and answers 503 (except /ready) until it is loaded
+STARTUP_MODE = os.getenv("STARTUP_MODE", "blocking")
+graph_ready = False
+
 # Configure logger
 logger = logging.getLogger(__name__)
 
 
-def initialize_routing_service(db: Session):
-    """Initialize the routing service and Dijkstra graph with all existing nodes and edges from the database"""
-    try:
-        # Get all nodes
-        nodes = db.query(Node).all()
-        for node in nodes:
-            # Add to routing service
-            routing_service.add_node(node.name, node.latitude, node.longitude)
-            print(f"Added node to routing service: {node.name}")
+def load_graph_from_db(db: Session) -> Tuple[int, int]:
+    """
+    Build both in-memory graphs from the database and swap them in at once,
+    so searches running in the worker pool never see a half-built graph.
+    """
+    if shared_graph_store is None:
+        return build_graph_from_db(db)
+    # Read and publish under the lock, so a graph read from the database
+    # can't be published after one read later (by any worker)
+    with shared_graph_store.build_lock():
+        return build_graph_from_db(db)
 
-            # Add to Dijkstra graph
-            dijkstra.graph[node.name] = []
-            print(f"Added node to Dijkstra graph: {node.name}")
 
-        # Get all edges
+def build_graph_from_db(db: Session) -> Tuple[int, int]:
+    with DB_PHASE_SECONDS.time(phase="load_graph"):
+        nodes = db.query(Node).all()
         edges = db.query(Edge).all()
-        for edge in edges:
-            source = db.query(Node).filter(Node.id == edge.source_id).first()
-            target = db.query(Node).filter(Node.id == edge.target_id).first()
-            if source and target:
-                # Add to routing service
-                routing_service.add_edge(source.name, target.name)
-                print(f"Added edge to routing service: {source.name} -> {target.name}")
-
-                # Add to Dijkstra graph
-                dijkstra.add_edge(source.name, target.name, edge.weight)
-                print(
-                    f"Added edge to Dijkstra graph: {source.name} -> {target.name} (weight: {edge.weight})"
-                )
+    names = {node.id: node.name for node in nodes}
+
+    graph = DijkstraAlgorithm()
+    for node in nodes:
+        graph.add_node(node.name)
+
+    edge_pairs = []
+    for edge in edges:
+        source = names.get(edge.source_id)
+        target = names.get(edge.target_id)
+        if source and target:
+            graph.add_edge(source, target, edge.weight)
+            edge_pairs.append((source, target, edge.weight))
+
+    if shared_graph_store is not None:
+        # Both graphs share the published file, with the weights stored in the DB
+        node_coordinates = {
+            node.name: (node.latitude, node.longitude) for node in nodes
+        }
+        shared_graph_store.publish(
+            graph.graph,
+            node_coordinates,
+            durations=routing_service.travel_times.build_graph(graph.graph),
+        )
+        sync_shared_graph()
+    else:
+        dijkstra.replace_graph(graph.graph)
+        routing_service.load_graph(
+            [(node.name, node.latitude, node.longitude) for node in nodes], edge_pairs
+        )
+    node_name_index.rebuild(node.name for node in nodes)
+    spatial_index.rebuild((node.name, node.latitude, node.longitude) for node in nodes)
+    routing_executor.refresh_snapshot()
+    return len(nodes), len(edges)
+
+
+_sync_lock = threading.Lock()
+
+
+def sync_shared_graph():
+    """Point the in-memory services at the newest published shared graph"""
+    with _sync_lock:
+        shared, changed = shared_graph_store.refresh()
+        if not changed:
+            return
+        if routing_service.dijkstra.graph is shared.graph:
+            # Same file, only weights were updated in place
+            dijkstra.weights_changed()
+            routing_service.dijkstra.weights_changed()
+            routing_service.duration_dijkstra.weights_changed()
+            return
+        # Both graphs are views over the mapped file, no private copies
+        dijkstra.replace_graph(shared.graph)
+        routing_service.dijkstra.replace_graph(shared.graph)
+        routing_service.dijkstra.rebuild_components()
+        routing_service.node_coordinates = shared.node_coordinates
+        routing_service.duration_dijkstra.replace_graph(shared.duration_graph)
+        routing_service.clear_route_cache()
+        routing_service.clear_snap_index()
+        node_name_index.rebuild(shared.names)
+        spatial_index.rebuild(
+            (name, *shared.node_coordinates[name]) for name in shared.names
+        )
+
+
+def republish_shared_graph():
+    """Publish a new shared graph with everything currently in the database"""
+    db = SessionLocal()
+    try:
+        load_graph_from_db(db)
+    finally:
+        db.close()
+
+
+# A burst of edits within this many seconds costs a single shared republish
+SHARED_GRAPH_REPUBLISH_DELAY = float(os.getenv("SHARED_GRAPH_REPUBLISH_DELAY", "0.5"))
+shared_graph_republisher = Debouncer(
+    republish_shared_graph, SHARED_GRAPH_REPUBLISH_DELAY, "shared-graph-republish"
+)
 
-        print(
-            f"Initialization complete: {len(nodes)} nodes and {len(edges)} edges loaded"
+
+def graph_changed():
+    """
+    Propagate a change made to the database to every copy of the graph, in
+    the background and once per burst of changes. In shared mode that means
+    reading the whole database and publishing a new graph file (O(nodes +
+    edges) however small the change), so searches in every worker, this one
+    included, see the change about SHARED_GRAPH_REPUBLISH_DELAY later.
+    """
+    if shared_graph_store is not None:
+        # The shared graph is read-only, so publish a new version instead
+        shared_graph_republisher.trigger()
+    else:
+        # Process workers get a new snapshot once per burst of edits
+        routing_executor.schedule_snapshot()
+
+
+def initialize_shared_graph(db: Session):
+    """
+    Build and publish the shared graph once, other server workers just attach.
+    A graph published before this process started may predate edits made
+    between runs (the parent PID can't tell runs apart: a restart from the
+    same shell or under a container's PID 1 has the same one), so it is
+    rebuilt; a worker that starts later than its siblings rebuilds once more.
+    """
+    with shared_graph_store.build_lock():
+        pointer = shared_graph_store.read_pointer()
+        if pointer is None or pointer.get("published_at", 0) < _process_started_ns:
+            initialize_routing_service(db)
+        else:
+            sync_shared_graph()
+            logger.info("Attached to shared graph published by another worker")
+
+
+def initialize_routing_service(db: Session):
+    """Initialize the routing service and Dijkstra graph with all existing nodes and edges from the database"""
+    try:
+        node_count, edge_count = load_graph_from_db(db)
+
+        logger.info(
+            "Initialization complete: %d nodes and %d edges loaded",
+            node_count,
+            edge_count,
         )
-        print(f"Dijkstra graph nodes: {list(dijkstra.graph.keys())}")
 
     except Exception as e:
-        print(f"Error initializing routing service: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error initializing routing service: %s", e)
+
+
+async def load_graph_on_startup():
+    """Create the schema if needed and load (or attach to) the graph"""
+    global graph_ready
+    started = time.perf_counter()
+    await routing_executor.run_blocking(init_db)
+    db = SessionLocal()
+    try:
+        if shared_graph_store is not None:
+            await routing_executor.run_blocking(initialize_shared_graph, db)
+        else:
+            await routing_executor.run_blocking(initialize_routing_service, db)
+    finally:
+        db.close()
+    STARTUP_SECONDS.set(time.perf_counter() - started, phase="graph_load")
+    graph_ready = True
+    logger.info("Graph loaded in %.2fs", time.perf_counter() - started)
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize services when the application starts"""
-    db = next(get_db())
+    if STARTUP_MODE == "background":
+        asyncio.create_task(load_graph_on_startup())
+    else:
+        await load_graph_on_startup()
+
+    if PRECOMPUTE_INTERVAL > 0:
+        asyncio.create_task(precompute_loop())
+
+
+@app.middleware("http")
+async def metrics_middleware(request, call_next):
+    """Count and time every request by its route template"""
+    started = time.perf_counter()
+    status = 500
     try:
-        initialize_routing_service(db)
+        response = await call_next(request)
+        status = response.status_code
+        return response
     finally:
-        db.close()
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        HTTP_REQUESTS.inc(route=path, method=request.method, status=status)
+        HTTP_SECONDS.observe(
+            time.perf_counter() - started, route=path, method=request.method
+        )
+
+
+@app.middleware("http")
+async def shared_graph_middleware(request, call_next):
+    """Pick up graphs published by other server workers before handling a request"""
+    # Checking reads the small pointer file; attaching a new graph runs off the loop
+    if (
+        shared_graph_store is not None
+        and graph_ready
+        and shared_graph_store.has_update()
+    ):
+        await routing_executor.run_blocking(sync_shared_graph)
+    return await call_next(request)
+
+
+# Served while the graph is still loading in background startup mode
+AVAILABLE_BEFORE_READY = {"/ready", "/metrics", "/docs", "/openapi.json"}
+
+
+# Declared last so it runs first, before any middleware that needs the graph
+@app.middleware("http")
+async def readiness_middleware(request, call_next):
+    """Hold off requests that need the graph until it is loaded"""
+    if (
+        STARTUP_MODE == "background"
+        and not graph_ready
+        and request.url.path not in AVAILABLE_BEFORE_READY
+    ):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Graph is still loading"},
+            headers={"Retry-After": "1"},
+        )
+    return await call_next(request)
+
+
+async def precompute_loop():
+    """Periodically precompute trees and routes for the hottest queries"""
+    while True:
+        await asyncio.sleep(PRECOMPUTE_INTERVAL)
+        try:
+            await routing_executor.run_blocking(
+                ai_pathfinder.precompute,
+                routing_service,
+                PRECOMPUTE_TOP_SOURCES,
+                PRECOMPUTE_TOP_PAIRS,
+            )
+        except Exception as e:
+            logger.warning("Error precomputing hot routes: %s", e)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Publish pending changes for the other workers and stop the worker pools"""
+    if shared_graph_store is not None:
+        await routing_executor.run_blocking(shared_graph_republisher.flush)
+    routing_executor.shutdown()
 
 
 # Data models
@@ -108,61 +418,243 @@ class NodeCreate(BaseModel):
     longitude: float
 
 
+# Edge weights and factors: NaN or infinity would break the queue order
+EdgeWeight = confloat(ge=0, allow_inf_nan=False)
+
+
 class EdgeCreate(BaseModel):
     source: str
     target: str
-    weight: Optional[float] = None
+    weight: Optional[EdgeWeight] = None
+
+
+class AvoidArea(BaseModel):
+    """A region to route around: a circle, a bounding box or a polygon"""
+
+    type: Literal["circle", "bbox", "polygon"]
+    # circle: (lat, lon) and radius
+    center: Optional[Tuple[float, float]] = None
+    radius_km: Optional[float] = None
+    # bbox: (min_lat, min_lon, max_lat, max_lon)
+    bbox: Optional[Tuple[float, float, float, float]] = None
+    # polygon: (lat, lon) vertices
+    polygon: Optional[List[Tuple[float, float]]] = None
+
+
+# A node name, or [latitude, longitude] to snap onto the graph
+Location = Union[str, Tuple[confloat(ge=-90, le=90), confloat(ge=-180, le=180)]]
 
 
 class PathRequest(BaseModel):
+    # Coordinates snap to the nearest point of an edge for start and end, and
+    # to the nearest node for waypoints
+    start: Location
+    end: Location
+    waypoints: Optional[List[Location]] = None
+    avoid: Optional[List[str]] = None
+    avoid_areas: Optional[List[AvoidArea]] = None
+    # "duration" finds the fastest route using OSRM edge durations, varying
+    # over the day when a departure time is given
+    weighting: Literal["distance", "duration"] = "distance"
+    departure_time: Optional[datetime] = None
+    # "polyline" returns the route geometry as an encoded polyline string;
+    # a zoom level simplifies it to what is visible at that zoom
+    geometry: Literal["coordinates", "polyline"] = "coordinates"
+    zoom: Optional[conint(ge=0, le=MAX_ZOOM)] = None
+
+
+class IsochroneRequest(BaseModel):
     start: str
-    end: str
-    waypoints: Optional[List[str]] = None
+    # Budget in kilometres or in minutes of driving, exactly one of them
+    max_distance: Optional[float] = None
+    max_minutes: Optional[float] = None
+    avoid: Optional[List[str]] = None
+    avoid_areas: Optional[List[AvoidArea]] = None
+    departure_time: Optional[datetime] = None
+    hull: bool = False
+
+
+class NearestFacilitiesRequest(BaseModel):
+    facilities: List[str]
+    # One or many targets, all answered by the same search
+    targets: List[str]
+    k: int = 1
     avoid: Optional[List[str]] = None
+    avoid_areas: Optional[List[AvoidArea]] = None
+    weighting: Literal["distance", "duration"] = "distance"
+    include_geometry: bool = False
+
+
+class BatchPathRequest(BaseModel):
+    requests: List[PathRequest]
+    include_geometry: bool = True
+
+
+def area_nodes(area: AvoidArea) -> List[str]:
+    """Nodes inside an avoid area, looked up in the spatial index"""
+    if area.type == "circle" and area.center is not None and area.radius_km:
+        return spatial_index.within_radius(*area.center, area.radius_km)
+    if area.type == "bbox" and area.bbox is not None:
+        min_lat, min_lon, max_lat, max_lon = area.bbox
+        if min_lat <= max_lat and min_lon <= max_lon:
+            return spatial_index.query(area.bbox)
+    if area.type == "polygon" and area.polygon and len(area.polygon) >= 3:
+        return spatial_index.within_polygon(area.polygon)
+    raise HTTPException(
+        status_code=400,
+        detail=f"Invalid {area.type} avoid area: circles need center and "
+        "radius_km, bboxes min_lat,min_lon,max_lat,max_lon, polygons 3+ points",
+    )
+
+
+def resolve_avoid(
+    names: Optional[List[str]], areas: Optional[List[AvoidArea]], stops: List[str]
+) -> frozenset:
+    """
+    Every node a request must not pass through, resolved once per request
+    and handed to all of its searches: the avoided names plus the nodes in
+    the avoid areas. Areas never block the request's own stops.
+    """
+    blocked = set(names or ())
+    for area in areas or ():
+        blocked.update(area_nodes(area))
+    if areas:
+        blocked.difference_update(set(stops) - set(names or ()))
+    return compile_avoid(blocked)
+
+
+def snap_location(location: Tuple[float, float], role: str) -> Dict:
+    """Snap coordinates given for a request stop onto the graph"""
+    snapped = routing_service.snap(*location)
+    if snapped is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"No edge within {SNAP_MAX_KM:g} km of {role} {list(location)}",
+        )
+    return snapped
+
+
+def nearest_end(snapped: Dict) -> str:
+    """The node a point snapped to, or the nearer end of its edge"""
+    if snapped["node"] is not None:
+        return snapped["node"]
+    return snapped["source"] if snapped["fraction"] <= 0.5 else snapped["target"]
+
+
+def snap_to_node(snapped: Dict, location: Tuple[float, float]) -> Dict:
+    """Move a snap from its edge to the nearer end of the edge"""
+    if snapped["node"] is None:
+        node = nearest_end(snapped)
+        lat, lon = routing_service.node_coordinates[node]
+        snapped.update(
+            node=node,
+            latitude=lat,
+            longitude=lon,
+            distance_km=dijkstra.calculate_distance(*location, lat, lon),
+        )
+    return snapped
+
+
+def snap_request(
+    request: PathRequest, virtual: bool = True
+) -> Tuple[PathRequest, Dict]:
+    """
+    Resolve the coordinates in a request to node names, through the in-memory
+    snap index rather than OSRM. A start or end on an edge keeps its snap as
+    a virtual node (the nearer end stands in for its name) when virtual is
+    set; waypoints always snap to a node. Returns the resolved request and
+    the snaps by stop ("start", "end", "waypoints" by index).
+    """
+    snaps: Dict = {}
+    update: Dict = {}
+    for role in ("start", "end"):
+        location = getattr(request, role)
+        if not isinstance(location, str):
+            snapped = snap_location(location, role)
+            update[role] = nearest_end(snapped)
+            if not virtual:
+                snap_to_node(snapped, location)
+            snaps[role] = snapped
+    if request.waypoints and not all(isinstance(w, str) for w in request.waypoints):
+        waypoints = []
+        for i, waypoint in enumerate(request.waypoints):
+            if isinstance(waypoint, str):
+                waypoints.append(waypoint)
+                continue
+            snapped = snap_location(waypoint, f"waypoint {i}")
+            waypoints.append(nearest_end(snapped))
+            snaps.setdefault("waypoints", {})[i] = snap_to_node(snapped, waypoint)
+        update["waypoints"] = waypoints
+    if not update:
+        return request, snaps
+    return request.model_copy(update=update), snaps
+
+
+def has_coordinates(request: PathRequest) -> bool:
+    """Whether any stop of the request is given as coordinates"""
+    stops = [request.start, request.end] + (request.waypoints or [])
+    return not all(isinstance(stop, str) for stop in stops)
+
+
+def snap_batch(requests: List[PathRequest]) -> List[Union[PathRequest, HTTPException]]:
+    """snap_request every query of a batch to nodes, the error for those that fail"""
+    snapped = []
+    for request in requests:
+        try:
+            snapped.append(snap_request(request, virtual=False)[0])
+        except HTTPException as e:
+            snapped.append(e)
+    return snapped
+
+
+def entry_costs(graph: DijkstraAlgorithm, snapped: Optional[Dict], node: str):
+    """
+    Nodes a route can leave a stop from (or reach it through), with the cost
+    of the part of the edge in between for a virtual node
+    """
+    if snapped is None or snapped["node"] is not None:
+        return {node: 0}
+    weight = graph.edge_weight(snapped["source"], snapped["target"])
+    if weight is None:
+        return {node: 0}
+    fraction = snapped["fraction"]
+    return {
+        snapped["source"]: fraction * weight,
+        snapped["target"]: (1 - fraction) * weight,
+    }
+
+
+def compact_route(route: Dict, request: PathRequest) -> Dict:
+    """Apply the geometry format and zoom simplification asked for in request"""
+    if request.geometry == "coordinates" and request.zoom is None:
+        return route
+    route["path"] = format_geometry(route["path"], request.geometry, request.zoom)
+    route["geometry_format"] = request.geometry
+    return route
 
 
 class KValueUpdate(BaseModel):
     k: int
 
 
-def find_k_nearest_neighbors(
-    node: Node, existing_nodes: List[Node], k: int = 3
-) -> List[Tuple[Node, float]]:
-    """Find the k nearest neighbors for a given node"""
-    distances = []
-    for existing_node in existing_nodes:
-        if existing_node.id != node.id:  # Don't include the node itself
-            # Check if both nodes have coordinates
-            if (
-                node.latitude is None
-                or node.longitude is None
-                or existing_node.latitude is None
-                or existing_node.longitude is None
-            ):
-                print(
-                    f"Skipping edge creation - missing coordinates for {node.name} or {existing_node.name}"
-                )
-                continue
+class NodeBulkDelete(BaseModel):
+    names: List[str]
 
-            distance = dijkstra.calculate_distance(
-                node.latitude,
-                node.longitude,
-                existing_node.latitude,
-                existing_node.longitude,
-            )
-            distances.append((existing_node, distance))
 
-    # Sort by distance and return k nearest
-    distances.sort(key=lambda x: x[1])
+class EdgeWeightUpdate(BaseModel):
+    source: str
+    target: str
+    # Either a new weight, or a factor applied to the straight-line distance
+    weight: Optional[EdgeWeight] = None
+    factor: Optional[EdgeWeight] = None
 
-    # Ensure we don't return more neighbors than available
-    k = min(k, len(distances))
 
-    return distances[:k]
+class EdgeWeightBatch(BaseModel):
+    updates: List[EdgeWeightUpdate]
 
 
 @app.post("/nodes/")
-async def add_node(node: NodeCreate, db: Session = Depends(get_db)):
+def add_node(node: NodeCreate, db: Session = Depends(get_db)):
     try:
         # Check if node already exists
         db_node = db.query(Node).filter(Node.name == node.name).first()
@@ -174,12 +666,17 @@ async def add_node(node: NodeCreate, db: Session = Depends(get_db)):
         db.add(db_node)
         db.commit()
         db.refresh(db_node)
+        node_name_index.add(node.name)
+        spatial_index.add(node.name, node.latitude, node.longitude)
 
-        # Update in-memory graph
-        dijkstra.graph[node.name] = []
+        # The shared graph is read-only and gets republished by graph_changed
+        update_in_place = shared_graph_store is None
+        if update_in_place:
+            # Update in-memory graph
+            dijkstra.add_node(node.name)
 
-        # Add node to routing service
-        routing_service.add_node(node.name, node.latitude, node.longitude)
+            # Add node to routing service
+            routing_service.add_node(node.name, node.latitude, node.longitude)
 
         # Get all existing nodes
         existing_nodes = db.query(Node).filter(Node.name != node.name).all()
@@ -202,17 +699,22 @@ async def add_node(node: NodeCreate, db: Session = Depends(get_db)):
                     db.add(db_edge)
                     created_edges.append((neighbor.name, distance))
 
-                    # Update in-memory graph
-                    dijkstra.add_edge(node.name, neighbor.name, distance)
+                    if update_in_place:
+                        # Update in-memory graph
+                        dijkstra.add_edge(node.name, neighbor.name, distance)
 
-                    # Add edge to routing service
-                    routing_service.add_edge(node.name, neighbor.name)
+                        # Add edge to routing service
+                        routing_service.add_edge(node.name, neighbor.name, distance)
                 except Exception as edge_error:
-                    print(f"Error creating edge to {neighbor.name}: {str(edge_error)}")
+                    logger.warning(
+                        "Error creating edge to %s: %s", neighbor.name, edge_error
+                    )
                     continue
 
             db.commit()
 
+        graph_changed()
+
         return {
             "message": f"Added node {node.name}",
             "connected_to": (
@@ -223,12 +725,12 @@ async def add_node(node: NodeCreate, db: Session = Depends(get_db)):
         }
     except Exception as e:
         db.rollback()
-        print(f"Error adding node: {str(e)}")
+        logger.error("Error adding node: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @app.post("/edges/")
-async def add_edge(edge: EdgeCreate, db: Session = Depends(get_db)):
+def add_edge(edge: EdgeCreate, db: Session = Depends(get_db)):
     try:
         # Get source and target nodes
         source_node = db.query(Node).filter(Node.name == edge.source).first()
@@ -255,10 +757,12 @@ async def add_edge(edge: EdgeCreate, db: Session = Depends(get_db)):
         db.add(db_edge)
         db.commit()
 
-        # Update in-memory graph
-        dijkstra.add_edge(edge.source, edge.target, edge.weight)
+        if shared_graph_store is None:
+            # Update in-memory graph
+            dijkstra.add_edge(edge.source, edge.target, edge.weight)
 
-        routing_service.add_edge(edge.source, edge.target)
+            routing_service.add_edge(edge.source, edge.target, edge.weight)
+        graph_changed()
 
         return {
             "message": f"Added edge from {edge.source} to {edge.target}",
@@ -269,17 +773,124 @@ async def add_edge(edge: EdgeCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/edges/weights/")
+def update_edge_weights(batch: EdgeWeightBatch, db: Session = Depends(get_db)):
+    """
+    Change the weights of many existing edges at once (e.g. traffic factors).
+    The database and graphs are updated in place, with no rebuild: the
+    in-memory graphs, the shared graph file (GRAPH_MODE=shared) or the process
+    workers' snapshots through their update log. Precomputed trees are only
+    dropped if the new weights can change them.
+    """
+    try:
+        names = {name for u in batch.updates for name in (u.source, u.target)}
+        nodes = {
+            node.name: node for node in db.query(Node).filter(Node.name.in_(names))
+        }
+
+        # (source_id, target_id) -> new weight, in both directions
+        weights: Dict[Tuple[int, int], float] = {}
+        not_found = []
+        for update in batch.updates:
+            if (update.weight is None) == (update.factor is None):
+                raise HTTPException(
+                    status_code=400,
+                    detail="Give either a weight or a factor for each edge",
+                )
+            source = nodes.get(update.source)
+            target = nodes.get(update.target)
+            if source is None or target is None:
+                not_found.append({"source": update.source, "target": update.target})
+                continue
+            if update.weight is not None:
+                weight = update.weight
+            else:
+                weight = update.factor * dijkstra.calculate_distance(
+                    source.latitude,
+                    source.longitude,
+                    target.latitude,
+                    target.longitude,
+                )
+            weights[(source.id, target.id)] = weight
+            weights[(target.id, source.id)] = weight
+
+        ids = {node_id for pair in weights for node_id in pair}
+        found = set()
+        with DB_PHASE_SECONDS.time(phase="update_weights"):
+            for edge in db.query(Edge).filter(
+                Edge.source_id.in_(ids), Edge.target_id.in_(ids)
+            ):
+                weight = weights.get((edge.source_id, edge.target_id))
+                if weight is not None:
+                    edge.weight = weight
+                    found.add(frozenset((edge.source_id, edge.target_id)))
+            db.commit()
+
+        names_by_id = {node.id: node.name for node in nodes.values()}
+        applied = []
+        for (source_id, target_id), weight in weights.items():
+            if source_id < target_id:
+                if frozenset((source_id, target_id)) in found:
+                    applied.append(
+                        (names_by_id[source_id], names_by_id[target_id], weight)
+                    )
+                else:
+                    not_found.append(
+                        {
+                            "source": names_by_id[source_id],
+                            "target": names_by_id[target_id],
+                        }
+                    )
+
+        if shared_graph_store is None:
+            dijkstra.update_edge_weights(applied)
+            old_version = routing_service.dijkstra.version
+            routing_service.update_edge_weights(applied)
+            routing_executor.update_edge_weights(applied)
+        else:
+            sync_shared_graph()
+            old_version = routing_service.dijkstra.version
+            durations = routing_service.duration_updates(applied)
+            with shared_graph_store.build_lock():
+                shared_graph_store.update_weights(applied, durations)
+            sync_shared_graph()
+        kept, dropped = ai_pathfinder.revalidate_trees(
+            applied, old_version, routing_service.dijkstra.version
+        )
+        return {
+            "updated": len(applied),
+            "not_found": not_found,
+            "trees_kept": kept,
+            "trees_dropped": dropped,
+        }
+    except HTTPException:
+        db.rollback()
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.post("/import/json/")
 async def import_json(data: Dict, db: Session = Depends(get_db)):
     try:
-        print("Received data:", data)
-        nodes_data = data.get("nodes", {})
-        edges_data = data.get("edges", [])
+        return await routing_executor.run_blocking(import_graph_data, data, db)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def import_graph_data(data: Dict, db: Session) -> Dict:
+    """Store imported nodes, connect them with KNN edges and reload the in-memory graph"""
+    nodes_data = data.get("nodes", {})
+    edges_data = data.get("edges", [])
 
-        print(f"Processing {len(nodes_data)} nodes and {len(edges_data)} edges")
+    logger.info(
+        "Processing %d nodes and %d edges", len(nodes_data), len(edges_data)
+    )
 
-        # Add new nodes
-        print("Adding nodes...")
+    # Add new nodes
+    with DB_PHASE_SECONDS.time(phase="import_nodes"):
         for name, coords in nodes_data.items():
             try:
                 # Check if node already exists
@@ -287,104 +898,153 @@ async def import_json(data: Dict, db: Session = Depends(get_db)):
                 if not existing_node:
                     db_node = Node(name=name, latitude=coords[0], longitude=coords[1])
                     db.add(db_node)
-                    print(f"Added node: {name} with coordinates {coords}")
-
-                    # Also add to routing service
-                    routing_service.add_node(name, coords[0], coords[1])
-                    print(f"Added node to routing service: {name}")
-                else:
-                    # If node exists in DB but not in routing service, add it
-                    if name not in routing_service.node_coordinates:
-                        routing_service.add_node(
-                            name, existing_node.latitude, existing_node.longitude
-                        )
-                        print(f"Added existing node to routing service: {name}")
+                    logger.debug("Added node: %s with coordinates %s", name, coords)
             except Exception as node_error:
-                print(f"Error adding node {name}: {str(node_error)}")
+                logger.error("Error adding node %s: %s", name, node_error)
                 raise
         db.commit()
-        print("Nodes added successfully")
+    logger.info("Nodes added, creating edges using KNN")
 
-        # For each node, find and create edges to its k nearest neighbors
-        print("Creating edges using KNN...")
-        all_nodes = db.query(Node).all()
+    # For each node, find and create edges to its k nearest neighbors
+    with DB_PHASE_SECONDS.time(phase="import_edges"):
+        create_import_edges(db)
+    logger.info("Edges created, updating in-memory graph")
 
-        for node in all_nodes:
-            nearest_neighbors = find_k_nearest_neighbors(node, all_nodes, K_VALUE)
+    # Update in-memory graph
+    load_graph_from_db(db)
 
-            for neighbor, distance in nearest_neighbors:
-                # Check if edge already exists
-                existing_edge = (
-                    db.query(Edge)
-                    .filter(
-                        ((Edge.source_id == node.id) & (Edge.target_id == neighbor.id))
-                        | (
-                            (Edge.source_id == neighbor.id)
-                            & (Edge.target_id == node.id)
-                        )
-                    )
-                    .first()
-                )
+    return {"message": "Data imported successfully"}
 
-                if not existing_edge:
-                    db_edge = Edge(
-                        source_id=node.id, target_id=neighbor.id, weight=distance
-                    )
-                    db.add(db_edge)
-                    print(
-                        f"Added edge: {node.name} -> {neighbor.name} with weight {distance}"
+
+def create_import_edges(db: Session):
+    """Connect every node to its k nearest neighbors, skipping existing edges"""
+    all_nodes = db.query(Node).all()
+
+    for node in all_nodes:
+        nearest_neighbors = find_k_nearest_neighbors(node, all_nodes, K_VALUE)
+
+        for neighbor, distance in nearest_neighbors:
+            # Check if edge already exists
+            existing_edge = (
+                db.query(Edge)
+                .filter(
+                    ((Edge.source_id == node.id) & (Edge.target_id == neighbor.id))
+                    | (
+                        (Edge.source_id == neighbor.id)
+                        & (Edge.target_id == node.id)
                     )
+                )
+                .first()
+            )
 
-        db.commit()
-        print("Edges created successfully")
+            if not existing_edge:
+                db_edge = Edge(
+                    source_id=node.id, target_id=neighbor.id, weight=distance
+                )
+                db.add(db_edge)
+                logger.debug(
+                    "Added edge: %s -> %s with weight %s",
+                    node.name,
+                    neighbor.name,
+                    distance,
+                )
 
-        # Update in-memory graph
-        print("Updating in-memory graph...")
-        dijkstra.graph = {}
-        for node in db.query(Node).all():
-            dijkstra.graph[node.name] = []
-
-        for edge in db.query(Edge).all():
-            source = db.query(Node).filter(Node.id == edge.source_id).first()
-            target = db.query(Node).filter(Node.id == edge.target_id).first()
-            dijkstra.add_edge(source.name, target.name, edge.weight)
-        print("In-memory graph updated successfully")
-
-        return {"message": "Data imported successfully"}
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
+    db.commit()
 
 
 @app.get("/export/")
-async def export_data(db: Session = Depends(get_db)):
+async def export_data():
     try:
-        nodes = {}
-        edges = []
-
-        # Get all nodes
-        db_nodes = db.query(Node).all()
-        for node in db_nodes:
-            nodes[node.name] = [node.latitude, node.longitude]
-
-        # Get all edges
-        db_edges = db.query(Edge).all()
-        for edge in db_edges:
-            source = db.query(Node).filter(Node.id == edge.source_id).first()
-            target = db.query(Node).filter(Node.id == edge.target_id).first()
-            edges.append([source.name, target.name, edge.weight])
-
-        return {"nodes": nodes, "edges": edges}
+        return await run_in_session(read_json, read_export)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def read_json(db: Session, read: Callable[[Session], Any]) -> Response:
+    """
+    Run a reader and encode its result on the DB thread too: encoding the
+    full node or edge list takes longer than the query, and an async
+    endpoint's return value would otherwise be encoded on the event loop
+    """
+    # Same encoding as JSONResponse
+    content = json.dumps(
+        read(db), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    )
+    return Response(content.encode("utf-8"), media_type="application/json")
+
+
+def read_export(db: Session) -> Dict:
+    """Every node and edge, in the format /import/json/ accepts"""
+    with DB_PHASE_SECONDS.time(phase="export"):
+        nodes = read_nodes(db)
+        edges = [list(row) for row in read_edges(db)]
+    return {"nodes": nodes, "edges": edges}
+
+
+def read_nodes(db: Session) -> Dict[str, List[float]]:
+    """{name: [lat, lon]} of every node, without loading ORM objects"""
+    rows = db.query(Node.name, Node.latitude, Node.longitude).all()
+    return {name: [lat, lon] for name, lat, lon in rows}
+
+
+def read_edge_list(db: Session) -> List[Dict]:
+    return [
+        {"source": source_name, "target": target_name, "weight": weight}
+        for source_name, target_name, weight in read_edges(db)
+    ]
+
+
+def read_edges(db: Session) -> List[Tuple[str, str, float]]:
+    """(source, target, weight) of every edge, names resolved in one join"""
+    source, target = aliased(Node), aliased(Node)
+    return (
+        db.query(source.name, target.name, Edge.weight)
+        .join(source, Edge.source_id == source.id)
+        .join(target, Edge.target_id == target.id)
+        .all()
+    )
+
+
 @app.post("/path/")
-async def find_path(request: PathRequest):
+async def find_path(
+    request: PathRequest,
+    profile: bool = False,
+    x_profile: Optional[str] = Header(None),
+):
+    """
+    Route through the graph and OSRM. Stops given as [lat, lon] are snapped
+    onto the graph and reported under "snapped". With ?profile=true (or an
+    X-Profile header) the response carries a phase-by-phase timing breakdown,
+    and a cProfile dump when PROFILE_DIR is set.
+    """
+    enabled = is_requested(profile, x_profile)
+    with profile_request("path", enabled) as request_profile:
+        snaps = {}
+        if has_coordinates(request):
+            # The first snap builds the edge index, keep it off the event loop
+            with phase("snap"):
+                request, snaps = await routing_executor.run_blocking(
+                    snap_request, request
+                )
+        route = await compute_path(request, snaps)
+        if snaps:
+            route["snapped"] = snaps
+        if request_profile is not None:
+            route["profile"] = request_profile.summary()
+        return route
+
+
+async def compute_path(request: PathRequest, snaps: Optional[Dict] = None) -> Dict:
+    """Route a request whose stops are node names, snapped by snap_request"""
+    snaps = snaps or {}
     try:
-        logger.info(f"Finding path from {request.start} to {request.end}")
-        logger.info(f"Waypoints: {request.waypoints}")
-        logger.info(f"Avoid: {request.avoid}")
+        logger.debug(
+            "Finding path from %s to %s, waypoints %s, avoid %s",
+            request.start,
+            request.end,
+            request.waypoints,
+            request.avoid,
+        )
 
         # Check if nodes exist in the graph
         if request.start not in dijkstra.graph:
@@ -412,17 +1072,79 @@ async def find_path(request: PathRequest):
                         detail=f"Avoid node '{node}' not found in the graph",
                     )
 
-        route = routing_service.find_route(
-            request.start, request.end, request.waypoints, request.avoid
+        # Dijkstra runs in the search pool, OSRM calls in the blocking pool
+        routing_service.validate_nodes(
+            [request.start, request.end] + (request.waypoints or [])
         )
+        ai_pathfinder.record_query(request.start, request.end, request.waypoints)
+
+        stops = [request.start] + (request.waypoints or []) + [request.end]
+        # Virtual nodes on an edge are reached through both ends of the edge
+        virtual = {
+            role: snaps[role]
+            for role in ("start", "end")
+            if role in snaps and snaps[role]["node"] is None
+        }
+        edge_ends = [
+            node
+            for snapped in virtual.values()
+            for node in (snapped["source"], snapped["target"])
+        ]
+        with phase("avoid"):
+            avoid = resolve_avoid(
+                request.avoid, request.avoid_areas, stops + edge_ends
+            )
+
+        # Stops in different components can't be joined, no search needed
+        for source, target in zip(stops, stops[1:]):
+            if not routing_service.dijkstra.connected(source, target):
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"No valid path found from {request.start} to {request.end}: "
+                    f"{source} and {target} are not connected",
+                )
+
+        if virtual:
+            return await compute_point_path(request, virtual, avoid)
+        if request.weighting == "duration":
+            return await compute_fastest_path(request, avoid)
 
-        if not route:
+        precomputed = None
+        if not request.waypoints and not avoid:
+            with phase("precomputed_lookup"):
+                precomputed = ai_pathfinder.lookup(
+                    routing_service.dijkstra, request.start, request.end
+                )
+
+        if precomputed is not None:
+            path, _ = precomputed
+        else:
+            with phase("search"):
+                if request.waypoints:
+                    path, _ = await routing_executor.search(
+                        "find_path_with_waypoints",
+                        request.start,
+                        request.waypoints,
+                        request.end,
+                        avoid,
+                    )
+                else:
+                    path, _ = await routing_executor.search(
+                        "find_shortest_path", request.start, request.end, avoid
+                    )
+
+        if not path:
             raise HTTPException(
                 status_code=404,
                 detail=f"No valid path found from {request.start} to {request.end}",
             )
 
-        return route
+        with phase("osrm"):
+            route = await routing_executor.run_blocking(
+                routing_service.build_route, path, request.avoid
+            )
+        with phase("geometry"):
+            return compact_route(route, request)
     except HTTPException as he:
         raise he
     except Exception as e:
@@ -431,169 +1153,594 @@ async def find_path(request: PathRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/nlp-path/")
-async def nlp_path_query(query: dict = Body(...), db: Session = Depends(get_db)):
-    user_query = query.get("query")
-    current_route = query.get("current_route")
-    language = query.get("language", "en")  # Default to English if not specified
+def seconds_of_day(t: Optional[datetime]) -> Optional[float]:
+    """Departure time as used by the time-dependent search"""
+    if t is None:
+        return None
+    return t.hour * 3600 + t.minute * 60 + t.second
 
-    if not user_query:
-        raise HTTPException(status_code=400, detail="No query provided.")
 
-    # Get all nodes from database
-    db_nodes = db.query(Node).all()
-    node_names = [node.name for node in db_nodes]
-    node_list_str = ", ".join(node_names)
+async def compute_fastest_path(request: PathRequest, avoid: frozenset) -> Dict:
+    """Route minimizing travel time, on the duration graph"""
+    departure = seconds_of_day(request.departure_time)
+
+    with phase("search"):
+        path, travel_time = await routing_executor.run_blocking(
+            routing_service.duration_dijkstra.find_path_with_waypoints,
+            request.start,
+            request.waypoints or [],
+            request.end,
+            avoid,
+            departure,
+        )
+    if not path:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No valid path found from {request.start} to {request.end}",
+        )
+
+    with phase("osrm"):
+        route = await routing_executor.run_blocking(
+            routing_service.build_route, path, request.avoid
+        )
+    # Travel time predicted by the local search, next to OSRM's own duration
+    route["travel_time"] = travel_time
+    with phase("geometry"):
+        return compact_route(route, request)
+
+
+async def compute_point_path(
+    request: PathRequest, virtual: Dict[str, Dict], avoid: frozenset
+) -> Dict:
+    """
+    Route from or to virtual nodes on edges, by distance or by (static)
+    duration. The search leaves the start through whichever end of its edge
+    is cheaper overall, and reaches the end the same way.
+    """
+    if request.weighting == "duration":
+        graph = routing_service.duration_dijkstra
+    else:
+        graph = routing_service.dijkstra
+    start, end = virtual.get("start"), virtual.get("end")
+    starts = entry_costs(graph, start, request.start)
+    ends = entry_costs(graph, end, request.end)
+
+    with phase("search"):
+        if graph is routing_service.dijkstra:
+            path, cost = await routing_executor.search(
+                "find_path_between_points", starts, request.waypoints or [], ends, avoid
+            )
+        else:
+            path, cost = await routing_executor.run_blocking(
+                graph.find_path_between_points,
+                starts,
+                request.waypoints or [],
+                ends,
+                avoid,
+            )
+    # Both points on the same edge: following the edge may beat leaving it
+    if (
+        start is not None
+        and end is not None
+        and not request.waypoints
+        and (start["source"], start["target"]) == (end["source"], end["target"])
+    ):
+        weight = graph.edge_weight(start["source"], start["target"])
+        if weight is not None:
+            direct = abs(start["fraction"] - end["fraction"]) * weight
+            if direct <= cost:
+                path, cost = [], direct
+    if not path and cost == float("infinity"):
+        raise HTTPException(
+            status_code=404,
+            detail=f"No valid path found from {request.start} to {request.end}",
+        )
+
+    with phase("osrm"):
+        route = await routing_executor.run_blocking(
+            routing_service.build_route,
+            path,
+            request.avoid,
+            (start["latitude"], start["longitude"]) if start else None,
+            (end["latitude"], end["longitude"]) if end else None,
+        )
+    if request.weighting == "duration":
+        route["travel_time"] = cost
+    with phase("geometry"):
+        return compact_route(route, request)
+
+
+@app.post("/isochrone/")
+async def isochrone(request: IsochroneRequest):
+    """
+    All nodes reachable from start within a distance (km) or driving time
+    (minutes) budget, cheapest first, optionally with the convex hull of
+    their coordinates.
+    """
+    if (request.max_distance is None) == (request.max_minutes is None):
+        raise HTTPException(
+            status_code=400, detail="Give either max_distance or max_minutes"
+        )
+    limit = (
+        request.max_minutes if request.max_distance is None else request.max_distance
+    )
+    # Written this way round to reject NaN too
+    if not limit >= 0:
+        raise HTTPException(
+            status_code=400, detail="max_distance and max_minutes can't be negative"
+        )
+    if request.start not in routing_service.node_coordinates:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Start node '{request.start}' not found in the graph",
+        )
+
+    if request.max_distance is not None:
+        graph, budget, unit = routing_service.dijkstra, request.max_distance, "km"
+        departure = None
+    else:
+        graph, budget, unit = (
+            routing_service.duration_dijkstra,
+            request.max_minutes * 60,
+            "minutes",
+        )
+        departure = seconds_of_day(request.departure_time)
+
+    avoid = resolve_avoid(request.avoid, request.avoid_areas, [request.start])
+    reachable = await routing_executor.run_blocking(
+        graph.reachable_within, request.start, budget, avoid, departure
+    )
+
+    coordinates = routing_service.node_coordinates
+    scale = 60 if unit == "minutes" else 1
+    nodes = [
+        {
+            "node": node,
+            "cost": cost / scale,
+            "latitude": coordinates[node][0],
+            "longitude": coordinates[node][1],
+        }
+        for node, cost in sorted(reachable.items(), key=lambda item: item[1])
+        if node in coordinates
+    ]
+    result = {"start": request.start, "unit": unit, "nodes": nodes}
+    if request.hull:
+        result["hull"] = convex_hull(
+            [(node["latitude"], node["longitude"]) for node in nodes]
+        )
+    return result
+
+
+@app.post("/nearest-facilities/")
+async def nearest_facilities(request: NearestFacilitiesRequest):
+    """
+    The k facilities nearest to each target by distance (km) or driving time
+    (minutes), with the path from each facility to the target, found with a
+    single multi-source search instead of one search per facility.
+    """
+    graph = dijkstra.graph
+    missing = [
+        name for name in request.facilities + request.targets if name not in graph
+    ]
+    if missing:
+        raise HTTPException(
+            status_code=400, detail=f"Nodes not found: {', '.join(missing)}"
+        )
+    if not request.facilities or not request.targets:
+        raise HTTPException(
+            status_code=400, detail="Give at least one facility and one target"
+        )
+    if request.k < 1:
+        raise HTTPException(status_code=400, detail="k must be at least 1")
+
+    avoid = resolve_avoid(
+        request.avoid, request.avoid_areas, request.facilities + request.targets
+    )
+    if request.weighting == "duration":
+        nearest = await routing_executor.run_blocking(
+            routing_service.duration_dijkstra.nearest_sources,
+            request.facilities,
+            request.targets,
+            request.k,
+            avoid,
+        )
+        unit, scale = "minutes", 60
+    else:
+        nearest = await routing_executor.search(
+            "nearest_sources", request.facilities, request.targets, request.k, avoid
+        )
+        unit, scale = "km", 1
+
+    async def facility_result(facility: str, path: List[str], cost: float):
+        result = {"facility": facility, "cost": cost / scale, "node_sequence": path}
+        if request.include_geometry:
+            result["route"] = await routing_executor.run_blocking(
+                routing_service.build_route, path, request.avoid
+            )
+        return result
+
+    results = []
+    for target in dict.fromkeys(request.targets):
+        facilities = await asyncio.gather(
+            *(facility_result(*found) for found in nearest[target])
+        )
+        results.append({"target": target, "facilities": list(facilities)})
+    return {"unit": unit, "k": request.k, "results": results}
+
 
+@app.post("/travel-times/refresh")
+async def refresh_travel_times():
+    """Fetch OSRM durations for all edges that don't have one yet"""
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-
-        if current_route:
-            # Handle follow-up questions about the current route
-            if language == "ro":
-                prompt = (
-                    f"Ruta curentă: {current_route['path']}\n"
-                    f"Distanța totală: {current_route['distance']} km\n\n"
-                    f"Întrebarea utilizatorului: {user_query}\n\n"
-                    "Oferă un răspuns util despre rută, concentrându-te pe:\n"
-                    "- Atracții turistice și activități\n"
-                    "- Bucătărie locală și restaurante\n"
-                    "- Evenimente culturale și festivaluri\n"
-                    "- Sfaturi și recomandări de călătorie\n"
-                    "Fă răspunsul conversațional și captivant."
+        result = await routing_executor.run_blocking(
+            routing_service.fetch_travel_times
+        )
+        if shared_graph_store is not None:
+            # Durations live in the shared graph file: publish a new one
+            await routing_executor.run_blocking(republish_shared_graph)
+        return result
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+
+
+@app.post("/path/batch")
+async def find_path_batch(batch: BatchPathRequest):
+    """
+    Answer many path queries in one request, streamed back as NDJSON.
+    Queries are grouped by start node, avoid list, weighting and departure
+    time so each group shares its shortest-path trees; every line carries
+    the index of its query.
+    """
+    graph = dijkstra.graph
+    groups: Dict[
+        Tuple[str, frozenset, str, Optional[float]], List[Tuple[int, PathRequest]]
+    ] = {}
+    invalid = []
+    requests = batch.requests
+    if any(has_coordinates(request) for request in requests):
+        # Grouping needs node names: coordinates snap to the nearest node
+        requests = await routing_executor.run_blocking(snap_batch, requests)
+    for index, request in enumerate(requests):
+        if isinstance(request, HTTPException):
+            invalid.append(
+                {"index": index, "status": "error", "detail": request.detail}
+            )
+            continue
+        names = [request.start, request.end] + (request.waypoints or [])
+        missing = [name for name in names + (request.avoid or []) if name not in graph]
+        if missing:
+            invalid.append(
+                {
+                    "index": index,
+                    "status": "error",
+                    "detail": f"Nodes not found: {', '.join(missing)}",
+                }
+            )
+            continue
+        stops = [request.start] + (request.waypoints or []) + [request.end]
+        try:
+            avoid = resolve_avoid(request.avoid, request.avoid_areas, stops)
+        except HTTPException as e:
+            invalid.append({"index": index, "status": "error", "detail": e.detail})
+            continue
+        departure = None
+        if request.weighting == "duration":
+            departure = seconds_of_day(request.departure_time)
+        key = (request.start, avoid, request.weighting, departure)
+        groups.setdefault(key, []).append((index, request))
+
+    async def search_group(
+        avoid: frozenset,
+        weighting: str,
+        departure: Optional[float],
+        items: List[Tuple[int, PathRequest]],
+    ):
+        queries = [(r.start, r.waypoints or [], r.end, avoid) for _, r in items]
+        try:
+            if weighting == "distance":
+                results = await routing_executor.search("find_paths_batch", queries)
+            elif departure is None:
+                results = await routing_executor.run_blocking(
+                    routing_service.duration_dijkstra.find_paths_batch, queries
                 )
             else:
-                prompt = (
-                    f"Current route: {current_route['path']}\n"
-                    f"Total distance: {current_route['distance']} km\n\n"
-                    f"User question: {user_query}\n\n"
-                    "Provide a helpful response about the route, focusing on:\n"
-                    "- Tourist attractions and activities\n"
-                    "- Local cuisine and restaurants\n"
-                    "- Cultural events and festivals\n"
-                    "- Travel tips and recommendations\n"
-                    "Make the response conversational and engaging."
+                # Time-dependent costs depend on the departure, no shared trees
+                results = await routing_executor.run_blocking(
+                    lambda: [
+                        routing_service.duration_dijkstra.find_path_with_waypoints(
+                            *query, departure
+                        )
+                        for query in queries
+                    ]
                 )
-            response = model.generate_content(prompt)
-            return {"response": response.text.strip()}
+        except Exception as e:
+            return [
+                {"index": index, "status": "error", "detail": str(e)}
+                for index, _ in items
+            ]
+        return [
+            (index, request, path, distance)
+            for (index, request), (path, distance) in zip(items, results)
+        ]
+
+    async def build_result(index: int, request: PathRequest, path, distance):
+        if not path:
+            return {
+                "index": index,
+                "status": "error",
+                "detail": f"No valid path found from {request.start} to {request.end}",
+            }
+        result = {"index": index, "status": "ok", "node_sequence": path}
+        # The search cost: km, or seconds on the duration graph
+        if request.weighting == "duration":
+            result["travel_time"] = distance
         else:
-            # Initial route calculation
-            if language == "ro":
-                prompt = (
-                    f"Locații disponibile: {node_list_str}\n\n"
-                    "Utilizatorul dorește recomandări de călătorie. Dacă nu a specificat o rută, întreabă-l să furnizeze un punct de plecare și o destinație din locațiile disponibile.\n"
-                    "Dacă a specificat o rută, extrage următoarele:\n"
-                    "- start: orașul de plecare (trebuie să fie din locațiile disponibile)\n"
-                    "- end: orașul destinație (trebuie să fie din locațiile disponibile)\n"
-                    "- waypoints: o listă de orașe sau regiuni prin care să treacă sau să se oprească (trebuie să fie din locațiile disponibile, poate fi goală)\n"
-                    "- avoid: o listă de orașe sau regiuni de evitat (trebuie să fie din locațiile disponibile, poate fi goală)\n"
-                    "- preferences: o listă de preferințe de rută (ex: 'picturesque', 'cea mai rapidă', 'evită autostrăzile', etc.)\n\n"
-                    "Dacă nu este specificată nicio rută, răspunde cu un JSON conținând doar o cheie 'message' cu un prompt prietenos cerând o rută.\n"
-                    "Dacă este specificată o rută, răspunde cu un JSON conținând: start, end, waypoints, avoid, preferences.\n"
-                    "Folosește doar locațiile disponibile pentru start, end, waypoints și avoid.\n\n"
-                    f'Query: "{user_query}"'
+            result["distance"] = distance
+        if batch.include_geometry:
+            try:
+                route = await routing_executor.run_blocking(
+                    routing_service.build_route, path, request.avoid
                 )
-            else:
-                prompt = (
-                    f"Available locations: {node_list_str}\n\n"
-                    "The user wants travel recommendations. If they haven't specified a route, ask them to provide a starting point and destination from the available locations.\n"
-                    "If they have specified a route, extract the following:\n"
-                    "- start: the starting city (must be from the available locations)\n"
-                    "- end: the destination city (must be from the available locations)\n"
-                    "- waypoints: a list of cities or regions to pass through or stop at (must be from the available locations, can be empty)\n"
-                    "- avoid: a list of cities or regions to avoid (must be from the available locations, can be empty)\n"
-                    "- preferences: a list of route preferences (e.g., 'scenic', 'fastest', 'avoid highways', etc.)\n\n"
-                    "If no route is specified, respond with a JSON containing only a 'message' key with a friendly prompt asking for a route.\n"
-                    "If a route is specified, respond with a JSON containing: start, end, waypoints, avoid, preferences.\n"
-                    "Only use the available locations for start, end, waypoints, and avoid.\n\n"
-                    f'Query: "{user_query}"'
+                result.update(compact_route(route, request))
+            except Exception as e:
+                result.update({"status": "error", "detail": str(e)})
+        return result
+
+    async def stream():
+        for error in invalid:
+            yield json.dumps(error) + "\n"
+
+        # Emit each result as soon as its group search (and geometry) is done
+        pending = {
+            asyncio.ensure_future(search_group(avoid, weighting, departure, items))
+            for (_, avoid, weighting, departure), items in groups.items()
+        }
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                outcome = task.result()
+                if isinstance(outcome, dict):
+                    yield json.dumps(outcome) + "\n"
+                    continue
+                for item in outcome:
+                    if isinstance(item, dict):
+                        yield json.dumps(item) + "\n"
+                    else:
+                        pending.add(asyncio.ensure_future(build_result(*item)))
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def followup_prompt(current_route: Dict, user_query: str, language: str) -> str:
+    """Prompt for a follow-up question about an already computed route"""
+    if language == "ro":
+        return (
+            f"Ruta curentă: {current_route['path']}\n"
+            f"Distanța totală: {current_route['distance']} km\n\n"
+            f"Întrebarea utilizatorului: {user_query}\n\n"
+            "Oferă un răspuns util despre rută, concentrându-te pe:\n"
+            "- Atracții turistice și activități\n"
+            "- Bucătărie locală și restaurante\n"
+            "- Evenimente culturale și festivaluri\n"
+            "- Sfaturi și recomandări de călătorie\n"
+            "Fă răspunsul conversațional și captivant."
+        )
+    return (
+        f"Current route: {current_route['path']}\n"
+        f"Total distance: {current_route['distance']} km\n\n"
+        f"User question: {user_query}\n\n"
+        "Provide a helpful response about the route, focusing on:\n"
+        "- Tourist attractions and activities\n"
+        "- Local cuisine and restaurants\n"
+        "- Cultural events and festivals\n"
+        "- Travel tips and recommendations\n"
+        "Make the response conversational and engaging."
+    )
+
+
+def route_extraction_prompt(node_list_str: str, user_query: str, language: str) -> str:
+    """Prompt asking the model to extract start, end, waypoints and avoid from a query"""
+    if language == "ro":
+        return (
+            f"Locații disponibile: {node_list_str}\n\n"
+            "Utilizatorul dorește recomandări de călătorie. Dacă nu a specificat o rută, întreabă-l să furnizeze un punct de plecare și o destinație din locațiile disponibile.\n"
+            "Dacă a specificat o rută, extrage următoarele:\n"
+            "- start: orașul de plecare (trebuie să fie din locațiile disponibile)\n"
+            "- end: orașul destinație (trebuie să fie din locațiile disponibile)\n"
+            "- waypoints: o listă de orașe sau regiuni prin care să treacă sau să se oprească (trebuie să fie din locațiile disponibile, poate fi goală)\n"
+            "- avoid: o listă de orașe sau regiuni de evitat (trebuie să fie din locațiile disponibile, poate fi goală)\n"
+            "- preferences: o listă de preferințe de rută (ex: 'picturesque', 'cea mai rapidă', 'evită autostrăzile', etc.)\n\n"
+            "Dacă nu este specificată nicio rută, răspunde cu un JSON conținând doar o cheie 'message' cu un prompt prietenos cerând o rută.\n"
+            "Dacă este specificată o rută, răspunde cu un JSON conținând: start, end, waypoints, avoid, preferences.\n"
+            "Folosește doar locațiile disponibile pentru start, end, waypoints și avoid.\n\n"
+            f'Query: "{user_query}"'
+        )
+    return (
+        f"Available locations: {node_list_str}\n\n"
+        "The user wants travel recommendations. If they haven't specified a route, ask them to provide a starting point and destination from the available locations.\n"
+        "If they have specified a route, extract the following:\n"
+        "- start: the starting city (must be from the available locations)\n"
+        "- end: the destination city (must be from the available locations)\n"
+        "- waypoints: a list of cities or regions to pass through or stop at (must be from the available locations, can be empty)\n"
+        "- avoid: a list of cities or regions to avoid (must be from the available locations, can be empty)\n"
+        "- preferences: a list of route preferences (e.g., 'scenic', 'fastest', 'avoid highways', etc.)\n\n"
+        "If no route is specified, respond with a JSON containing only a 'message' key with a friendly prompt asking for a route.\n"
+        "If a route is specified, respond with a JSON containing: start, end, waypoints, avoid, preferences.\n"
+        "Only use the available locations for start, end, waypoints, and avoid.\n\n"
+        f'Query: "{user_query}"'
+    )
+
+
+async def plan_nlp_route(
+    user_query: str, current_route: Optional[Dict], language: str
+) -> Dict:
+    """
+    Let the LLM parse the query and compute the route, without tourist info.
+    Returns {"response"} for follow-up questions, {"message"} when no route
+    was specified, or {"path", "distance", "preferences"}.
+    """
+    model = get_generative_model()
+
+    if current_route:
+        # Handle follow-up questions about the current route
+        prompt = followup_prompt(current_route, user_query, language)
+        response = await routing_executor.run_blocking(model.generate_content, prompt)
+        return {"response": response.text.strip()}
+
+    # Initial route calculation, listing only the locations the query plausibly
+    # mentions so the prompt size doesn't grow with the graph
+    with phase("name_retrieval"):
+        candidates = node_name_index.retrieve(user_query, NLP_PROMPT_MAX_LOCATIONS)
+    prompt = route_extraction_prompt(", ".join(candidates), user_query, language)
+    response = await routing_executor.run_blocking(model.generate_content, prompt)
+    content = response.text.strip()
+    json_str = extract_json_from_text(content)
+    if not json_str:
+        raise ValueError("No JSON found in model response.")
+    parsed = json.loads(json_str)
+
+    # If no route was specified, return a friendly message
+    if "message" in parsed:
+        msg = parsed["message"]
+        if "{route}" in msg or "{distance}" in msg:
+            route_str = ""
+            distance_val = 0
+            if current_route:
+                route_str = " → ".join(current_route.get("path", []))
+                distance_val = current_route.get("distance", 0)
+            msg = msg.replace("{route}", route_str)
+            msg = msg.replace("{distance}", f"{distance_val:.2f}")
+        return {"message": msg}
+
+    # Resolve every location to a node name once
+    resolved = {}
+    with phase("name_resolve"):
+        for key in ["start", "end"]:
+            resolved[key] = node_name_index.resolve(parsed.get(key))
+            if not resolved[key]:
+                raise ValueError(
+                    f"Location '{parsed.get(key)}' is not in the available nodes."
                 )
-            response = model.generate_content(prompt)
-            content = response.text.strip()
-            json_str = extract_json_from_text(content)
-            if not json_str:
-                raise ValueError("No JSON found in model response.")
-            parsed = json.loads(json_str)
-
-            # If no route was specified, return a friendly message
-            if "message" in parsed:
-                msg = parsed["message"]
-                if "{route}" in msg or "{distance}" in msg:
-                    route_str = ""
-                    distance_val = 0
-                    if current_route:
-                        route_str = " → ".join(current_route.get("path", []))
-                        distance_val = current_route.get("distance", 0)
-                    msg = msg.replace("{route}", route_str)
-                    msg = msg.replace("{distance}", f"{distance_val:.2f}")
-                return {
-                    "path": [],
-                    "distance": 0,
-                    "preferences": [],
-                    "tourist_info": {},
-                    "message": msg,
-                }
-
-            # Validate locations
-            for key in ["start", "end"]:
-                if parsed.get(key) not in node_names:
+        for key in ["waypoints", "avoid"]:
+            resolved[key] = []
+            for loc in parsed.get(key, []):
+                node = node_name_index.resolve(loc)
+                if not node:
                     raise ValueError(
-                        f"Location '{parsed.get(key)}' is not in the available nodes."
+                        f"Location '{loc}' is not in the available nodes."
                     )
-            for key in ["waypoints", "avoid"]:
-                for loc in parsed.get(key, []):
-                    if loc not in node_names:
-                        raise ValueError(
-                            f"Location '{loc}' is not in the available nodes."
-                        )
+                resolved[key].append(node)
 
-            start = find_node_fuzzy(parsed.get("start"), node_names)
-            end = find_node_fuzzy(parsed.get("end"), node_names)
-            waypoints = [
-                find_node_fuzzy(wp, node_names)
-                for wp in parsed.get("waypoints", [])
-                if find_node_fuzzy(wp, node_names)
-            ]
-            avoid = [
-                find_node_fuzzy(av, node_names)
-                for av in parsed.get("avoid", [])
-                if find_node_fuzzy(av, node_names)
-            ]
+    start, end = resolved["start"], resolved["end"]
+    waypoints, avoid = resolved["waypoints"], resolved["avoid"]
+
+    # Use waypoints if provided, else classic Dijkstra
+    with phase("search"):
+        if waypoints:
+            path, distance = await routing_executor.run_blocking(
+                dijkstra.find_path_with_waypoints, start, waypoints, end, avoid=avoid
+            )
+        else:
+            path, distance = await routing_executor.run_blocking(
+                dijkstra.find_shortest_path, start, end, avoid=avoid
+            )
 
-            if not start or not end:
-                raise ValueError("Start or end location not found in available nodes.")
+    return {
+        "path": path,
+        "distance": distance,
+        "preferences": parsed.get("preferences", []),
+    }
 
-            # Use waypoints if provided, else classic Dijkstra
-            if waypoints:
-                path, distance = dijkstra.find_path_with_waypoints(
-                    start, waypoints, end, avoid=avoid
-                )
-            else:
-                path, distance = dijkstra.find_shortest_path(start, end, avoid=avoid)
 
-            # Get tourist information for each node in the path
-            tourist_info = {}
-            for node in path:
-                if language == "ro":
-                    prompt = f"Oferă informații turistice pentru {node} incluzând:\n- Top 3 atracții de vizitat\n- 2 restaurante recomandate\n- Orice evenimente sau festivaluri speciale\n- Cel mai bun moment de vizitat\nFormatează răspunsul ca un JSON cu aceste chei: attractions, restaurants, events, best_time"
-                else:
-                    prompt = f"Provide tourist information for {node} including:\n- Top 3 attractions to visit\n- 2 recommended restaurants\n- Any special events or festivals\n- Best time to visit\nFormat the response as a JSON with these keys: attractions, restaurants, events, best_time"
-                response = model.generate_content(prompt)
-                content = response.text.strip()
-                json_str = extract_json_from_text(content)
-                if json_str:
-                    tourist_info[node] = json.loads(json_str)
+@app.post("/nlp-path/")
+async def nlp_path_query(
+    query: dict = Body(...),
+    profile: bool = False,
+    x_profile: Optional[str] = Header(None),
+):
+    """Like /path/, ?profile=true or X-Profile adds a timing breakdown"""
+    enabled = is_requested(profile, x_profile)
+    with profile_request("nlp-path", enabled) as request_profile:
+        result = await answer_nlp_query(query)
+        if request_profile is not None:
+            result["profile"] = request_profile.summary()
+        return result
+
+
+async def answer_nlp_query(query: dict) -> Dict:
+    user_query = query.get("query")
+    current_route = query.get("current_route")
+    language = query.get("language", "en")  # Default to English if not specified
+
+    if not user_query:
+        raise HTTPException(status_code=400, detail="No query provided.")
 
+    try:
+        result = await plan_nlp_route(user_query, current_route, language)
+        if "response" in result:
+            return result
+        if "message" in result:
             return {
-                "path": path,
-                "distance": distance,
-                "preferences": parsed.get("preferences", []),
-                "tourist_info": tourist_info,
+                "path": [],
+                "distance": 0,
+                "preferences": [],
+                "tourist_info": {},
+                "message": result["message"],
             }
+
+        # Get tourist information for each node in the path
+        with phase("tourist_info"):
+            result["tourist_info"] = await tourist_info_service.get_many(
+                result["path"], language
+            )
+        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/nlp-path/stream")
+async def nlp_path_stream(query: dict = Body(...)):
+    """
+    Streaming variant of /nlp-path/ as NDJSON events: the computed route is
+    sent as soon as it is known ("route"), followed by one "tourist_info"
+    event per node as its lookup completes, and a final "done" event.
+    Follow-up answers and prompts for a route come as "response"/"message".
+    """
+    user_query = query.get("query")
+    current_route = query.get("current_route")
+    language = query.get("language", "en")
+
+    if not user_query:
+        raise HTTPException(status_code=400, detail="No query provided.")
+
+    async def stream():
+        try:
+            result = await plan_nlp_route(user_query, current_route, language)
+            if "response" in result:
+                yield json.dumps({"type": "response", **result}) + "\n"
+            elif "message" in result:
+                yield json.dumps({"type": "message", **result}) + "\n"
+            elif not result["path"]:
+                yield json.dumps(
+                    {"type": "error", "detail": "No valid path found for this query"}
+                ) + "\n"
+            else:
+                yield json.dumps({"type": "route", **result}) + "\n"
+                async for node, info in tourist_info_service.iter_completed(
+                    result["path"], language
+                ):
+                    yield json.dumps(
+                        {"type": "tourist_info", "node": node, "info": info}
+                    ) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+        yield json.dumps({"type": "done"}) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @app.post("/tourist-info/")
 async def get_tourist_info(route: dict = Body(...)):
     """Get tourist information for a list of locations"""
@@ -604,61 +1751,118 @@ async def get_tourist_info(route: dict = Body(...)):
         raise HTTPException(status_code=400, detail="No locations provided.")
 
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        tourist_info = {}
-
-        for location in locations:
-            if language == "ro":
-                prompt = f"Oferă informații turistice pentru {location} incluzând:\n- Top 3 atracții de vizitat\n- 2 restaurante recomandate\n- Orice evenimente sau festivaluri speciale\n- Cel mai bun moment de vizitat\nFormatează răspunsul ca un JSON cu aceste chei: attractions, restaurants, events, best_time"
-            else:
-                prompt = f"Provide tourist information for {location} including:\n- Top 3 attractions to visit\n- 2 recommended restaurants\n- Any special events or festivals\n- Best time to visit\nFormat the response as a JSON with these keys: attractions, restaurants, events, best_time"
-            response = model.generate_content(prompt)
-            content = response.text.strip()
-            json_str = extract_json_from_text(content)
-            if json_str:
-                tourist_info[location] = json.loads(json_str)
-
+        tourist_info = await tourist_info_service.get_many(locations, language)
         return {"tourist_info": tourist_info}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def find_node(name, node_names):
-    name_norm = name.strip().lower()
-    for n in node_names:
-        if n.strip().lower() == name_norm:
-            return n
-    return None
+def parse_bbox(bbox: Optional[str]) -> Optional[Tuple[float, float, float, float]]:
+    if bbox is None:
+        return None
+    try:
+        values = tuple(float(value) for value in bbox.split(","))
+    except ValueError:
+        values = ()
+    if len(values) != 4 or values[0] > values[2] or values[1] > values[3]:
+        raise HTTPException(
+            status_code=400, detail="bbox must be min_lat,min_lon,max_lat,max_lon"
+        )
+    return values
 
 
-def find_node_fuzzy(name, node_names, threshold=80):
-    match, score, _ = process.extractOne(name, node_names, score_cutoff=threshold)
-    return match if score >= threshold else None
+def in_bbox(coordinates: Optional[Tuple[float, float]], bbox) -> bool:
+    if coordinates is None:
+        return False
+    min_lat, min_lon, max_lat, max_lon = bbox
+    return min_lat <= coordinates[0] <= max_lat and min_lon <= coordinates[1] <= max_lon
 
 
-def extract_json_from_text(text):
-    # Find JSON-like content in the text
-    json_pattern = r"\{[\s\S]*\}"
-    match = re.search(json_pattern, text)
-    if match:
-        return match.group(0)
-    return None
+def page_limit(limit: Optional[int]) -> int:
+    if limit is None:
+        return PAGE_LIMIT
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise HTTPException(
+            status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_LIMIT}"
+        )
+    return limit
+
+
+def encode_cursor(value) -> str:
+    """Opaque cursor: the sort key of the last item on the page"""
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]):
+    if cursor is None:
+        return None
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @app.get("/nodes/")
-async def get_nodes(db: Session = Depends(get_db)):
+async def get_nodes(
+    bbox: Optional[str] = None,
+    zoom: Optional[int] = Query(None, ge=0, le=MAX_ZOOM),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
+    """
+    All nodes as {name: [lat, lon]}, or, with any of the parameters, one page
+    of the nodes inside bbox ("min_lat,min_lon,max_lat,max_lon") in name
+    order: {"nodes", "clusters", "next_cursor"}. Below CLUSTER_MAX_ZOOM nearby
+    nodes are returned as clusters instead, and there is a single page.
+    """
+    if bbox is not None or zoom is not None or limit is not None or cursor is not None:
+        return await routing_executor.run_blocking(
+            get_nodes_page, parse_bbox(bbox), zoom, limit, cursor
+        )
     try:
-        nodes = {}
-        db_nodes = db.query(Node).all()
-        for node in db_nodes:
-            nodes[node.name] = [node.latitude, node.longitude]
-        return nodes
+        return await run_in_session(read_json, read_nodes)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def get_nodes_page(
+    box, zoom: Optional[int], limit: Optional[int], cursor: Optional[str]
+):
+    if zoom is not None and zoom < CLUSTER_MAX_ZOOM:
+        groups = spatial_index.clusters(
+            box or (-90, -180, 90, 180), CLUSTER_PIXELS * zoom_tolerance(zoom)
+        )
+        return {
+            "nodes": {
+                group["name"]: [group["latitude"], group["longitude"]]
+                for group in groups
+                if group["count"] == 1
+            },
+            "clusters": [
+                {key: group[key] for key in ("latitude", "longitude", "count")}
+                for group in groups
+                if group["count"] > 1
+            ],
+            "next_cursor": None,
+        }
+
+    limit = page_limit(limit)
+    after = decode_cursor(cursor)
+    nodes = {}
+    next_cursor = None
+    for name in spatial_index.names_from(after, box):
+        if name == after:
+            continue
+        if len(nodes) == limit:
+            next_cursor = encode_cursor(last)
+            break
+        nodes[name] = list(spatial_index.coordinates(name))
+        last = name
+    return {"nodes": nodes, "clusters": [], "next_cursor": next_cursor}
+
+
 @app.delete("/nodes/{node_name}")
-async def delete_node(node_name: str, db: Session = Depends(get_db)):
+def delete_node(node_name: str, db: Session = Depends(get_db)):
     try:
         # Find the node
         node = db.query(Node).filter(Node.name == node_name).first()
@@ -673,19 +1877,14 @@ async def delete_node(node_name: str, db: Session = Depends(get_db)):
         # Delete the node
         db.delete(node)
         db.commit()
+        node_name_index.remove(node_name)
+        spatial_index.remove(node_name)
 
         # Update in-memory graph
-        if node_name in dijkstra.graph:
-            del dijkstra.graph[node_name]
-            # Remove edges from other nodes that point to this node
-            for node_edges in dijkstra.graph.values():
-                node_edges[:] = [
-                    (target, weight)
-                    for target, weight in node_edges
-                    if target != node_name
-                ]
-
-        routing_service.remove_node(node_name)
+        if shared_graph_store is None:
+            dijkstra.remove_node(node_name)
+            routing_service.remove_node(node_name)
+        graph_changed()
 
         return {"message": f"Node {node_name} deleted successfully"}
     except Exception as e:
@@ -693,67 +1892,152 @@ async def delete_node(node_name: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+# Keeps IN (...) lists below the bind parameter limits of the databases
+BULK_DELETE_CHUNK = 500
+
+
+@app.post("/nodes/bulk-delete")
+def delete_nodes(request: NodeBulkDelete, db: Session = Depends(get_db)):
+    """Delete many nodes and their edges with a few queries and one graph update"""
+    try:
+        names = list(dict.fromkeys(request.names))
+        found = []
+        for i in range(0, len(names), BULK_DELETE_CHUNK):
+            chunk = names[i : i + BULK_DELETE_CHUNK]
+            rows = db.query(Node.id, Node.name).filter(Node.name.in_(chunk)).all()
+            ids = [row.id for row in rows]
+            if not ids:
+                continue
+            db.query(Edge).filter(
+                Edge.source_id.in_(ids) | Edge.target_id.in_(ids)
+            ).delete(synchronize_session=False)
+            db.query(Node).filter(Node.id.in_(ids)).delete(synchronize_session=False)
+            found.extend(row.name for row in rows)
+        db.commit()
+
+        for name in found:
+            node_name_index.remove(name)
+            spatial_index.remove(name)
+        if shared_graph_store is None:
+            dijkstra.remove_nodes(found)
+            routing_service.remove_nodes(found)
+        graph_changed()
+
+        found_set = set(found)
+        return {
+            "deleted": len(found),
+            "not_found": [name for name in names if name not in found_set],
+        }
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.get("/edges/")
-async def get_edges(db: Session = Depends(get_db)):
+async def get_edges(
+    bbox: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
+    """
+    All edges, or, with any of the parameters, one page of the edges with an
+    endpoint inside bbox, ordered by (source, target): {"edges", "next_cursor"}
+    """
+    if bbox is not None or limit is not None or cursor is not None:
+        return await routing_executor.run_blocking(
+            get_edges_page, parse_bbox(bbox), limit, cursor
+        )
     try:
-        edges = []
-        db_edges = db.query(Edge).all()
-        for edge in db_edges:
-            source = db.query(Node).filter(Node.id == edge.source_id).first()
-            target = db.query(Node).filter(Node.id == edge.target_id).first()
-            edges.append(
-                {"source": source.name, "target": target.name, "weight": edge.weight}
-            )
-        return edges
+        return await run_in_session(read_json, read_edge_list)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def get_edges_page(box, limit: Optional[int], cursor: Optional[str]):
+    limit = page_limit(limit)
+    after = decode_cursor(cursor)
+    graph = dijkstra.graph
+    edges = []
+    for source in spatial_index.names_from(after[0] if after else None, box):
+        previous = None
+        for target, weight in sorted(graph.get(source, ())):
+            if target == previous:
+                continue
+            previous = target
+            # An edge with both ends in view is listed once, from the smaller name
+            if target < source and (
+                in_bbox(spatial_index.coordinates(target), box)
+                if box is not None
+                else target in spatial_index
+            ):
+                continue
+            if after and (source, target) <= tuple(after):
+                continue
+            if len(edges) == limit:
+                last = edges[-1]
+                return {
+                    "edges": edges,
+                    "next_cursor": encode_cursor([last["source"], last["target"]]),
+                }
+            edges.append({"source": source, "target": target, "weight": weight})
+    return {"edges": edges, "next_cursor": None}
+
+
 @app.post("/update-k-value/")
 async def update_k_value(k_update: KValueUpdate, db: Session = Depends(get_db)):
     """Update the K value and rebuild the graph"""
-    global K_VALUE
     try:
         if k_update.k < 1:
             raise HTTPException(status_code=400, detail="K value must be at least 1")
         if k_update.k > 10:
             raise HTTPException(status_code=400, detail="K value cannot exceed 10")
 
-        print(f"\n=== Starting K value update to {k_update.k} ===")
-        K_VALUE = k_update.k
+        # The rebuild is O(n^2) in the number of nodes, keep it off the event loop
+        await routing_executor.run_blocking(rebuild_knn_graph, k_update.k, db)
 
-        # Clear existing edges
-        print("Clearing existing edges...")
-        db.query(Edge).delete()
-        db.commit()
-        print("Existing edges cleared")
+        sizes = routing_service.dijkstra.component_sizes()
+        return {
+            "message": f"Graph rebuilt with K={K_VALUE}",
+            # Small K over sparse regions can leave the graph disconnected
+            "components": len(sizes),
+            "largest_component": sizes[0] if sizes else 0,
+        }
+    except Exception as e:
+        db.rollback()
+        logger.error("Error updating K value: %s", e)
+        raise HTTPException(status_code=400, detail=str(e))
 
-        # Clear in-memory graph
-        print("Clearing in-memory graph...")
-        dijkstra.graph = {}
-        for node in db.query(Node).all():
-            dijkstra.graph[node.name] = []
-        print("In-memory graph cleared")
 
-        # Ensure routing service has all nodes before rebuilding edges
-        print("Ensuring routing service has all nodes...")
-        all_nodes = db.query(Node).all()
-        for node in all_nodes:
-            if node.name not in routing_service.node_coordinates:
-                routing_service.add_node(node.name, node.latitude, node.longitude)
-                print(f"Added missing node to routing service: {node.name}")
+def rebuild_knn_graph(k: int, db: Session):
+    """Replace all edges with a fresh KNN graph and swap in the new in-memory graphs"""
+    global K_VALUE
+
+    logger.info("Starting K value update to %d", k)
+    K_VALUE = k
+
+    with DB_PHASE_SECONDS.time(phase="rebuild_edges"):
+        # Clear existing edges (committed together with the new ones)
+        db.query(Edge).delete()
 
         # Rebuild graph with new K value
-        print(f"\nRebuilding graph with {len(all_nodes)} nodes")
+        all_nodes = db.query(Node).all()
+        logger.info("Rebuilding graph with %d nodes", len(all_nodes))
         total_edges = 0
+        # Checked once: formatting every node's neighbors is wasted when not logged
+        log_neighbors = logger.isEnabledFor(logging.DEBUG)
 
         for node in all_nodes:
             # Find k nearest neighbors for this node
             nearest_neighbors = find_k_nearest_neighbors(node, all_nodes, K_VALUE)
-            print(f"\nNode {node.name}:")
-            print(f"Found {len(nearest_neighbors)} neighbors")
-            for neighbor, distance in nearest_neighbors:
-                print(f"  - {neighbor.name} (distance: {distance:.2f})")
+            if log_neighbors:
+                logger.debug(
+                    "Node %s: %s",
+                    node.name,
+                    ", ".join(
+                        f"{neighbor.name} ({distance:.2f})"
+                        for neighbor, distance in nearest_neighbors
+                    ),
+                )
 
             # Create edges to k nearest neighbors
             for neighbor, distance in nearest_neighbors:
@@ -764,32 +2048,70 @@ async def update_k_value(k_update: KValueUpdate, db: Session = Depends(get_db)):
                 db.add(db_edge)
                 total_edges += 1
 
-                # Update in-memory graph
-                dijkstra.add_edge(node.name, neighbor.name, distance)
-
-                # Add edge to routing service
-                routing_service.add_edge(node.name, neighbor.name)
-
         db.commit()
-        print(f"\n=== Graph rebuild complete ===")
-        print(f"Total edges created: {total_edges}")
-        print(f"Average edges per node: {total_edges/len(all_nodes):.2f}")
 
-        return {"message": f"Graph rebuilt with K={K_VALUE}"}
-    except Exception as e:
-        db.rollback()
-        print(f"Error updating K value: {str(e)}")
-        raise HTTPException(status_code=400, detail=str(e))
+    # Build the new in-memory graphs aside and swap them in
+    load_graph_from_db(db)
+
+    logger.info(
+        "Graph rebuild complete: %d edges, %.2f per node",
+        total_edges,
+        total_edges / len(all_nodes) if all_nodes else 0,
+    )
 
 
 @app.get("/k-value/")
 async def get_k_value():
-    """Get the current K value"""
-    return {"k": K_VALUE}
+    """Get the current K value and how many components the graph has"""
+    return {
+        "k": K_VALUE,
+        "components": len(routing_service.dijkstra.component_sizes()),
+    }
+
+
+@app.get("/analytics/")
+async def get_analytics(limit: int = 10):
+    """Hottest route queries and nodes, and which sources are precomputed"""
+    return ai_pathfinder.get_stats(limit)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Search, OSRM, database, LLM and HTTP metrics in the Prometheus text format"""
+    executor = routing_executor.get_metrics()
+    EXECUTOR_JOBS.set(executor["queued"], state="queued")
+    EXECUTOR_JOBS.set(executor["active"], state="active")
+    GRAPH_NODES.set(len(dijkstra.graph))
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: 200 once the graph is loaded, 503 before"""
+    body = {
+        "ready": graph_ready,
+        "startup_mode": STARTUP_MODE,
+        "nodes": len(dijkstra.graph),
+        "import_seconds": STARTUP_SECONDS.value(phase="import"),
+        "graph_load_seconds": STARTUP_SECONDS.value(phase="graph_load"),
+    }
+    if not graph_ready:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
+@app.get("/executor-metrics/")
+async def get_executor_metrics():
+    """Queueing and throughput metrics of the routing worker pool"""
+    metrics = routing_executor.get_metrics()
+    metrics["database_pool"] = pool_status()
+    return metrics
 
 
 @app.post("/snap-to-road/")
-async def snap_to_road(coordinates: dict = Body(...)):
+def snap_to_road(coordinates: dict = Body(...)):
     """Snap coordinates to the nearest road point using OSRM"""
     try:
         lat = coordinates.get("latitude")
@@ -806,3 +2128,6 @@ async def snap_to_road(coordinates: dict = Body(...)):
         return {"latitude": snapped_lat, "longitude": snapped_lon}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+STARTUP_SECONDS.set(time.perf_counter() - _import_started, phase="import")
@@ -0,0 +1,256 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Seconds, from sub-millisecond searches up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Node counts for search effort (settled nodes, heap pushes)
+COUNT_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+
+
+def _format_labels(
+    labelnames: Sequence[str], values: Tuple[str, ...], extra: str = ""
+) -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        return lines + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # labels -> (per-bucket counts, sum, count)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(
+                key, ([0] * len(self.buckets), 0.0, 0)
+            )
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with-block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [
+                (key, list(counts), total, count)
+                for key, (counts, total, count) in self._values.items()
+            ]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide metrics, rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None,
+    ) -> Histogram:
+        return self._register(
+            Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS)
+        )
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Dijkstra searches (in process mode these are recorded inside the workers
+# and don't show up here; the executor metrics still cover them)
+SEARCH_SECONDS = REGISTRY.histogram(
+    "dijkstra_search_seconds", "Duration of Dijkstra searches", ["kind"]
+)
+SEARCH_SETTLED = REGISTRY.histogram(
+    "dijkstra_settled_nodes", "Nodes settled per search", ["kind"], COUNT_BUCKETS
+)
+SEARCH_PUSHES = REGISTRY.histogram(
+    "dijkstra_heap_pushes",
+    "Priority queue pushes per search",
+    ["kind"],
+    COUNT_BUCKETS,
+)
+
+# OSRM HTTP calls
+OSRM_REQUESTS = REGISTRY.counter(
+    "osrm_requests_total",
+    "OSRM requests by service and outcome",
+    ["service", "outcome"],
+)
+OSRM_SECONDS = REGISTRY.histogram(
+    "osrm_request_seconds", "Duration of OSRM requests, including retries", ["service"]
+)
+OSRM_RETRIES = REGISTRY.counter(
+    "osrm_retries_total",
+    "OSRM requests retried after a transient failure",
+    ["service"],
+)
+ROUTE_CACHE = REGISTRY.counter(
+    "route_cache_total", "OSRM route cache lookups", ["result"]
+)
+
+# Database phases of imports and rebuilds
+DB_PHASE_SECONDS = REGISTRY.histogram(
+    "db_phase_seconds", "Duration of database phases", ["phase"]
+)
+
+# LLM calls
+LLM_REQUESTS = REGISTRY.counter(
+    "llm_requests_total",
+    "LLM requests by backend and outcome",
+    ["backend", "outcome"],
+)
+LLM_SECONDS = REGISTRY.histogram(
+    "llm_request_seconds", "Duration of LLM requests", ["backend"]
+)
+
+# HTTP endpoints
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total",
+    "HTTP requests by route, method and status",
+    ["route", "method", "status"],
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_seconds", "Duration of HTTP requests", ["route", "method"]
+)
+
+# Sampled when /metrics is scraped
+EXECUTOR_JOBS = REGISTRY.gauge(
+    "routing_executor_jobs", "Routing executor jobs by state", ["state"]
+)
+GRAPH_NODES = REGISTRY.gauge("graph_nodes", "Nodes in the in-memory graph")
+
+# Cold start: importing main, then loading the graph
+STARTUP_SECONDS = REGISTRY.gauge(
+    "startup_seconds", "Duration of each startup phase", ["phase"]
+)
@@ -0,0 +1,150 @@
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+from rapidfuzz import fuzz, process
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase, fold diacritics (ș -> s, ă -> a) and collapse whitespace"""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().replace("-", " ").split())
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class NodeNameIndex:
+    """
+    Resolves free-text place names (e.g. from the LLM) to graph node names.
+
+    Exact matches on the normalized name are a dict lookup. Otherwise a
+    trigram inverted index picks a few candidates and only those are scored
+    with rapidfuzz. Lookups are memoized until the index changes.
+    """
+
+    def __init__(
+        self,
+        names: Iterable[str] = (),
+        threshold: float = 80,
+        max_candidates: int = 50,
+        memo_size: int = 10000,
+    ):
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.memo_size = memo_size
+        self.rebuild(names)
+
+    def rebuild(self, names: Iterable[str]):
+        """Replace the indexed names"""
+        self._names: Dict[str, str] = {}
+        self._by_normalized: Dict[str, str] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._memo: Dict[str, Optional[str]] = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str):
+        if name in self._names:
+            return
+        normalized = normalize_name(name)
+        self._names[name] = normalized
+        self._by_normalized.setdefault(normalized, name)
+        for gram in trigrams(normalized):
+            self._postings.setdefault(gram, set()).add(name)
+        self._memo.clear()
+
+    def remove(self, name: str):
+        normalized = self._names.pop(name, None)
+        if normalized is None:
+            return
+        if self._by_normalized.get(normalized) == name:
+            del self._by_normalized[normalized]
+        for gram in trigrams(normalized):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(name)
+                if not postings:
+                    del self._postings[gram]
+        self._memo.clear()
+
+    def names(self) -> List[str]:
+        return list(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def candidates(self, text: str, limit: int) -> List[str]:
+        """Names sharing the most trigrams with text, best first"""
+        counts = Counter()
+        for gram in trigrams(normalize_name(text)):
+            for name in self._postings.get(gram, ()):
+                counts[name] += 1
+        return [name for name, _ in counts.most_common(limit)]
+
+    def retrieve(self, text: str, limit: int) -> List[str]:
+        """
+        Up to `limit` node names that the free text plausibly mentions, best
+        first. Every 1-3 word phrase of the text is matched against its
+        trigram candidates, so the cost depends on the text, not the index size.
+        """
+        if len(self._names) <= limit:
+            return self.names()
+
+        words = normalize_name(text).split()
+        scores: Dict[str, float] = {}
+        for size in (1, 2, 3):
+            for i in range(len(words) - size + 1):
+                phrase = " ".join(words[i : i + size])
+                if len(phrase) < 3:
+                    continue
+                exact = self._by_normalized.get(phrase)
+                if exact is not None:
+                    scores[exact] = float("inf")
+                choices = {
+                    name: self._names[name]
+                    for name in self.candidates(phrase, self.max_candidates)
+                }
+                for _, score, name in process.extract(
+                    phrase,
+                    choices,
+                    scorer=fuzz.WRatio,
+                    limit=3,
+                    score_cutoff=self.threshold,
+                ):
+                    scores[name] = max(scores.get(name, 0), score)
+
+        return sorted(scores, key=lambda name: -scores[name])[:limit]
+
+    def resolve(self, query: Optional[str]) -> Optional[str]:
+        """Best matching node name for query, or None if nothing is close enough"""
+        if not query:
+            return None
+        if query in self._memo:
+            return self._memo[query]
+
+        normalized = normalize_name(query)
+        match = self._by_normalized.get(normalized)
+        if match is None:
+            choices = {
+                name: self._names[name]
+                for name in self.candidates(query, self.max_candidates)
+            }
+            best = process.extractOne(
+                normalized,
+                choices,
+                scorer=fuzz.WRatio,
+                score_cutoff=self.threshold,
+            )
+            match = best[2] if best else None
+
+        if len(self._memo) >= self.memo_size:
+            self._memo.clear()
+        self._memo[query] = match
+        return match
@@ -1,13 +1,62 @@
+import logging
+import os
+import time
 import requests
 from typing import List, Tuple, Dict
 import polyline
 from math import radians, sin, cos, sqrt, atan2
 
+from metrics import OSRM_REQUESTS, OSRM_RETRIES, OSRM_SECONDS
+from profiling import phase
+
+logger = logging.getLogger(__name__)
+
 
 class OSRMService:
-    def __init__(self, base_url: str = "http://router.project-osrm.org/route/v1"):
+    def __init__(
+        self,
+        base_url: str = "http://router.project-osrm.org/route/v1",
+        nearest_url: str = None,
+    ):
         self.base_url = base_url
-        self.nearest_url = "http://router.project-osrm.org/nearest/v1/driving"
+        # The nearest service lives next to the route service on the same server
+        self.nearest_url = nearest_url or (
+            base_url.rsplit("/route/v1", 1)[0] + "/nearest/v1/driving"
+        )
+        self.table_url = base_url.rsplit("/route/v1", 1)[0] + "/table/v1/driving"
+        # Transient failures (connection errors, timeouts, 5xx) are retried
+        self.timeout = float(os.getenv("OSRM_TIMEOUT", "10"))
+        self.retries = int(os.getenv("OSRM_RETRIES", "2"))
+        self.retry_backoff = float(os.getenv("OSRM_RETRY_BACKOFF", "0.2"))
+
+    def _get(self, service: str, url: str, params: Dict = None) -> Dict:
+        """GET an OSRM endpoint with retries, recording count, latency and retries"""
+        started = time.perf_counter()
+        try:
+            for attempt in range(self.retries + 1):
+                try:
+                    response = requests.get(url, params=params, timeout=self.timeout)
+                    if response.status_code < 500 or attempt == self.retries:
+                        response.raise_for_status()
+                        data = response.json()
+                        OSRM_REQUESTS.inc(service=service, outcome="ok")
+                        return data
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt == self.retries:
+                        raise
+                OSRM_RETRIES.inc(service=service)
+                logger.warning(
+                    "OSRM %s request failed, retrying (%d/%d)",
+                    service,
+                    attempt + 1,
+                    self.retries,
+                )
+                time.sleep(self.retry_backoff * 2**attempt)
+        except Exception:
+            OSRM_REQUESTS.inc(service=service, outcome="error")
+            raise
+        finally:
+            OSRM_SECONDS.observe(time.perf_counter() - started, service=service)
 
     def calculate_distance(
         self, lat1: float, lon1: float, lat2: float, lon2: float
@@ -32,9 +81,7 @@ class OSRMService:
         """
         url = f"{self.nearest_url}/{lon},{lat}"
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
+            data = self._get("nearest", url)
             if data["code"] == "Ok":
                 # OSRM returns coordinates in [lon, lat] format
                 return (
@@ -43,9 +90,32 @@ class OSRMService:
                 )
             return lat, lon  # Fallback to original coordinates if nearest service fails
         except Exception as e:
-            print(f"Error finding nearest road point: {str(e)}")
+            logger.warning("Error finding nearest road point: %s", e)
             return lat, lon  # Fallback to original coordinates
 
+    def get_table(
+        self,
+        coordinates: List[Tuple[float, float]],
+        sources: List[int],
+        destinations: List[int],
+    ) -> List[List[float]]:
+        """
+        Driving durations in seconds from each of the sources to each of the
+        destinations (indices into coordinates), using OSRM's table service.
+        Unreachable pairs are None.
+        """
+        coords_str = ";".join(f"{lon},{lat}" for lat, lon in coordinates)
+        # Built by hand: OSRM expects the ";" separators unescaped
+        query = (
+            f"sources={';'.join(map(str, sources))}"
+            f"&destinations={';'.join(map(str, destinations))}"
+            "&annotations=duration"
+        )
+        data = self._get("table", f"{self.table_url}/{coords_str}?{query}")
+        if data["code"] != "Ok":
+            raise Exception(f"OSRM API error: {data.get('message')}")
+        return data["durations"]
+
     def get_route(
         self,
         coordinates: List[Tuple[float, float]],
@@ -73,9 +143,10 @@ class OSRMService:
             avoid_coordinates = []
 
         # Snap each coordinate to the nearest road
-        snapped_coordinates = [
-            self.find_nearest_road_point(lat, lon) for lat, lon in coordinates
-        ]
+        with phase("osrm_snap"):
+            snapped_coordinates = [
+                self.find_nearest_road_point(lat, lon) for lat, lon in coordinates
+            ]
 
         # Initialize variables to store the complete route
         complete_path = []
@@ -106,9 +177,8 @@ class OSRMService:
             # The avoid functionality is handled at the Dijkstra level for node avoidance
 
             try:
-                response = requests.get(url, params=params)
-                response.raise_for_status()
-                data = response.json()
+                with phase("osrm_route"):
+                    data = self._get("route", url, params)
 
                 if data["code"] != "Ok":
                     raise Exception(f"OSRM API error: {data['message']}")
@@ -0,0 +1,502 @@
+"""
+Partitioned routing: the graph is cut into geographic cells, each cell is a
+shard that can live in its own process (or on its own machine, from the files
+written by `python -m partitioning`), and a small overlay graph over the
+cells' boundary nodes ties them together.
+
+The overlay holds, for every cell, the shortest distances inside the cell
+between each pair of its boundary nodes (a clique per cell), plus the edges
+that cross between cells. A query searches its start and end cells locally,
+runs Dijkstra on the overlay only, then asks the cells on the route to
+expand the clique edges back into real paths.
+
+Run from the backend directory, e.g.:
+
+    python -m partitioning export.json --max-cell-size 2000 --output shards/
+"""
+import argparse
+import heapq
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from math import cos, radians
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from dijkstra import DijkstraAlgorithm
+from metrics import SEARCH_PUSHES, SEARCH_SECONDS, SEARCH_SETTLED
+
+logger = logging.getLogger(__name__)
+
+Graph = Dict[str, List[Tuple[str, float]]]
+
+# Nodes per cell; a cell's clique grows with the square of its boundary
+DEFAULT_MAX_CELL_SIZE = int(os.getenv("PARTITION_MAX_CELL_SIZE", "1000"))
+
+
+def partition_nodes(
+    node_coordinates: Mapping[str, Tuple[float, float]],
+    max_cell_size: int = DEFAULT_MAX_CELL_SIZE,
+    nodes: Optional[Iterable[str]] = None,
+) -> Dict[str, int]:
+    """
+    Assign nodes to cells of at most max_cell_size nodes by recursive
+    coordinate bisection: split at the median of the longer side of the
+    bounding box until cells are small enough. Geographic halves of a road
+    graph cut few edges, which keeps the overlay small. Nodes without
+    coordinates share one extra cell.
+    """
+    names = list(nodes if nodes is not None else node_coordinates)
+    placed = [name for name in names if name in node_coordinates]
+    unplaced = [name for name in names if name not in node_coordinates]
+
+    cells: List[List[str]] = []
+    stack = [placed] if placed else []
+    while stack:
+        group = stack.pop()
+        if len(group) <= max_cell_size:
+            cells.append(group)
+            continue
+        lats = [node_coordinates[name][0] for name in group]
+        lons = [node_coordinates[name][1] for name in group]
+        # Compare the sides in the same unit (degrees of latitude)
+        scale = cos(radians(sum(lats) / len(lats)))
+        axis = 0 if max(lats) - min(lats) >= (max(lons) - min(lons)) * scale else 1
+        group.sort(key=lambda name: node_coordinates[name][axis])
+        middle = len(group) // 2
+        stack.append(group[middle:])
+        stack.append(group[:middle])
+    if unplaced:
+        cells.append(unplaced)
+
+    return {name: cell_id for cell_id, group in enumerate(cells) for name in group}
+
+
+class Cell:
+    """
+    One shard: the subgraph of a cell (edges with both ends inside it) and
+    its boundary nodes, those with an edge leaving the cell. Every search
+    here stays inside the cell.
+    """
+
+    def __init__(self, cell_id: int, graph: Graph, boundary: Iterable[str]):
+        self.cell_id = cell_id
+        self.boundary = sorted(boundary)
+        self.dijkstra = DijkstraAlgorithm()
+        self.dijkstra.replace_graph(graph)
+
+    @property
+    def graph(self) -> Graph:
+        return self.dijkstra.graph
+
+    def distances_from(self, source: str) -> Dict[str, float]:
+        """Distances inside the cell from source to each reachable boundary node"""
+        distances, _ = self.dijkstra.shortest_path_tree(source)
+        infinity = float("infinity")
+        return {
+            node: distances[node]
+            for node in self.boundary
+            if distances[node] != infinity
+        }
+
+    def boundary_distances(self) -> Dict[str, Dict[str, float]]:
+        """The cell's overlay clique: boundary-to-boundary distances inside it"""
+        return {node: self.distances_from(node) for node in self.boundary}
+
+    def path(self, source: str, target: str) -> Tuple[List[str], float]:
+        return self.dijkstra.find_shortest_path(source, target)
+
+    def to_dict(self) -> Dict:
+        return {
+            "cell_id": self.cell_id,
+            "graph": self.graph,
+            "boundary": self.boundary,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Cell":
+        graph = {
+            node: [(neighbor, weight) for neighbor, weight in edges]
+            for node, edges in data["graph"].items()
+        }
+        return cls(data["cell_id"], graph, data["boundary"])
+
+
+def build_cells(
+    graph: Mapping[str, List[Tuple[str, float]]], assignment: Mapping[str, int]
+) -> Tuple[Dict[int, Cell], List[Tuple[str, str, float]]]:
+    """Split graph into cells, returning them and the edges between cells"""
+    subgraphs: Dict[int, Graph] = {}
+    boundaries: Dict[int, set] = {}
+    cut_edges = []
+    for node, edges in graph.items():
+        cell_id = assignment[node]
+        local = subgraphs.setdefault(cell_id, {}).setdefault(node, [])
+        for neighbor, weight in edges:
+            if assignment[neighbor] == cell_id:
+                local.append((neighbor, weight))
+            else:
+                boundaries.setdefault(cell_id, set()).add(node)
+                cut_edges.append((node, neighbor, weight))
+    cells = {
+        cell_id: Cell(cell_id, subgraph, boundaries.get(cell_id, ()))
+        for cell_id, subgraph in subgraphs.items()
+    }
+    return cells, cut_edges
+
+
+# Cells owned by this process, when it is a shard worker
+_worker_cells: Dict[int, Cell] = {}
+
+
+def _init_shard_worker(directory: Optional[str], cells: List):
+    """Load the worker's cells: ids to read from shard files, or Cell.to_dict()s"""
+    global _worker_cells
+    if directory is not None:
+        _worker_cells = {cell_id: load_cell(directory, cell_id) for cell_id in cells}
+    else:
+        _worker_cells = {data["cell_id"]: Cell.from_dict(data) for data in cells}
+
+
+def _call_cell(cell_id: int, method: str, args: tuple):
+    return getattr(_worker_cells[cell_id], method)(*args)
+
+
+class LocalShards:
+    """All cells in this process"""
+
+    def __init__(self, cells: Dict[int, Cell]):
+        self.cells = cells
+
+    def call(self, cell_id: int, method: str, *args):
+        return getattr(self.cells[cell_id], method)(*args)
+
+    def call_many(self, calls: List[Tuple[int, str, tuple]]) -> List:
+        return [self.call(cell_id, method, *args) for cell_id, method, args in calls]
+
+    def close(self):
+        pass
+
+
+class ProcessShards:
+    """
+    Cells spread over `processes` worker processes, each owning the cells
+    with cell_id % processes == its index. A stand-in for shard servers:
+    every call goes to the one process holding the cell.
+    """
+
+    def __init__(
+        self,
+        cell_ids: Iterable[int],
+        processes: int,
+        cells: Optional[Dict[int, Cell]] = None,
+        directory: Optional[str] = None,
+    ):
+        cell_ids = sorted(cell_ids)
+        self.processes = max(1, min(processes, len(cell_ids)))
+        self.owner = {cell_id: cell_id % self.processes for cell_id in cell_ids}
+        self._pools = []
+        for index in range(self.processes):
+            owned = [cell_id for cell_id in cell_ids if self.owner[cell_id] == index]
+            if directory is not None:
+                payload = owned
+            else:
+                payload = [cells[cell_id].to_dict() for cell_id in owned]
+            self._pools.append(
+                ProcessPoolExecutor(
+                    max_workers=1,
+                    initializer=_init_shard_worker,
+                    initargs=(directory, payload),
+                )
+            )
+
+    def _submit(self, cell_id: int, method: str, args: tuple):
+        pool = self._pools[self.owner[cell_id]]
+        return pool.submit(_call_cell, cell_id, method, args)
+
+    def call(self, cell_id: int, method: str, *args):
+        return self._submit(cell_id, method, args).result()
+
+    def call_many(self, calls: List[Tuple[int, str, tuple]]) -> List:
+        """Run calls concurrently across the shard processes"""
+        futures = [
+            self._submit(cell_id, method, args) for cell_id, method, args in calls
+        ]
+        return [future.result() for future in futures]
+
+    def close(self):
+        for pool in self._pools:
+            pool.shutdown(wait=False)
+
+
+class OverlayRouter:
+    """
+    Shortest paths over a partitioned graph. Only the overlay (boundary
+    nodes, cliques and cut edges) and the node-to-cell assignment live here;
+    the cells are reached through `shards`.
+    """
+
+    def __init__(
+        self,
+        shards,
+        assignment: Dict[str, int],
+        overlay: Graph,
+        boundary: Optional[set] = None,
+    ):
+        self.shards = shards
+        self.assignment = assignment
+        self.overlay = overlay
+        self.boundary = boundary if boundary is not None else set(overlay)
+
+    @classmethod
+    def build(
+        cls,
+        graph: Mapping[str, List[Tuple[str, float]]],
+        node_coordinates: Mapping[str, Tuple[float, float]],
+        max_cell_size: int = DEFAULT_MAX_CELL_SIZE,
+        processes: int = 0,
+    ) -> "OverlayRouter":
+        """
+        Partition graph and build the overlay. With processes > 0 the cells
+        are owned by that many worker processes, which also compute the
+        cliques in parallel.
+        """
+        started = time.perf_counter()
+        assignment = partition_nodes(node_coordinates, max_cell_size, graph)
+        cells, cut_edges = build_cells(graph, assignment)
+        if processes > 0:
+            shards = ProcessShards(cells, processes, cells=cells)
+        else:
+            shards = LocalShards(cells)
+        router = cls.from_cliques(
+            shards,
+            assignment,
+            cls._cliques(shards, cells),
+            cut_edges,
+        )
+        logger.info(
+            "Partitioned %d nodes into %d cells, overlay of %d boundary nodes in %.2fs",
+            len(assignment),
+            len(cells),
+            len(router.overlay),
+            time.perf_counter() - started,
+        )
+        return router
+
+    @staticmethod
+    def _cliques(shards, cell_ids: Iterable[int]) -> List[Dict[str, Dict[str, float]]]:
+        return shards.call_many(
+            [(cell_id, "boundary_distances", ()) for cell_id in cell_ids]
+        )
+
+    @classmethod
+    def from_cliques(
+        cls,
+        shards,
+        assignment: Dict[str, int],
+        cliques: Iterable[Dict[str, Dict[str, float]]],
+        cut_edges: Iterable[Tuple[str, str, float]],
+    ) -> "OverlayRouter":
+        overlay: Graph = {}
+        for clique in cliques:
+            for node, distances in clique.items():
+                edges = overlay.setdefault(node, [])
+                edges.extend(
+                    (other, distance)
+                    for other, distance in distances.items()
+                    if other != node
+                )
+        # Cut edges are listed from both ends already (the graph is undirected)
+        for source, target, weight in cut_edges:
+            overlay.setdefault(source, []).append((target, weight))
+        return cls(shards, assignment, overlay)
+
+    def find_shortest_path(self, start: str, end: str) -> Tuple[List[str], float]:
+        """Same result as DijkstraAlgorithm.find_shortest_path on the whole graph"""
+        if start not in self.assignment or end not in self.assignment:
+            return [], float("infinity")
+        start_cell, end_cell = self.assignment[start], self.assignment[end]
+        if start == end:
+            return [start], 0
+
+        # Level 0: the start and end cells, searched by their shards
+        sources, targets = self.shards.call_many(
+            [
+                (start_cell, "distances_from", (start,)),
+                (end_cell, "distances_from", (end,)),
+            ]
+        )
+        best, route = float("infinity"), None
+        if start_cell == end_cell:
+            # The path may stay inside the cell (or leave it and come back)
+            path, distance = self.shards.call(start_cell, "path", start, end)
+            if path:
+                best, route = distance, path
+
+        # Level 1: the overlay, from all of start's boundary nodes at once
+        distance, overlay_path = self._search_overlay(sources, targets, best)
+        if overlay_path is not None and distance < best:
+            route = self._unpack(start, overlay_path, end)
+            best = distance
+        if route is None:
+            return [], float("infinity")
+        return route, best
+
+    def _search_overlay(
+        self, sources: Dict[str, float], targets: Dict[str, float], bound: float
+    ) -> Tuple[float, Optional[List[str]]]:
+        """
+        Multi-source Dijkstra on the overlay, seeded with the distances from
+        start to its cell's boundary. Stops once nothing can beat the best
+        start -> boundary -> ... -> boundary -> end total (or bound).
+        """
+        overlay = self.overlay
+        distances = dict(sources)
+        previous: Dict[str, Optional[str]] = {node: None for node in sources}
+        pq = [(distance, node) for node, distance in sources.items()]
+        heapq.heapify(pq)
+        best, meeting = bound, None
+        started = time.perf_counter()
+        settled = 0
+        pushes = len(pq)
+
+        while pq:
+            distance, node = heapq.heappop(pq)
+            if distance >= best:
+                break
+            if distance > distances[node]:
+                continue
+            settled += 1
+            to_end = targets.get(node)
+            if to_end is not None and distance + to_end < best:
+                best, meeting = distance + to_end, node
+            for neighbor, weight in overlay.get(node, ()):
+                new_distance = distance + weight
+                if new_distance < distances.get(neighbor, float("infinity")):
+                    distances[neighbor] = new_distance
+                    previous[neighbor] = node
+                    heapq.heappush(pq, (new_distance, neighbor))
+                    pushes += 1
+
+        SEARCH_SECONDS.observe(time.perf_counter() - started, kind="overlay")
+        SEARCH_SETTLED.observe(settled, kind="overlay")
+        SEARCH_PUSHES.observe(pushes, kind="overlay")
+        if meeting is None:
+            return float("infinity"), None
+        path = []
+        node = meeting
+        while node is not None:
+            path.append(node)
+            node = previous[node]
+        path.reverse()
+        return best, path
+
+    def _unpack(self, start: str, overlay_path: List[str], end: str) -> List[str]:
+        """Expand start, boundary nodes..., end into the full node path"""
+        waypoints = [start] + overlay_path + [end]
+        calls = []
+        for source, target in zip(waypoints, waypoints[1:]):
+            source_cell = self.assignment[source]
+            # Consecutive nodes in one cell are joined by a clique edge (or are
+            # start/end and its boundary node); otherwise they share a cut edge
+            if source != target and source_cell == self.assignment[target]:
+                calls.append((source_cell, "path", (source, target)))
+        segments = iter(self.shards.call_many(calls))
+
+        route = [start]
+        for source, target in zip(waypoints, waypoints[1:]):
+            if source == target:
+                continue
+            if self.assignment[source] == self.assignment[target]:
+                segment, _ = next(segments)
+                route.extend(segment[1:])
+            else:
+                route.append(target)
+        return route
+
+    def get_stats(self) -> Dict:
+        return {
+            "nodes": len(self.assignment),
+            "cells": len(set(self.assignment.values())),
+            "boundary_nodes": len(self.overlay),
+            "overlay_edges": sum(len(edges) for edges in self.overlay.values()),
+        }
+
+    def save(self, directory: str):
+        """
+        Write the overlay and one file per cell, so each shard process (or
+        machine) only has to read its own cells
+        """
+        os.makedirs(directory, exist_ok=True)
+        cells = getattr(self.shards, "cells", None)
+        if cells is None:
+            raise ValueError("Only routers with local shards can be saved")
+        for cell in cells.values():
+            with open(cell_path(directory, cell.cell_id), "w") as file:
+                json.dump(cell.to_dict(), file)
+        with open(os.path.join(directory, "overlay.json"), "w") as file:
+            json.dump({"assignment": self.assignment, "overlay": self.overlay}, file)
+
+    @classmethod
+    def load(cls, directory: str, processes: int = 0) -> "OverlayRouter":
+        """Load a saved partition, with the cells in this process or in workers"""
+        with open(os.path.join(directory, "overlay.json")) as file:
+            data = json.load(file)
+        assignment = data["assignment"]
+        cell_ids = set(assignment.values())
+        if processes > 0:
+            shards = ProcessShards(cell_ids, processes, directory=directory)
+        else:
+            shards = LocalShards(
+                {cell_id: load_cell(directory, cell_id) for cell_id in cell_ids}
+            )
+        overlay = {
+            node: [(neighbor, weight) for neighbor, weight in edges]
+            for node, edges in data["overlay"].items()
+        }
+        return cls(shards, assignment, overlay)
+
+    def close(self):
+        self.shards.close()
+
+
+def cell_path(directory: str, cell_id: int) -> str:
+    return os.path.join(directory, f"cell-{cell_id}.json")
+
+
+def load_cell(directory: str, cell_id: int) -> Cell:
+    with open(cell_path(directory, cell_id)) as file:
+        return Cell.from_dict(json.load(file))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Partition an exported graph into cells and an overlay"
+    )
+    parser.add_argument("input", help="JSON from /export/: nodes and edges")
+    parser.add_argument("--output", required=True, help="Directory for the shards")
+    parser.add_argument("--max-cell-size", type=int, default=DEFAULT_MAX_CELL_SIZE)
+    args = parser.parse_args(argv)
+
+    with open(args.input) as file:
+        data = json.load(file)
+    dijkstra = DijkstraAlgorithm()
+    for name in data["nodes"]:
+        dijkstra.add_node(name)
+    for source, target, weight in data.get("edges", []):
+        dijkstra.add_edge(source, target, weight)
+    coordinates = {
+        name: tuple(coords)
+        for name, coords in data["nodes"].items()
+        if coords and None not in coords
+    }
+
+    router = OverlayRouter.build(dijkstra.graph, coordinates, args.max_cell_size)
+    router.save(args.output)
+    print(json.dumps(router.get_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,157 @@
+"""
+Priority queues for the Dijkstra search. All of them take push(priority,
+item) and pop() -> (priority, item), and pushing an item that is already
+queued lowers its priority (or queues a duplicate the search skips).
+"""
+import heapq
+from typing import Any, Dict, List, Tuple
+
+
+class BinaryHeap:
+    """heapq with lazy deletion: a lowered priority is a new entry"""
+
+    def __init__(self):
+        self._heap: List[Tuple[float, Any]] = []
+
+    def push(self, priority: float, item):
+        heapq.heappush(self._heap, (priority, item))
+
+    def pop(self) -> Tuple[float, Any]:
+        return heapq.heappop(self._heap)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class IndexedDaryHeap:
+    """
+    d-ary heap with a position index and decrease-key, so every item is in
+    the heap at most once. Wider nodes make the tree shallower: cheaper
+    decrease-keys (sift up) at the price of more comparisons per pop.
+    """
+
+    def __init__(self, d: int = 4):
+        self.d = d
+        self._priorities: List[float] = []
+        self._items: List[Any] = []
+        self._position: Dict[Any, int] = {}
+
+    def push(self, priority: float, item):
+        i = self._position.get(item)
+        if i is None:
+            i = len(self._items)
+            self._priorities.append(priority)
+            self._items.append(item)
+        elif priority < self._priorities[i]:
+            self._priorities[i] = priority
+        else:
+            return
+        self._sift_up(i, priority, item)
+
+    def pop(self) -> Tuple[float, Any]:
+        priorities, items = self._priorities, self._items
+        top = (priorities[0], items[0])
+        del self._position[items[0]]
+        last_priority, last_item = priorities.pop(), items.pop()
+        if items:
+            self._sift_down(last_priority, last_item)
+        return top
+
+    def _sift_up(self, i: int, priority: float, item):
+        priorities, items, position, d = (
+            self._priorities,
+            self._items,
+            self._position,
+            self.d,
+        )
+        while i > 0:
+            parent = (i - 1) // d
+            if priorities[parent] <= priority:
+                break
+            priorities[i] = priorities[parent]
+            items[i] = items[parent]
+            position[items[i]] = i
+            i = parent
+        priorities[i] = priority
+        items[i] = item
+        position[item] = i
+
+    def _sift_down(self, priority: float, item):
+        """Place item, taken from the end, starting at the root"""
+        priorities, items, position, d = (
+            self._priorities,
+            self._items,
+            self._position,
+            self.d,
+        )
+        size = len(items)
+        i = 0
+        while True:
+            first = d * i + 1
+            if first >= size:
+                break
+            last = min(first + d, size)
+            child = first
+            child_priority = priorities[first]
+            for j in range(first + 1, last):
+                if priorities[j] < child_priority:
+                    child, child_priority = j, priorities[j]
+            if child_priority >= priority:
+                break
+            priorities[i] = child_priority
+            items[i] = items[child]
+            position[items[i]] = i
+            i = child
+        priorities[i] = priority
+        items[i] = item
+        position[item] = i
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class RadixHeap:
+    """
+    Monotone radix heap on integer keys, priority * scale rounded down.
+    Valid for Dijkstra because popped keys never decrease (weights are
+    non-negative). Entries sharing a key pop in any order, so a search that
+    stops at its target is exact to within 1 / scale of the weight unit
+    (1 m with the default scale and km weights). Lowered priorities are new
+    entries, as in BinaryHeap.
+    """
+
+    def __init__(self, scale: float = 1000):
+        self.scale = scale
+        self._last = 0
+        self._buckets: List[List[Tuple[int, float, Any]]] = [[] for _ in range(65)]
+        self._size = 0
+
+    def push(self, priority: float, item):
+        key = int(priority * self.scale)
+        self._buckets[(key ^ self._last).bit_length()].append((key, priority, item))
+        self._size += 1
+
+    def pop(self) -> Tuple[float, Any]:
+        buckets = self._buckets
+        if not buckets[0]:
+            # Redistribute the first non-empty bucket around its minimum key
+            i = 1
+            while not buckets[i]:
+                i += 1
+            bucket, buckets[i] = buckets[i], []
+            self._last = last = min(entry[0] for entry in bucket)
+            for entry in bucket:
+                buckets[(entry[0] ^ last).bit_length()].append(entry)
+        self._size -= 1
+        _, priority, item = buckets[0].pop()
+        return priority, item
+
+    def __len__(self) -> int:
+        return self._size
+
+
+QUEUES = {
+    "binary": BinaryHeap,
+    "dary": IndexedDaryHeap,
+    "radix": RadixHeap,
+}
@@ -0,0 +1,116 @@
+import contextvars
+import cProfile
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# Where cProfile dumps of profiled requests go (unset: timings only)
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+
+_current: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "request_profile", default=None
+)
+
+
+class RequestProfile:
+    """
+    Phase timings of one request. Phases with the same name are summed, and
+    phases running concurrently (e.g. tourist info lookups) overlap, so the
+    total of all phases can exceed the wall time.
+    """
+
+    def __init__(self, name: str, dump_dir: Optional[str] = None):
+        self.name = name
+        self.dump_dir = dump_dir
+        self.started = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}
+        self._profilers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, seconds: float):
+        with self._lock:
+            entry = self.phases.setdefault(phase, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Run fn under cProfile if this profile dumps to disk"""
+        if self.dump_dir is None:
+            return fn(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(fn, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._profilers.append(profiler)
+
+    def dump(self) -> Optional[str]:
+        """Write the merged cProfile stats of all profiled calls, if any"""
+        if self.dump_dir is None or not self._profilers:
+            return None
+        os.makedirs(self.dump_dir, exist_ok=True)
+        path = os.path.join(
+            self.dump_dir,
+            f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.prof",
+        )
+        stats = pstats.Stats(self._profilers[0])
+        for profiler in self._profilers[1:]:
+            stats.add(profiler)
+        stats.dump_stats(path)
+        return path
+
+    def summary(self) -> Dict:
+        total = time.perf_counter() - self.started
+        return {
+            "total_ms": total * 1000,
+            "phases": [
+                {"phase": phase, "count": count, "ms": seconds * 1000}
+                for phase, (count, seconds) in self.phases.items()
+            ],
+            "profile_file": self.dump(),
+        }
+
+
+def is_requested(flag: bool, header: Optional[str]) -> bool:
+    """Profiling is opt-in through ?profile=true or an X-Profile header"""
+    return flag or (header or "").lower() in ("1", "true", "yes")
+
+
+@contextmanager
+def profile_request(name: str, enabled: bool):
+    """Collect phase timings for the rest of the request when enabled"""
+    if not enabled:
+        yield None
+        return
+    profile = RequestProfile(name, PROFILE_DIR)
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def phase(name: str):
+    """Time the with-block as a phase of the current request, if it is profiled"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.record(name, time.perf_counter() - started)
+
+
+def call(fn: Callable, *args, **kwargs):
+    """Call fn, under cProfile if the current request is being dumped"""
+    profile = _current.get()
+    if profile is None:
+        return fn(*args, **kwargs)
+    return profile.call(fn, *args, **kwargs)
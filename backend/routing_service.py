@@ -1,6 +1,19 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Tuple, Optional
 from dijkstra import DijkstraAlgorithm
 from osrm_service import OSRMService
+from metrics import ROUTE_CACHE
+from profiling import phase
+from spatial_index import EdgeIndex
+from travel_times import TimeProfile, TravelTimeService
+
+logger = logging.getLogger(__name__)
+
+# Snapped points this close (km) to a node are routed from the node itself
+SNAP_NODE_KM = float(os.getenv("SNAP_NODE_KM", "0.05"))
 
 
 class RoutingService:
@@ -8,37 +21,181 @@ class RoutingService:
         self.dijkstra = DijkstraAlgorithm()
         self.osrm = OSRMService(base_url)
         self.node_coordinates: Dict[str, Tuple[float, float]] = {}
+        # LRU cache of OSRM routes keyed by (start point, node sequence, end point)
+        self.route_cache_size = int(os.getenv("ROUTE_CACHE_SIZE", "1024"))
+        self._route_cache: "OrderedDict[Tuple, Dict]" = OrderedDict()
+        self._route_cache_lock = threading.Lock()
+        # Same graph with OSRM driving durations (seconds) as weights
+        self.travel_times = TravelTimeService(self.osrm)
+        self.duration_dijkstra = DijkstraAlgorithm()
+        self.duration_dijkstra.time_profile = TimeProfile.from_env()
+        # Edge segments for snapping coordinates, rebuilt on the first snap
+        # after nodes or edges change
+        self._snap_index: Optional[EdgeIndex] = None
+        self._snap_lock = threading.Lock()
 
     def add_node(self, node_id: str, lat: float, lon: float):
         """Add a node with its coordinates to the service"""
         self.node_coordinates[node_id] = (lat, lon)
+        self.duration_dijkstra.add_node(node_id)
+        self.clear_snap_index()
 
-    def add_edge(self, source: str, target: str):
-        """Add an edge between two nodes, calculating the distance using coordinates"""
+    def add_edge(self, source: str, target: str, distance: Optional[float] = None):
+        """
+        Add an edge between two nodes with the given weight, or the distance
+        calculated from their coordinates
+        """
         if source not in self.node_coordinates or target not in self.node_coordinates:
             raise ValueError(
                 f"Both nodes must be added with coordinates first. Source: {source}, Target: {target}"
             )
 
-        lat1, lon1 = self.node_coordinates[source]
-        lat2, lon2 = self.node_coordinates[target]
-        distance = self.osrm.calculate_distance(lat1, lon1, lat2, lon2)
+        if distance is None:
+            lat1, lon1 = self.node_coordinates[source]
+            lat2, lon2 = self.node_coordinates[target]
+            distance = self.osrm.calculate_distance(lat1, lon1, lat2, lon2)
         self.dijkstra.add_edge(source, target, distance)
+        self.duration_dijkstra.add_edge(
+            source, target, self.travel_times.duration(source, target, distance)
+        )
+        self.clear_snap_index()
+
+    def load_graph(
+        self,
+        nodes: List[Tuple[str, float, float]],
+        edges: List[Tuple],
+    ):
+        """
+        Build a fresh graph from (name, lat, lon) nodes and (source, target) or
+        (source, target, weight) edges and swap it in at once, so concurrent
+        searches never see a partial graph. Edges without a weight get the
+        haversine distance between their nodes.
+        """
+        node_coordinates = {name: (lat, lon) for name, lat, lon in nodes}
+        graph = DijkstraAlgorithm()
+        for name in node_coordinates:
+            graph.add_node(name)
+        for edge in edges:
+            source, target = edge[0], edge[1]
+            if source not in node_coordinates or target not in node_coordinates:
+                continue
+            if len(edge) > 2:
+                distance = edge[2]
+            else:
+                lat1, lon1 = node_coordinates[source]
+                lat2, lon2 = node_coordinates[target]
+                distance = self.osrm.calculate_distance(lat1, lon1, lat2, lon2)
+            graph.add_edge(source, target, distance)
+
+        self.node_coordinates = node_coordinates
+        self.dijkstra.replace_graph(graph.graph)
+        # Paid here, off the event loop, rather than by the first path request
+        self.dijkstra.rebuild_components()
+        self.refresh_durations()
+        self.clear_route_cache()
+        self.clear_snap_index()
+
+    def refresh_durations(self):
+        """Rebuild the duration graph from the current distance graph"""
+        self.duration_dijkstra.replace_graph(
+            self.travel_times.build_graph(self.dijkstra.graph)
+        )
+
+    def fetch_travel_times(self) -> Dict:
+        """Fetch the missing OSRM edge durations and swap in the new duration graph"""
+        fetched = self.travel_times.fetch_missing(
+            self.dijkstra.graph, self.node_coordinates
+        )
+        self.refresh_durations()
+        return {"fetched": fetched, **self.travel_times.get_stats()}
+
+    def clear_route_cache(self):
+        with self._route_cache_lock:
+            self._route_cache.clear()
+
+    def clear_snap_index(self):
+        """Drop the snap index after the graph geometry changed"""
+        self._snap_index = None
+
+    def snap(self, lat: float, lon: float) -> Optional[Dict]:
+        """
+        Closest point of the graph to (lat, lon), from the in-memory edge
+        index (see EdgeIndex.nearest), or None if there is no edge nearby.
+        Ends of the edge closer than SNAP_NODE_KM snap to that node, given
+        as "node"; otherwise the point is a virtual node on the edge.
+        """
+        index = self._snap_index
+        if index is None:
+            with self._snap_lock:
+                if self._snap_index is None:
+                    self._snap_index = EdgeIndex(
+                        self.node_coordinates, self.dijkstra.graph
+                    )
+                index = self._snap_index
+        snapped = index.nearest(lat, lon)
+        if snapped is None:
+            return None
+        snapped["node"] = None
+        for node, fraction in ((snapped["source"], 0), (snapped["target"], 1)):
+            node_lat, node_lon = self.node_coordinates[node]
+            if (
+                snapped["fraction"] == fraction
+                or self.osrm.calculate_distance(
+                    snapped["latitude"], snapped["longitude"], node_lat, node_lon
+                )
+                <= SNAP_NODE_KM
+            ):
+                snapped.update(node=node, latitude=node_lat, longitude=node_lon)
+                break
+        return snapped
+
+    def update_edge_weights(self, updates: List[Tuple[str, str, float]]) -> int:
+        """
+        Change the weights of existing edges in place, in both graphs: an
+        edge's travel time changes in proportion to its weight (a traffic
+        factor of 1.5 makes it 1.5 times slower). Cached OSRM routes stay
+        valid: their geometry only depends on the node sequence.
+        """
+        durations = self.duration_updates(updates)
+        updated = self.dijkstra.update_edge_weights(updates)
+        self.duration_dijkstra.update_edge_weights(durations)
+        return updated
+
+    def duration_updates(
+        self, updates: List[Tuple[str, str, float]]
+    ) -> List[Tuple[str, str, float]]:
+        """The new travel times of the edges whose weights the updates change"""
+        durations = []
+        for source, target, weight in updates:
+            old_duration = self.duration_dijkstra.edge_weight(source, target)
+            if old_duration is None:
+                continue
+            old_weight = self.dijkstra.edge_weight(source, target)
+            if old_weight:
+                durations.append((source, target, old_duration * weight / old_weight))
+            else:
+                durations.append(
+                    (source, target, self.travel_times.duration(source, target, weight))
+                )
+        return durations
 
     def remove_node(self, node_id: str):
         """Remove a node and its associated edges"""
-        if node_id in self.node_coordinates:
+        self.remove_nodes([node_id])
+
+    def remove_nodes(self, node_ids: List[str]):
+        """Remove several nodes and their edges in one pass over their neighbors"""
+        known = [node_id for node_id in node_ids if node_id in self.node_coordinates]
+        if not known:
+            return
+        for node_id in known:
             del self.node_coordinates[node_id]
-            # Remove edges from dijkstra graph
-            if node_id in self.dijkstra.graph:
-                del self.dijkstra.graph[node_id]
-                # Remove edges from other nodes that point to this node
-                for node_edges in self.dijkstra.graph.values():
-                    node_edges[:] = [
-                        (target, weight)
-                        for target, weight in node_edges
-                        if target != node_id
-                    ]
+        # Remove edges from dijkstra graph
+        self.dijkstra.remove_nodes(known)
+        self.dijkstra.rebuild_components()
+        self.duration_dijkstra.remove_nodes(known)
+        self.clear_route_cache()
+        self.clear_snap_index()
 
     def find_route(
         self,
@@ -51,31 +208,86 @@ class RoutingService:
         Find a route from start to end, optionally passing through waypoints.
         Returns a dictionary containing the complete route information.
         """
+        # Step 1: Use Dijkstra to find the optimal sequence of nodes
+        path = self.find_node_path(start, end, waypoints, avoid)
+
+        # Step 2: Use OSRM to get the actual route for each segment
+        return self.build_route(path, avoid)
+
+    def validate_nodes(self, nodes: List[str]):
+        """Raise ValueError if any of the nodes has no known coordinates"""
+        missing_nodes = [node for node in nodes if node not in self.node_coordinates]
+        if missing_nodes:
+            raise ValueError(f"Nodes not found: {', '.join(missing_nodes)}")
+
+    def find_node_path(
+        self,
+        start: str,
+        end: str,
+        waypoints: Optional[List[str]] = None,
+        avoid: Optional[List[str]] = None,
+    ) -> List[str]:
+        """Use Dijkstra to find the sequence of graph nodes for the route"""
         if waypoints is None:
             waypoints = []
 
         # Validate that all nodes exist
-        all_nodes = [start, end] + waypoints
-        missing_nodes = [
-            node for node in all_nodes if node not in self.node_coordinates
-        ]
-        if missing_nodes:
-            raise ValueError(f"Nodes not found: {', '.join(missing_nodes)}")
+        self.validate_nodes([start, end] + waypoints)
 
-        # Step 1: Use Dijkstra to find the optimal sequence of nodes
-        if waypoints:
-            path, _ = self.dijkstra.find_path_with_waypoints(
-                start, waypoints, end, avoid
-            )
-        else:
-            path, _ = self.dijkstra.find_shortest_path(start, end, avoid)
+        with phase("search"):
+            if waypoints:
+                path, _ = self.dijkstra.find_path_with_waypoints(
+                    start, waypoints, end, avoid
+                )
+            else:
+                path, _ = self.dijkstra.find_shortest_path(start, end, avoid)
 
         if not path:
             raise ValueError("No valid path found between the specified nodes")
+        return path
 
-        # Step 2: Use OSRM to get the actual route for each segment
+    def build_route(
+        self,
+        path: List[str],
+        avoid: Optional[List[str]] = None,
+        start_point: Optional[Tuple[float, float]] = None,
+        end_point: Optional[Tuple[float, float]] = None,
+    ) -> Dict:
+        """
+        Use OSRM to turn a sequence of graph nodes into a road route, from
+        start_point and to end_point first and last if they are given
+        """
+        # OSRM ignores avoid, so the route only depends on the points it visits
+        key = (start_point, tuple(path), end_point)
+        with self._route_cache_lock:
+            cached = self._route_cache.get(key)
+            if cached is not None:
+                self._route_cache.move_to_end(key)
+                ROUTE_CACHE.inc(result="hit")
+                return dict(cached)
+
+        ROUTE_CACHE.inc(result="miss")
+        route = self._request_route(path, avoid, start_point, end_point)
+
+        with self._route_cache_lock:
+            self._route_cache[key] = route
+            while len(self._route_cache) > self.route_cache_size:
+                self._route_cache.popitem(last=False)
+        return dict(route)
+
+    def _request_route(
+        self,
+        path: List[str],
+        avoid: Optional[List[str]],
+        start_point: Optional[Tuple[float, float]] = None,
+        end_point: Optional[Tuple[float, float]] = None,
+    ) -> Dict:
         try:
             coordinates = [self.node_coordinates[node] for node in path]
+            if start_point is not None:
+                coordinates.insert(0, start_point)
+            if end_point is not None:
+                coordinates.append(end_point)
 
             # Get coordinates of nodes to avoid for OSRM
             avoid_coordinates = []
@@ -94,5 +306,5 @@ class RoutingService:
                 "node_sequence": path,  # Include the sequence of nodes used
             }
         except Exception as e:
-            print(f"Error getting route from OSRM: {str(e)}")
+            logger.error("Error getting route from OSRM: %s", e)
             raise ValueError(f"Error getting route from OSRM: {str(e)}")
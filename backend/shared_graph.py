@@ -0,0 +1,377 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+# Layout of a graph file (little endian):
+#   header | weights f64[E] | durations f64[E] | coords f64[2N] | offsets u32[N+1]
+#          | targets u32[E] | name_offsets u32[N+1] | names utf-8
+# Float arrays come first so they stay 8-byte aligned.
+MAGIC = b"DJKG"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<4sIIIQ")
+HEADER_SIZE = 32  # HEADER.size padded to 8 bytes
+
+POINTER_FILE = "current"
+LOCK_FILE = "build.lock"
+
+
+def write_graph_file(
+    path: str,
+    graph: Mapping[str, List[Tuple[str, float]]],
+    node_coordinates: Mapping[str, Tuple[float, float]],
+    durations: Optional[Mapping[str, List[Tuple[str, float]]]] = None,
+):
+    """
+    Serialize an adjacency dict and node coordinates into the flat file format.
+    durations is the same adjacency with travel times as weights (as built by
+    TravelTimeService.build_graph); without it the durations are NaN.
+    """
+    names = list(graph.keys())
+    for name in node_coordinates:
+        if name not in graph:
+            names.append(name)
+    index = {name: i for i, name in enumerate(names)}
+
+    offsets = [0]
+    targets = []
+    weights = []
+    edge_durations = []
+    for name in names:
+        edges = graph.get(name, [])
+        for target, weight in edges:
+            targets.append(index[target])
+            weights.append(weight)
+        if durations is not None:
+            edge_durations.extend(d for _, d in durations.get(name, ()))
+        else:
+            edge_durations.extend(float("nan") for _ in edges)
+        offsets.append(len(targets))
+
+    coords = []
+    for name in names:
+        lat, lon = node_coordinates.get(name, (float("nan"), float("nan")))
+        coords.extend((lat, lon))
+
+    encoded = [name.encode("utf-8") for name in names]
+    name_offsets = [0]
+    for raw in encoded:
+        name_offsets.append(name_offsets[-1] + len(raw))
+    names_blob = b"".join(encoded)
+
+    with open(path, "wb") as file:
+        file.write(
+            HEADER.pack(MAGIC, FORMAT_VERSION, len(names), len(targets), len(names_blob))
+        )
+        file.write(b"\0" * (HEADER_SIZE - HEADER.size))
+        file.write(struct.pack(f"<{len(weights)}d", *weights))
+        file.write(struct.pack(f"<{len(edge_durations)}d", *edge_durations))
+        file.write(struct.pack(f"<{len(coords)}d", *coords))
+        file.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        file.write(struct.pack(f"<{len(targets)}I", *targets))
+        file.write(struct.pack(f"<{len(name_offsets)}I", *name_offsets))
+        file.write(names_blob)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+class SharedGraph:
+    """A read-only graph backed by a memory-mapped file, shared between processes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, node_count, edge_count, names_len = HEADER.unpack_from(
+            self._mmap, 0
+        )
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"Not a graph file: {path}")
+
+        view = memoryview(self._mmap)
+        position = HEADER_SIZE
+
+        def take(count: int, fmt: str, size: int):
+            nonlocal position
+            array = view[position : position + count * size].cast(fmt)
+            position += count * size
+            return array
+
+        self.edge_count = edge_count
+        self.weights = take(edge_count, "d", 8)
+        self.durations = take(edge_count, "d", 8)
+        self.coords = take(node_count * 2, "d", 8)
+        self.offsets = take(node_count + 1, "I", 4)
+        self.targets = take(edge_count, "I", 4)
+        name_offsets = take(node_count + 1, "I", 4)
+        blob = bytes(view[position : position + names_len])
+
+        # Names are decoded once per process, the adjacency stays in the shared mapping
+        self.names = [
+            blob[name_offsets[i] : name_offsets[i + 1]].decode("utf-8")
+            for i in range(node_count)
+        ]
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+        self.graph = SharedAdjacency(self, self.weights)
+        # The same edges with travel times (seconds) as weights
+        self.duration_graph = SharedAdjacency(self, self.durations)
+        self.node_coordinates = SharedCoordinates(self)
+
+    def neighbors(self, i: int, weights=None) -> List[Tuple[str, float]]:
+        start, end = self.offsets[i], self.offsets[i + 1]
+        names = self.names
+        if weights is None:
+            weights = self.weights
+        return [
+            (names[target], weight)
+            for target, weight in zip(self.targets[start:end], weights[start:end])
+        ]
+
+
+    def edge_positions(self, source: str, target: str) -> List[int]:
+        """Positions in the edge arrays of the edges source-target, both ways"""
+        positions = []
+        for node, neighbor in ((source, target), (target, source)):
+            i, j = self.index.get(node), self.index.get(neighbor)
+            if i is None or j is None:
+                continue
+            positions.extend(
+                position
+                for position in range(self.offsets[i], self.offsets[i + 1])
+                if self.targets[position] == j
+            )
+        return positions
+
+
+class SharedAdjacency(Mapping):
+    """Dict-like view {node: [(neighbor, weight), ...]} over a SharedGraph"""
+
+    def __init__(self, shared: SharedGraph, weights):
+        self._shared = shared
+        self._weights = weights
+
+    def __getitem__(self, node: str) -> List[Tuple[str, float]]:
+        return self._shared.neighbors(self._shared.index[node], self._weights)
+
+    def __contains__(self, node) -> bool:
+        return node in self._shared.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._shared.names)
+
+    def __len__(self) -> int:
+        return len(self._shared.names)
+
+
+class SharedCoordinates(Mapping):
+    """Dict-like view {node: (lat, lon)} over a SharedGraph"""
+
+    def __init__(self, shared: SharedGraph):
+        self._shared = shared
+
+    def __getitem__(self, node: str) -> Tuple[float, float]:
+        i = self._shared.index[node]
+        return self._shared.coords[2 * i], self._shared.coords[2 * i + 1]
+
+    def __contains__(self, node) -> bool:
+        return node in self._shared.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._shared.names)
+
+    def __len__(self) -> int:
+        return len(self._shared.names)
+
+
+class SharedGraphStore:
+    """
+    Directory holding published graph files and a pointer to the current one.
+
+    A new graph is written to its own file and the pointer file is swapped
+    with os.replace, which is atomic. Processes that still map the previous
+    file keep reading it until they call refresh(). The pointer carries a
+    version that grows with every publish, which is what processes compare
+    (file mtimes are too coarse to tell two quick publishes apart).
+    """
+
+    def __init__(self, directory: Optional[str] = None, keep: int = 2):
+        self.directory = directory or os.getenv(
+            "SHARED_GRAPH_DIR",
+            "/dev/shm/dijkstra-graph"
+            if os.path.isdir("/dev/shm")
+            else os.path.join(tempfile.gettempdir(), "dijkstra-graph"),
+        )
+        self.keep = keep
+        os.makedirs(self.directory, exist_ok=True)
+        self._current: Optional[SharedGraph] = None
+        self._version: Optional[int] = None
+        self._held = threading.local()
+
+    @property
+    def pointer_path(self) -> str:
+        return os.path.join(self.directory, POINTER_FILE)
+
+    @contextmanager
+    def build_lock(self):
+        """
+        Exclusive lock so only one process (and thread) builds and publishes
+        at a time. A thread that already holds it can take it again.
+        """
+        if getattr(self._held, "depth", 0):
+            self._held.depth += 1
+            try:
+                yield
+            finally:
+                self._held.depth -= 1
+            return
+        with open(os.path.join(self.directory, LOCK_FILE), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._held.depth = 1
+            try:
+                yield
+            finally:
+                self._held.depth = 0
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def read_pointer(self) -> Optional[Dict]:
+        try:
+            with open(self.pointer_path) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def publish(
+        self,
+        graph: Mapping[str, List[Tuple[str, float]]],
+        node_coordinates: Mapping[str, Tuple[float, float]],
+        durations: Optional[Mapping[str, List[Tuple[str, float]]]] = None,
+    ) -> str:
+        """Write a new graph file and atomically make it the current one"""
+        previous = self.read_pointer()
+        version = time.time_ns()
+        if previous is not None:
+            version = max(version, previous["version"] + 1)
+        filename = f"graph-{version}.bin"
+        path = os.path.join(self.directory, filename)
+        write_graph_file(path + ".tmp", graph, node_coordinates, durations)
+        os.replace(path + ".tmp", path)
+
+        self._write_pointer(
+            {"file": filename, "version": version, "published_at": time.time_ns()}
+        )
+        self._cleanup()
+        return path
+
+    def _write_pointer(self, pointer: Dict):
+        with open(self.pointer_path + ".tmp", "w") as file:
+            json.dump(pointer, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(self.pointer_path + ".tmp", self.pointer_path)
+
+    def update_weights(
+        self,
+        weights: Iterable[Tuple[str, str, float]],
+        durations: Iterable[Tuple[str, str, float]] = (),
+    ) -> int:
+        """
+        Overwrite the weights (and durations) of existing (source, target)
+        edges, both ways, in the current graph file itself, then bump the
+        pointer version so other processes drop what they derived from the
+        old weights. Each value is one aligned 8-byte store, so a concurrent
+        search sees an edge with either its old or its new weight. Call under
+        build_lock(), or a publish from an older read could overtake it.
+        Returns the number of weights updated.
+        """
+        pointer = self.read_pointer()
+        if pointer is None:
+            return 0
+        path = os.path.join(self.directory, pointer["file"])
+        shared = self._current
+        if shared is None or shared.path != path:
+            shared = SharedGraph(path)
+        edge_count = shared.edge_count
+
+        updated = 0
+        with open(path, "r+b") as file, mmap.mmap(file.fileno(), 0) as mapping:
+            view = memoryview(mapping)
+            values = view[HEADER_SIZE : HEADER_SIZE + 16 * edge_count].cast("d")
+            try:
+                for offset, updates in ((0, weights), (edge_count, durations)):
+                    for source, target, value in updates:
+                        for position in shared.edge_positions(source, target):
+                            values[offset + position] = value
+                            updated += offset == 0
+            finally:
+                values.release()
+                view.release()
+
+        self._write_pointer(
+            dict(pointer, version=max(time.time_ns(), pointer["version"] + 1))
+        )
+        return updated
+
+    def _cleanup(self):
+        """Remove old graph files; processes mapping them keep their copy alive"""
+        files = sorted(
+            f
+            for f in os.listdir(self.directory)
+            if f.startswith("graph-") and f.endswith(".bin")
+        )
+        for filename in files[: -self.keep]:
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                pass
+
+    def attach(self, pointer: Optional[Dict] = None) -> SharedGraph:
+        """Map the graph file named by pointer, the current one by default"""
+        for _ in range(3):
+            if pointer is None:
+                pointer = self.read_pointer()
+            if pointer is None:
+                raise FileNotFoundError(f"No graph published in {self.directory}")
+            try:
+                graph = SharedGraph(os.path.join(self.directory, pointer["file"]))
+            except FileNotFoundError:
+                # Cleaned up by newer publishes since the pointer was read
+                pointer = None
+                continue
+            # The version of the file actually mapped, not of a later pointer
+            self._current, self._version = graph, pointer["version"]
+            return graph
+        raise FileNotFoundError(f"Graph files in {self.directory} keep changing")
+
+    def has_update(self) -> bool:
+        """Whether refresh() would attach a newly published graph"""
+        pointer = self.read_pointer()
+        return pointer is not None and (
+            self._current is None or pointer["version"] != self._version
+        )
+
+    def refresh(self) -> Tuple[Optional[SharedGraph], bool]:
+        """
+        Return the current graph, re-attaching if a newer one was published,
+        or (None, False) while nothing has been published yet
+        """
+        pointer = self.read_pointer()
+        if pointer is not None and (
+            self._current is None or pointer["version"] != self._version
+        ):
+            current = self._current
+            if current is not None and current.path == os.path.join(
+                self.directory, pointer["file"]
+            ):
+                # Weights updated in place, the mapping already shows them
+                self._version = pointer["version"]
+                return current, True
+            return self.attach(pointer), True
+        return self._current, False
@@ -0,0 +1,292 @@
+import bisect
+import os
+from itertools import islice
+from math import ceil, cos, floor, hypot, isnan, radians
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dijkstra import DijkstraAlgorithm
+from geometry import point_in_polygon
+
+# (min_lat, min_lon, max_lat, max_lon)
+BBox = Tuple[float, float, float, float]
+Cell = Tuple[int, int]
+
+# Grid cell size in degrees (0.1 is about 11 km of latitude)
+DEFAULT_CELL_DEGREES = float(os.getenv("SPATIAL_CELL_DEGREES", "0.1"))
+
+# Coordinates further than this from every edge are not snapped
+SNAP_MAX_KM = float(os.getenv("SNAP_MAX_KM", "50"))
+
+KM_PER_DEGREE_LAT = 111.32
+
+_dijkstra = DijkstraAlgorithm()
+
+
+class GridIndex:
+    """
+    Node coordinates bucketed in a uniform lat/lon grid. A bounding box query
+    only visits the cells overlapping the box, so its cost depends on how
+    many nodes are in view, not on the size of the graph.
+
+    Results come in name order, which is what the /nodes/ and /edges/ cursors
+    page through.
+    """
+
+    def __init__(
+        self,
+        items: Iterable[Tuple[str, float, float]] = (),
+        cell_degrees: float = DEFAULT_CELL_DEGREES,
+    ):
+        self.cell_degrees = cell_degrees
+        self.rebuild(items)
+
+    def rebuild(self, items: Iterable[Tuple[str, float, float]]):
+        """Replace the indexed nodes with (name, lat, lon) items"""
+        self._coordinates: Dict[str, Tuple[float, float]] = {}
+        self._cells: Dict[Cell, List[str]] = {}
+        self._sorted: Optional[List[str]] = None
+        for name, lat, lon in items:
+            self.add(name, lat, lon)
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return floor(lat / self.cell_degrees), floor(lon / self.cell_degrees)
+
+    def add(self, name: str, lat: Optional[float], lon: Optional[float]):
+        # Nodes without coordinates can't be placed on the map
+        if lat is None or lon is None or isnan(lat) or isnan(lon):
+            return
+        if name in self._coordinates:
+            self.remove(name)
+        self._coordinates[name] = (lat, lon)
+        self._cells.setdefault(self._cell(lat, lon), []).append(name)
+        self._sorted = None
+
+    def remove(self, name: str):
+        coordinates = self._coordinates.pop(name, None)
+        if coordinates is None:
+            return
+        cell = self._cell(*coordinates)
+        names = self._cells[cell]
+        names.remove(name)
+        if not names:
+            del self._cells[cell]
+        self._sorted = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._coordinates
+
+    def __len__(self) -> int:
+        return len(self._coordinates)
+
+    def coordinates(self, name: str) -> Optional[Tuple[float, float]]:
+        return self._coordinates.get(name)
+
+    def query(self, bbox: BBox) -> List[str]:
+        """Names of the nodes inside bbox (borders included), in no order"""
+        min_lat, min_lon, max_lat, max_lon = bbox
+        min_row, min_col = self._cell(min_lat, min_lon)
+        max_row, max_col = self._cell(max_lat, max_lon)
+        # A box larger than the populated area: scanning the cells is cheaper
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self._cells):
+            cells = [
+                names
+                for (row, col), names in self._cells.items()
+                if min_row <= row <= max_row and min_col <= col <= max_col
+            ]
+        else:
+            cells = [
+                self._cells[(row, col)]
+                for row in range(min_row, max_row + 1)
+                for col in range(min_col, max_col + 1)
+                if (row, col) in self._cells
+            ]
+        coordinates = self._coordinates
+        found = []
+        for names in cells:
+            for name in names:
+                lat, lon = coordinates[name]
+                if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                    found.append(name)
+        return found
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> List[str]:
+        """Names of the nodes at most radius_km (great-circle) from (lat, lon)"""
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        dlon = radius_km / (KM_PER_DEGREE_LAT * max(cos(radians(lat)), 1e-6))
+        distance = _dijkstra.calculate_distance
+        return [
+            name
+            for name in self.query((lat - dlat, lon - dlon, lat + dlat, lon + dlon))
+            if distance(lat, lon, *self._coordinates[name]) <= radius_km
+        ]
+
+    def within_polygon(self, polygon: List[Tuple[float, float]]) -> List[str]:
+        """Names of the nodes inside a (lat, lon) polygon"""
+        lats = [lat for lat, _ in polygon]
+        lons = [lon for _, lon in polygon]
+        return [
+            name
+            for name in self.query((min(lats), min(lons), max(lats), max(lons)))
+            if point_in_polygon(self._coordinates[name], polygon)
+        ]
+
+    def names_from(
+        self, start: Optional[str] = None, bbox: Optional[BBox] = None
+    ) -> Iterator[str]:
+        """Names in bbox (everywhere if None) in name order, from start on"""
+        if bbox is not None:
+            names = sorted(self.query(bbox))
+        else:
+            if self._sorted is None:
+                self._sorted = sorted(self._coordinates)
+            names = self._sorted
+        first = 0 if start is None else bisect.bisect_left(names, start)
+        return islice(names, first, None)
+
+    def clusters(self, bbox: BBox, cell_degrees: float) -> List[Dict]:
+        """
+        Nodes in bbox grouped into cells of cell_degrees, as the centroid and
+        count of each cell. Single-node cells keep the node's name.
+        """
+        groups: Dict[Cell, List] = {}
+        for name in self.query(bbox):
+            lat, lon = self._coordinates[name]
+            key = (floor(lat / cell_degrees), floor(lon / cell_degrees))
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [lat, lon, 1, name]
+            else:
+                group[0] += lat
+                group[1] += lon
+                group[2] += 1
+        return [
+            {
+                "latitude": lat / count,
+                "longitude": lon / count,
+                "count": count,
+                "name": name if count == 1 else None,
+            }
+            for lat, lon, count, name in groups.values()
+        ]
+
+
+class EdgeIndex:
+    """
+    Graph edges as straight segments, bucketed in every grid cell they cross,
+    for snapping coordinates onto the graph. nearest() searches rings of
+    cells outward from the point and stops once no unvisited cell can hold
+    a closer segment.
+    """
+
+    def __init__(
+        self,
+        coordinates: Dict[str, Tuple[float, float]],
+        graph: Dict[str, List[Tuple[str, float]]],
+        cell_degrees: float = DEFAULT_CELL_DEGREES,
+    ):
+        self.cell_degrees = cell_degrees
+        self._coordinates = coordinates
+        self._cells: Dict[Cell, List[Tuple[str, str]]] = {}
+        for source, edges in graph.items():
+            if source not in coordinates:
+                continue
+            for target, _ in edges:
+                # Undirected: each edge once, from its smaller end
+                if source < target and target in coordinates:
+                    self._add(source, target)
+
+    def _add(self, source: str, target: str):
+        lat1, lon1 = self._coordinates[source]
+        lat2, lon2 = self._coordinates[target]
+        # Half-cell steps; a corner the samples skip is covered by the
+        # one-ring slack in nearest()
+        steps = ceil(2 * max(abs(lat2 - lat1), abs(lon2 - lon1)) / self.cell_degrees)
+        cells = set()
+        for i in range(steps + 1):
+            t = i / steps if steps else 0
+            lat, lon = lat1 + (lat2 - lat1) * t, lon1 + (lon2 - lon1) * t
+            cells.add((floor(lat / self.cell_degrees), floor(lon / self.cell_degrees)))
+        for cell in cells:
+            self._cells.setdefault(cell, []).append((source, target))
+
+    def nearest(
+        self, lat: float, lon: float, max_km: float = SNAP_MAX_KM
+    ) -> Optional[Dict]:
+        """
+        The point of the graph closest to (lat, lon) as the edge (source,
+        target), the fraction of the way from source to target, the snapped
+        coordinates and the distance in km. None if no edge is within max_km.
+        """
+        if not self._cells:
+            return None
+        scale = max(cos(radians(lat)), 1e-6)
+        # The shorter side of a cell, in km, bounds the distance per ring
+        cell_km = self.cell_degrees * KM_PER_DEGREE_LAT * scale
+        row, col = floor(lat / self.cell_degrees), floor(lon / self.cell_degrees)
+        # Rows further than max_km are skipped whatever the latitude; only
+        # the column span grows towards the poles, up to half the globe
+        max_rows = ceil(max_km / (self.cell_degrees * KM_PER_DEGREE_LAT)) + 1
+        max_ring = min(ceil(max_km / cell_km), ceil(180 / self.cell_degrees)) + 1
+
+        best, best_km = None, float("infinity")
+        seen = set()
+        for ring in range(max_ring + 1):
+            for cell in self._ring(row, col, ring, max_rows):
+                for edge in self._cells.get(cell, ()):
+                    if edge in seen:
+                        continue
+                    seen.add(edge)
+                    fraction, snapped_lat, snapped_lon = self._project(
+                        lat, lon, scale, *edge
+                    )
+                    km = KM_PER_DEGREE_LAT * hypot(
+                        snapped_lat - lat, (snapped_lon - lon) * scale
+                    )
+                    if km < best_km:
+                        best_km = km
+                        best = (edge, fraction, snapped_lat, snapped_lon)
+            if best is not None and best_km <= (ring - 1) * cell_km:
+                break
+
+        if best is None or best_km > max_km:
+            return None
+        (source, target), fraction, snapped_lat, snapped_lon = best
+        return {
+            "source": source,
+            "target": target,
+            "fraction": fraction,
+            "latitude": snapped_lat,
+            "longitude": snapped_lon,
+            "distance_km": _dijkstra.calculate_distance(
+                lat, lon, snapped_lat, snapped_lon
+            ),
+        }
+
+    @staticmethod
+    def _ring(row: int, col: int, ring: int, max_rows: int) -> Iterator[Cell]:
+        """Cells on the square ring around (row, col), at most max_rows away"""
+        if ring == 0:
+            yield row, col
+            return
+        if ring <= max_rows:
+            for c in range(col - ring, col + ring + 1):
+                yield row - ring, c
+                yield row + ring, c
+        span = min(ring - 1, max_rows)
+        for r in range(row - span, row + span + 1):
+            yield r, col - ring
+            yield r, col + ring
+
+    def _project(
+        self, lat: float, lon: float, scale: float, source: str, target: str
+    ) -> Tuple[float, float, float]:
+        """Closest point of the segment, on a plane local to the query point"""
+        lat1, lon1 = self._coordinates[source]
+        lat2, lon2 = self._coordinates[target]
+        dx, dy = (lon2 - lon1) * scale, lat2 - lat1
+        length_sq = dx * dx + dy * dy
+        if length_sq == 0:
+            return 0.0, lat1, lon1
+        t = ((lon - lon1) * scale * dx + (lat - lat1) * dy) / length_sq
+        t = min(1.0, max(0.0, t))
+        return t, lat1 + (lat2 - lat1) * t, lon1 + (lon2 - lon1) * t
@@ -0,0 +1,62 @@
+import random
+import unittest
+
+from benchmarks.graph_generators import build_dijkstra, random_geometric_knn
+from tests.test_partitioning import path_cost
+
+
+class NearestSourcesTest(unittest.TestCase):
+    """The multi-source search against one point-to-point search per pair"""
+
+    def check(self, dijkstra, sources, targets, k, avoid=None):
+        nearest = dijkstra.nearest_sources(sources, targets, k, avoid)
+        self.assertEqual(set(nearest), set(targets))
+        for target in targets:
+            costs = sorted(
+                cost
+                for cost in (
+                    dijkstra.find_shortest_path(source, target, avoid)[1]
+                    for source in set(sources)
+                )
+                if cost != float("infinity")
+            )[:k]
+            found = nearest[target]
+            self.assertEqual(len(found), len(costs))
+            for (source, path, cost), expected in zip(found, costs):
+                self.assertAlmostEqual(cost, expected, places=9)
+                self.assertIn(source, sources)
+                self.assertEqual(path[0], source)
+                self.assertEqual(path[-1], target)
+                self.assertAlmostEqual(path_cost(dijkstra.graph, path), cost, places=9)
+                self.assertFalse(set(path) & set(avoid or ()))
+            self.assertEqual(len({source for source, _, _ in found}), len(found))
+
+    def test_random_graphs(self):
+        for seed in range(3):
+            rng = random.Random(seed)
+            dijkstra = build_dijkstra(random_geometric_knn(300, 3, seed))
+            names = list(dijkstra.graph)
+            sources = rng.sample(names, 15)
+            targets = rng.sample(names, 25)
+            for k in (1, 3, 20):
+                with self.subTest(seed=seed, k=k):
+                    self.check(dijkstra, sources, targets, k)
+
+    def test_avoid(self):
+        rng = random.Random(7)
+        dijkstra = build_dijkstra(random_geometric_knn(300, 3, 7))
+        names = list(dijkstra.graph)
+        sources = rng.sample(names, 10)
+        targets = rng.sample([name for name in names if name not in sources], 20)
+        blocked = set(sources) | set(targets)
+        avoid = rng.sample([name for name in names if name not in blocked], 40)
+        self.check(dijkstra, sources, targets, 2, avoid)
+
+    def test_target_is_a_source(self):
+        dijkstra = build_dijkstra(random_geometric_knn(50, 3, 1))
+        nearest = dijkstra.nearest_sources(["node-3", "node-4"], ["node-3"], k=1)
+        self.assertEqual(nearest["node-3"], [("node-3", ["node-3"], 0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
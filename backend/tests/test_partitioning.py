@@ -0,0 +1,68 @@
+import random
+import unittest
+
+from benchmarks.graph_generators import build_dijkstra, grid, random_geometric_knn
+from partitioning import OverlayRouter
+
+
+def path_cost(graph, path):
+    """Sum of the edge weights along path, failing on a missing edge"""
+    cost = 0
+    for source, target in zip(path, path[1:]):
+        weights = [weight for node, weight in graph[source] if node == target]
+        assert weights, f"No edge {source} -> {target}"
+        cost += min(weights)
+    return cost
+
+
+class OverlayRouterTest(unittest.TestCase):
+    """OverlayRouter must agree with a plain search over the whole graph"""
+
+    def check_against_dijkstra(self, data, max_cell_size, queries=200, seed=0):
+        nodes, _ = data
+        dijkstra = build_dijkstra(data)
+        coordinates = {name: tuple(coords) for name, coords in nodes.items()}
+        router = OverlayRouter.build(dijkstra.graph, coordinates, max_cell_size)
+        self.addCleanup(router.close)
+        self.assertGreater(router.get_stats()["cells"], 1)
+
+        rng = random.Random(seed)
+        names = list(nodes)
+        for _ in range(queries):
+            start, end = rng.choice(names), rng.choice(names)
+            expected_path, expected = dijkstra.find_shortest_path(start, end)
+            path, distance = router.find_shortest_path(start, end)
+            if not expected_path:
+                self.assertEqual(path, [])
+                self.assertEqual(distance, float("infinity"))
+                continue
+            self.assertAlmostEqual(distance, expected, places=9)
+            self.assertEqual(path[0], start)
+            self.assertEqual(path[-1], end)
+            self.assertAlmostEqual(path_cost(dijkstra.graph, path), expected, places=9)
+
+    def test_random_knn_graphs(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                self.check_against_dijkstra(
+                    random_geometric_knn(400, 3, seed), max_cell_size=40, seed=seed
+                )
+
+    def test_grid(self):
+        self.check_against_dijkstra(grid(15, 15), max_cell_size=20)
+
+    def test_same_node_and_unknown_nodes(self):
+        data = random_geometric_knn(100, 3, 0)
+        nodes, _ = data
+        dijkstra = build_dijkstra(data)
+        coordinates = {name: tuple(coords) for name, coords in nodes.items()}
+        router = OverlayRouter.build(dijkstra.graph, coordinates, max_cell_size=20)
+        self.addCleanup(router.close)
+        self.assertEqual(router.find_shortest_path("node-0", "node-0"), (["node-0"], 0))
+        self.assertEqual(
+            router.find_shortest_path("node-0", "missing"), ([], float("infinity"))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
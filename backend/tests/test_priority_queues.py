@@ -0,0 +1,125 @@
+import random
+import unittest
+
+from benchmarks.graph_generators import build_dijkstra, random_geometric_knn
+from priority_queues import QUEUES, IndexedDaryHeap, RadixHeap
+from tests.test_partitioning import path_cost
+
+
+def drain(queue):
+    return [queue.pop() for _ in range(len(queue))]
+
+
+class IndexedDaryHeapTest(unittest.TestCase):
+    def test_pops_in_priority_order(self):
+        rng = random.Random(0)
+        for d in (2, 3, 4, 8):
+            with self.subTest(d=d):
+                heap = IndexedDaryHeap(d)
+                priorities = {f"n{i}": rng.random() for i in range(500)}
+                for item, priority in priorities.items():
+                    heap.push(priority, item)
+                popped = drain(heap)
+                self.assertEqual(len(heap), 0)
+                self.assertEqual(popped, sorted((p, i) for i, p in priorities.items()))
+
+    def test_decrease_key(self):
+        rng = random.Random(1)
+        heap = IndexedDaryHeap()
+        best = {}
+        for _ in range(2000):
+            item, priority = f"n{rng.randrange(200)}", rng.random()
+            heap.push(priority, item)
+            best[item] = min(priority, best.get(item, priority))
+        # Every item is queued once, with its lowest priority
+        self.assertEqual(len(heap), len(best))
+        self.assertEqual(drain(heap), sorted((p, i) for i, p in best.items()))
+
+    def test_higher_priority_is_ignored(self):
+        heap = IndexedDaryHeap()
+        heap.push(1.0, "a")
+        heap.push(2.0, "a")
+        heap.push(1.5, "b")
+        self.assertEqual(drain(heap), [(1.0, "a"), (1.5, "b")])
+
+    def test_interleaved_pushes_and_pops(self):
+        rng = random.Random(2)
+        heap = IndexedDaryHeap(3)
+        queued = {}
+        for _ in range(3000):
+            if queued and rng.random() < 0.4:
+                priority, item = heap.pop()
+                self.assertEqual(priority, min(queued.values()))
+                self.assertEqual(queued.pop(item), priority)
+            else:
+                item, priority = f"n{rng.randrange(100)}", rng.random()
+                heap.push(priority, item)
+                queued[item] = min(priority, queued.get(item, priority))
+            self.assertEqual(len(heap), len(queued))
+
+
+class RadixHeapTest(unittest.TestCase):
+    def test_monotone_dijkstra_like_use(self):
+        # Pushes are never below the last popped priority, as in a search
+        rng = random.Random(3)
+        heap = RadixHeap()
+        heap.push(0.0, "start")
+        pushed = 1
+        last = 0.0
+        popped = []
+        while len(heap):
+            priority, item = heap.pop()
+            # Exact priorities come back; their order is exact to 1 / scale
+            self.assertGreaterEqual(priority, last - 1 / heap.scale)
+            last = max(last, priority)
+            popped.append(item)
+            if pushed < 5000:
+                for _ in range(rng.randrange(4)):
+                    heap.push(priority + rng.uniform(0, 50), f"n{pushed}")
+                    pushed += 1
+        self.assertEqual(len(popped), pushed)
+
+    def test_sorted_by_key(self):
+        rng = random.Random(4)
+        heap = RadixHeap(scale=1)
+        keys = [rng.randrange(10**6) for _ in range(1000)]
+        for i, key in enumerate(keys):
+            heap.push(float(key), i)
+        self.assertEqual([priority for priority, _ in drain(heap)], sorted(keys))
+
+    def test_large_priorities(self):
+        heap = RadixHeap()
+        for priority in (1e12, 3.5, 1e9, 0.0):
+            heap.push(priority, priority)
+        self.assertEqual(
+            [priority for priority, _ in drain(heap)], [0.0, 3.5, 1e9, 1e12]
+        )
+
+
+class QueueSearchTest(unittest.TestCase):
+    """Every priority queue must give the same shortest distances"""
+
+    def test_queues_agree(self):
+        dijkstra = build_dijkstra(random_geometric_knn(500, 3, 2))
+        names = list(dijkstra.graph)
+        rng = random.Random(2)
+        queries = [(rng.choice(names), rng.choice(names)) for _ in range(100)]
+        dijkstra.queue = "binary"
+        expected = [dijkstra.find_shortest_path(*query)[1] for query in queries]
+        for kind in QUEUES:
+            dijkstra.queue = kind
+            for query, distance in zip(queries, expected):
+                with self.subTest(queue=kind, query=query):
+                    path, found = dijkstra.find_shortest_path(*query)
+                    if distance == float("infinity"):
+                        self.assertEqual(found, distance)
+                    else:
+                        # The radix heap is exact to 1 / scale (1 m)
+                        self.assertAlmostEqual(found, distance, delta=1e-3)
+                        self.assertAlmostEqual(
+                            path_cost(dijkstra.graph, path), found, places=9
+                        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import math
+import os
+import tempfile
+import threading
+import unittest
+
+from shared_graph import SharedGraphStore
+
+GRAPH = {"a": [("b", 1.0)], "b": [("a", 1.0), ("c", 2.5)], "c": [("b", 2.5)]}
+COORDINATES = {"a": (45.0, 21.0), "b": (45.5, 21.5), "c": (46.0, 22.0)}
+DURATIONS = {"a": [("b", 60.0)], "b": [("a", 60.0), ("c", 150.0)], "c": [("b", 150.0)]}
+
+
+class SharedGraphStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_round_trip(self):
+        store = SharedGraphStore(self.directory)
+        store.publish(GRAPH, COORDINATES, durations=DURATIONS)
+        shared = store.attach()
+        self.assertEqual(dict(shared.graph), GRAPH)
+        self.assertEqual(dict(shared.duration_graph), DURATIONS)
+        self.assertEqual(dict(shared.node_coordinates), COORDINATES)
+
+    def test_durations_default_to_nan(self):
+        store = SharedGraphStore(self.directory)
+        store.publish(GRAPH, COORDINATES)
+        weights = [weight for _, weight in store.attach().duration_graph["b"]]
+        self.assertTrue(all(math.isnan(weight) for weight in weights))
+
+    def test_refresh_sees_every_publish(self):
+        publisher = SharedGraphStore(self.directory)
+        reader = SharedGraphStore(self.directory)
+        self.assertEqual(reader.refresh(), (None, False))
+        self.assertFalse(reader.has_update())
+
+        publisher.publish(GRAPH, COORDINATES)
+        self.assertTrue(reader.has_update())
+        shared, changed = reader.refresh()
+        self.assertTrue(changed)
+        self.assertEqual(reader.refresh(), (shared, False))
+
+        # Publishes closer together than the file timestamp resolution
+        for weight in (3.0, 4.0, 5.0):
+            publisher.publish({"a": [("b", weight)], "b": [("a", weight)]}, {})
+            self.assertTrue(reader.has_update())
+            shared, changed = reader.refresh()
+            self.assertTrue(changed)
+            self.assertEqual(shared.graph["a"], [("b", weight)])
+        self.assertFalse(reader.has_update())
+
+    def test_publish_during_attach(self):
+        publisher = SharedGraphStore(self.directory)
+        reader = SharedGraphStore(self.directory)
+        publisher.publish(GRAPH, COORDINATES)
+        read_pointer = reader.read_pointer
+
+        def read_then_publish():
+            # Another process publishes right after the pointer was read
+            pointer = read_pointer()
+            reader.read_pointer = read_pointer
+            publisher.publish({"a": [("b", 9.0)], "b": [("a", 9.0)]}, {})
+            return pointer
+
+        reader.read_pointer = read_then_publish
+        self.assertEqual(dict(reader.attach().graph), GRAPH)
+        self.assertTrue(reader.has_update())
+        self.assertEqual(reader.refresh()[0].graph["a"], [("b", 9.0)])
+
+    def test_build_lock_is_reentrant_and_exclusive(self):
+        store = SharedGraphStore(self.directory)
+        other = SharedGraphStore(self.directory)
+        acquired = threading.Event()
+
+        def take_lock():
+            with other.build_lock():
+                acquired.set()
+
+        with store.build_lock():
+            with store.build_lock():
+                thread = threading.Thread(target=take_lock)
+                thread.start()
+                self.assertFalse(acquired.wait(0.1))
+            self.assertFalse(acquired.wait(0.1))
+        self.assertTrue(acquired.wait(2))
+        thread.join()
+
+    def test_versions_increase(self):
+        store = SharedGraphStore(self.directory)
+        versions = []
+        for _ in range(5):
+            store.publish(GRAPH, COORDINATES)
+            versions.append(store.read_pointer()["version"])
+        self.assertEqual(versions, sorted(set(versions)))
+
+    def test_update_weights_in_place(self):
+        publisher = SharedGraphStore(self.directory)
+        path = publisher.publish(GRAPH, COORDINATES, durations=DURATIONS)
+        reader = SharedGraphStore(self.directory)
+        shared = reader.attach()
+
+        updated = publisher.update_weights([("b", "c", 7.0)], [("b", "c", 420.0)])
+        self.assertEqual(updated, 2)
+        # Visible through the existing mapping, no new file is published
+        self.assertEqual(shared.graph["c"], [("b", 7.0)])
+        self.assertEqual(shared.duration_graph["b"], [("a", 60.0), ("c", 420.0)])
+        self.assertEqual(publisher.read_pointer()["file"], os.path.basename(path))
+        self.assertTrue(reader.has_update())
+        self.assertEqual(reader.refresh(), (shared, True))
+        self.assertFalse(reader.has_update())
+
+    def test_old_files_are_cleaned_up(self):
+        store = SharedGraphStore(self.directory, keep=2)
+        paths = [store.publish(GRAPH, COORDINATES) for _ in range(4)]
+        reader = SharedGraphStore(self.directory)
+        self.assertEqual(reader.attach().path, paths[-1])
+        # A reader that still maps a removed file keeps its copy
+        self.assertEqual(dict(reader.refresh()[0].graph), GRAPH)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from dijkstra import DijkstraAlgorithm
+from worker_pool import Debouncer, RoutingExecutor
+
+
+class DebouncerTest(unittest.TestCase):
+    def test_burst_is_one_call(self):
+        called = threading.Event()
+        debouncer = Debouncer(called.set, 0.05, "test")
+        for _ in range(100):
+            debouncer.trigger()
+        self.assertTrue(called.wait(2))
+        time.sleep(0.1)
+        self.assertEqual(debouncer.calls, 1)
+
+    def test_trigger_while_running_calls_again(self):
+        started, release = threading.Event(), threading.Event()
+        seen = []
+
+        def fn():
+            seen.append(len(seen))
+            started.set()
+            release.wait(2)
+
+        debouncer = Debouncer(fn, 0.01, "test")
+        debouncer.trigger()
+        self.assertTrue(started.wait(2))
+        # The running call may have read its state already: one more is due
+        debouncer.trigger()
+        release.set()
+        deadline = time.monotonic() + 2
+        while debouncer.calls < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(seen, [0, 1])
+
+    def test_failure_does_not_stop_later_calls(self):
+        def fail():
+            raise RuntimeError("boom")
+
+        debouncer = Debouncer(fail, 0.01, "test")
+        with self.assertLogs("worker_pool", "ERROR"):
+            debouncer.trigger()
+            time.sleep(0.1)
+        debouncer.trigger()
+        time.sleep(0.1)
+        self.assertEqual(debouncer.calls, 2)
+
+    def test_flush_calls_now(self):
+        debouncer = Debouncer(lambda: None, 60, "test")
+        debouncer.flush()
+        self.assertEqual(debouncer.calls, 0)
+        debouncer.trigger()
+        debouncer.flush()
+        self.assertEqual(debouncer.calls, 1)
+
+    def test_cancel(self):
+        debouncer = Debouncer(lambda: None, 0.05, "test")
+        debouncer.trigger()
+        debouncer.cancel()
+        time.sleep(0.1)
+        self.assertEqual(debouncer.calls, 0)
+
+
+class ProcessExecutorTest(unittest.TestCase):
+    def test_weight_updates_reach_workers_without_snapshot(self):
+        dijkstra = DijkstraAlgorithm()
+        dijkstra.add_edge("a", "b", 1.0)
+        dijkstra.add_edge("b", "c", 1.0)
+        dijkstra.add_edge("a", "c", 5.0)
+        executor = RoutingExecutor(dijkstra, mode="process", workers=1)
+        self.addCleanup(executor.shutdown)
+
+        async def search_before_and_after_update():
+            before = await executor.search("find_shortest_path", "a", "c")
+            updates = [("a", "b", 10.0)]
+            dijkstra.update_edge_weights(updates)
+            executor.update_edge_weights(updates)
+            after = await executor.search("find_shortest_path", "a", "c")
+            return before, after
+
+        before, after = asyncio.run(search_before_and_after_update())
+        self.assertEqual(before, (["a", "b", "c"], 2.0))
+        self.assertEqual(after, (["a", "c"], 5.0))
+        self.assertEqual(executor.metrics["snapshots"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
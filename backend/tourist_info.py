@@ -0,0 +1,178 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from llm_client import extract_json_from_text, get_generative_model
+from profiling import phase
+
+logger = logging.getLogger(__name__)
+
+
+def tourist_info_prompt(location: str, language: str) -> str:
+    """Prompt asking the model for tourist information about one location"""
+    if language == "ro":
+        return f"Oferă informații turistice pentru {location} incluzând:\n- Top 3 atracții de vizitat\n- 2 restaurante recomandate\n- Orice evenimente sau festivaluri speciale\n- Cel mai bun moment de vizitat\nFormatează răspunsul ca un JSON cu aceste chei: attractions, restaurants, events, best_time"
+    return f"Provide tourist information for {location} including:\n- Top 3 attractions to visit\n- 2 recommended restaurants\n- Any special events or festivals\n- Best time to visit\nFormat the response as a JSON with these keys: attractions, restaurants, events, best_time"
+
+
+class DatabaseTouristInfoStore:
+    """Persistent cache of tourist info in the tourist_info_cache table"""
+
+    def __init__(self, session_factory: Callable, model):
+        self.session_factory = session_factory
+        self.model = model
+
+    def _find(self, db, location: str, language: str):
+        return (
+            db.query(self.model)
+            .filter(self.model.location == location, self.model.language == language)
+            .first()
+        )
+
+    def get(self, location: str, language: str) -> Optional[Tuple[float, dict]]:
+        db = self.session_factory()
+        try:
+            row = self._find(db, location, language)
+            if row is None:
+                return None
+            return row.created_at, json.loads(row.payload)
+        finally:
+            db.close()
+
+    def set(self, location: str, language: str, info: dict):
+        db = self.session_factory()
+        try:
+            row = self._find(db, location, language)
+            if row is None:
+                row = self.model(location=location, language=language)
+                db.add(row)
+            row.payload = json.dumps(info)
+            row.created_at = time.time()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+class TouristInfoService:
+    """
+    Fetches tourist info for many locations concurrently, at most
+    `max_concurrency` LLM calls at a time, with results cached per
+    (location, language) for `ttl` seconds in memory and in `store`.
+    """
+
+    def __init__(
+        self,
+        store: Optional[DatabaseTouristInfoStore] = None,
+        model_factory: Callable = get_generative_model,
+        ttl: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        run_blocking: Callable[..., Awaitable] = asyncio.to_thread,
+    ):
+        self.run_blocking = run_blocking
+        self.store = store
+        self.model_factory = model_factory
+        self.ttl = ttl if ttl is not None else float(
+            os.getenv("TOURIST_INFO_TTL", str(7 * 24 * 3600))
+        )
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("TOURIST_INFO_CONCURRENCY", "5")
+        )
+        self._cache: Dict[Tuple[str, str], Tuple[float, dict]] = {}
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._model = None
+
+    def _is_fresh(self, created_at: float) -> bool:
+        return time.time() - created_at < self.ttl
+
+    async def get(self, location: str, language: str = "en") -> Optional[dict]:
+        """Tourist info for one location, from cache or from the model"""
+        key = (location, language)
+        cached = self._cache.get(key)
+        if cached and self._is_fresh(cached[0]):
+            return cached[1]
+
+        # Concurrent requests for the same location share one lookup
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(location, language))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _fetch(self, location: str, language: str) -> Optional[dict]:
+        key = (location, language)
+        if self.store is not None:
+            try:
+                with phase("tourist_info_db"):
+                    stored = await self.run_blocking(
+                        self.store.get, location, language
+                    )
+            except Exception as e:
+                logger.warning("Error reading tourist info cache: %s", e)
+                stored = None
+            if stored and self._is_fresh(stored[0]):
+                self._cache[key] = stored
+                return stored[1]
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self._model is None:
+            self._model = self.model_factory()
+
+        async with self._semaphore:
+            response = await self.run_blocking(
+                self._model.generate_content, tourist_info_prompt(location, language)
+            )
+        json_str = extract_json_from_text(response.text.strip())
+        if not json_str:
+            return None
+        info = json.loads(json_str)
+
+        self._cache[key] = (time.time(), info)
+        if self.store is not None:
+            try:
+                await self.run_blocking(self.store.set, location, language, info)
+            except Exception as e:
+                logger.warning("Error writing tourist info cache: %s", e)
+        return info
+
+    async def get_many(self, locations: List[str], language: str = "en") -> Dict:
+        """Tourist info for several locations, fetched concurrently"""
+        unique = list(dict.fromkeys(locations))
+        results = await asyncio.gather(
+            *(self.get(location, language) for location in unique)
+        )
+        return {
+            location: info
+            for location, info in zip(unique, results)
+            if info is not None
+        }
+
+    async def iter_completed(
+        self, locations: List[str], language: str = "en"
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        """Yield (location, info) pairs in the order the lookups complete"""
+
+        async def lookup(location: str):
+            return location, await self.get(location, language)
+
+        tasks = [
+            asyncio.ensure_future(lookup(location))
+            for location in dict.fromkeys(locations)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                location, info = await next_done
+                if info is not None:
+                    yield location, info
+        finally:
+            # The client may disconnect mid-stream
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Used for edges whose OSRM duration hasn't been fetched yet
+FALLBACK_SPEED_KMH = float(os.getenv("FALLBACK_SPEED_KMH", "60"))
+
+# Built-in hourly multipliers of the free-flow travel time
+PROFILES = {
+    "flat": [1.0] * 24,
+    "rush_hour": [
+        0.9, 0.9, 0.9, 0.9, 0.9, 1.0,  # 00-05
+        1.15, 1.4, 1.5, 1.3, 1.1, 1.1,  # 06-11
+        1.15, 1.15, 1.1, 1.2, 1.35, 1.5,  # 12-17
+        1.4, 1.2, 1.05, 1.0, 0.95, 0.9,  # 18-23
+    ],
+}
+
+
+class TimeProfile:
+    """
+    Travel-time multiplier by time of day, from 24 hourly factors.
+    Factors are interpolated linearly between the hours, so the travel time
+    changes gradually and arriving later never pays off by leaving later
+    (the FIFO property the time-dependent search relies on).
+    """
+
+    def __init__(self, factors: Sequence[float]):
+        if len(factors) != 24:
+            raise ValueError("A time profile needs 24 hourly factors")
+        self.factors = list(factors)
+
+    def factor(self, seconds_of_day: float) -> float:
+        hours = (seconds_of_day / 3600) % 24
+        hour = int(hours)
+        fraction = hours - hour
+        return (
+            self.factors[hour] * (1 - fraction)
+            + self.factors[(hour + 1) % 24] * fraction
+        )
+
+    @classmethod
+    def from_env(cls) -> "TimeProfile":
+        """TRAVEL_TIME_PROFILE is a built-in name or a JSON list of 24 factors"""
+        value = os.getenv("TRAVEL_TIME_PROFILE", "rush_hour")
+        if value in PROFILES:
+            return cls(PROFILES[value])
+        return cls(json.loads(value))
+
+
+def edge_key(source: str, target: str) -> Tuple[str, str]:
+    """Durations are stored once per undirected edge"""
+    return (source, target) if source < target else (target, source)
+
+
+class DatabaseEdgeDurationStore:
+    """Persistent cache of OSRM edge durations in the edge_durations table"""
+
+    def __init__(self, session_factory: Callable, model):
+        self.session_factory = session_factory
+        self.model = model
+
+    def load(self) -> Dict[Tuple[str, str], float]:
+        db = self.session_factory()
+        try:
+            return {
+                (row.source, row.target): row.duration
+                for row in db.query(self.model).all()
+            }
+        finally:
+            db.close()
+
+    def save(self, durations: Dict[Tuple[str, str], float]):
+        db = self.session_factory()
+        try:
+            now = time.time()
+            existing = {
+                (row.source, row.target): row
+                for row in db.query(self.model).filter(
+                    self.model.source.in_({source for source, _ in durations})
+                )
+            }
+            for (source, target), duration in durations.items():
+                row = existing.get((source, target))
+                if row is None:
+                    row = self.model(source=source, target=target)
+                    db.add(row)
+                row.duration = duration
+                row.created_at = now
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+class TravelTimeService:
+    """
+    Driving durations per graph edge, fetched in bulk from OSRM's table
+    service once per edge and cached in memory and in `store`.
+    """
+
+    def __init__(self, osrm, store: Optional[DatabaseEdgeDurationStore] = None):
+        self.osrm = osrm
+        self.store = store
+        # Coordinates per OSRM table request (the public server allows 100)
+        self.table_size = int(os.getenv("OSRM_TABLE_SIZE", "100"))
+        self.durations: Dict[Tuple[str, str], float] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._loaded or self.store is None:
+            return
+        try:
+            self.durations.update(self.store.load())
+        except Exception as e:
+            logger.warning("Error reading edge durations: %s", e)
+        self._loaded = True
+
+    def duration(self, source: str, target: str, distance_km: float) -> float:
+        """Cached OSRM duration of an edge, or an estimate from its length"""
+        cached = self.durations.get(edge_key(source, target))
+        if cached is not None:
+            return cached
+        return distance_km / FALLBACK_SPEED_KMH * 3600
+
+    def build_graph(
+        self, graph: Dict[str, List[Tuple[str, float]]]
+    ) -> Dict[str, List[Tuple[str, float]]]:
+        """Copy of a distance graph (km) with durations (seconds) as weights"""
+        with self._lock:
+            self._load()
+        return {
+            node: [
+                (neighbor, self.duration(node, neighbor, distance))
+                for neighbor, distance in edges
+            ]
+            for node, edges in graph.items()
+        }
+
+    def fetch_missing(
+        self,
+        graph: Dict[str, List[Tuple[str, float]]],
+        node_coordinates: Dict[str, Tuple[float, float]],
+    ) -> int:
+        """
+        Fetch OSRM durations for every edge that has none yet. Sources are
+        grouped with their neighbors into table requests of at most
+        `table_size` coordinates. Returns the number of durations fetched.
+        """
+        with self._lock:
+            self._load()
+            targets_by_source: Dict[str, set] = {}
+            for node, edges in graph.items():
+                for neighbor, _ in edges:
+                    key = edge_key(node, neighbor)
+                    if key not in self.durations and key[1] in node_coordinates:
+                        targets_by_source.setdefault(key[0], set()).add(key[1])
+
+            fetched: Dict[Tuple[str, str], float] = {}
+            chunk: Dict[str, set] = {}
+            names: set = set()
+            for source, targets in targets_by_source.items():
+                if source not in node_coordinates:
+                    continue
+                needed = targets | {source}
+                if chunk and len(names | needed) > self.table_size:
+                    fetched.update(self._fetch_chunk(chunk, names, node_coordinates))
+                    chunk, names = {}, set()
+                chunk[source] = targets
+                names |= needed
+            if chunk:
+                fetched.update(self._fetch_chunk(chunk, names, node_coordinates))
+
+            self.durations.update(fetched)
+        if fetched and self.store is not None:
+            self.store.save(fetched)
+        logger.info("Fetched %d edge durations from OSRM", len(fetched))
+        return len(fetched)
+
+    def _fetch_chunk(
+        self,
+        chunk: Dict[str, set],
+        names: set,
+        node_coordinates: Dict[str, Tuple[float, float]],
+    ) -> Dict[Tuple[str, str], float]:
+        ordered = list(names)
+        index = {name: i for i, name in enumerate(ordered)}
+        sources = list(chunk)
+        matrix = self.osrm.get_table(
+            [node_coordinates[name] for name in ordered],
+            [index[source] for source in sources],
+            list(range(len(ordered))),
+        )
+        durations = {}
+        for row, source in zip(matrix, sources):
+            for target in chunk[source]:
+                duration = row[index[target]]
+                if duration is not None:
+                    durations[(source, target)] = duration
+        return durations
+
+    def get_stats(self) -> Dict:
+        return {"cached_edges": len(self.durations)}
@@ -0,0 +1,361 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import IO, Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import profiling
+from dijkstra import DijkstraAlgorithm
+from shared_graph import SharedGraphStore
+
+logger = logging.getLogger(__name__)
+
+# A burst of graph edits within this many seconds costs a single snapshot
+SNAPSHOT_DELAY = float(os.getenv("ROUTING_SNAPSHOT_DELAY", "0.5"))
+# Replaced process pools still finishing their jobs; past this many, a new
+# snapshot waits for the oldest one to exit
+MAX_RETIRED_POOLS = int(os.getenv("ROUTING_MAX_RETIRED_POOLS", "2"))
+# Weight update batches applied on top of a snapshot before a new one is taken
+MAX_LOGGED_UPDATES = int(os.getenv("ROUTING_MAX_LOGGED_UPDATES", "100"))
+
+# Graph used inside process workers, filled in by the pool initializer
+_worker_dijkstra: Optional[DijkstraAlgorithm] = None
+_worker_store: Optional[SharedGraphStore] = None
+# Weight updates logged since the snapshot, and how many batches were applied
+_worker_updates: Optional[IO[str]] = None
+_worker_applied = 0
+
+
+def _init_worker(
+    graph: Optional[Dict[str, List[Tuple[str, float]]]],
+    shared_dir: Optional[str],
+    update_log: Optional[str] = None,
+):
+    """Build the read-only graph snapshot once per worker process"""
+    global _worker_dijkstra, _worker_store, _worker_updates
+    _worker_dijkstra = DijkstraAlgorithm()
+    if shared_dir is not None:
+        # Attach to the memory-mapped graph instead of holding a private copy
+        _worker_store = SharedGraphStore(shared_dir)
+        _worker_dijkstra.replace_graph(_worker_store.attach().graph)
+    else:
+        _worker_dijkstra.replace_graph(graph)
+        if update_log is not None:
+            _worker_updates = open(update_log)
+
+
+def _search_in_worker(method: str, args: tuple, kwargs: dict, logged: int = 0):
+    """
+    Run a DijkstraAlgorithm method against the worker's graph snapshot, after
+    applying the first `logged` weight update batches it hasn't applied yet
+    """
+    global _worker_applied
+    if _worker_store is not None:
+        shared, changed = _worker_store.refresh()
+        if changed:
+            if shared.graph is _worker_dijkstra.graph:
+                _worker_dijkstra.weights_changed()
+            else:
+                _worker_dijkstra.replace_graph(shared.graph)
+    while _worker_applied < logged:
+        _worker_dijkstra.update_edge_weights(json.loads(_worker_updates.readline()))
+        _worker_applied += 1
+    return getattr(_worker_dijkstra, method)(*args, **kwargs)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class Debouncer:
+    """
+    Calls fn on a background thread `delay` seconds after the first of a
+    burst of triggers, once for the whole burst. A trigger that arrives while
+    fn is running schedules one more call, so the last change is never missed.
+    """
+
+    def __init__(self, fn: Callable[[], Any], delay: float, name: str):
+        self.fn = fn
+        self.delay = delay
+        self.name = name
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def trigger(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.delay, self._run)
+            self._timer.name = self.name
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self):
+        with self._run_lock:
+            # Triggers from here on need another call, this one may miss them
+            with self._lock:
+                self._timer = None
+            self._call()
+
+    def _call(self):
+        try:
+            self.fn()
+        except Exception:
+            logger.exception("%s failed", self.name)
+        self.calls += 1
+
+    def flush(self):
+        """Make a pending call now, on the calling thread"""
+        with self._lock:
+            pending, self._timer = self._timer, None
+        if pending is not None:
+            pending.cancel()
+            with self._run_lock:
+                self._call()
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+class RoutingExecutor:
+    """
+    Runs CPU-heavy searches and blocking calls away from the asyncio event loop.
+
+    Searches go to a thread or process pool (ROUTING_EXECUTOR=thread|process),
+    blocking work (DB, HTTP, graph rebuilds) always goes to a thread pool.
+    At most `max_concurrency` jobs run at once, the rest wait in a queue.
+    """
+
+    def __init__(
+        self,
+        dijkstra: DijkstraAlgorithm,
+        mode: Optional[str] = None,
+        workers: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        shared_store: Optional[SharedGraphStore] = None,
+    ):
+        self.dijkstra = dijkstra
+        self.shared_store = shared_store
+        self.mode = mode or os.getenv("ROUTING_EXECUTOR", "thread")
+        if self.mode not in ("thread", "process"):
+            raise ValueError(f"Unknown executor mode: {self.mode}")
+
+        self.workers = workers or int(
+            os.getenv("ROUTING_WORKERS", str(min(4, os.cpu_count() or 1)))
+        )
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("ROUTING_MAX_CONCURRENCY", str(self.workers * 2))
+        )
+
+        self._thread_pool = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="routing"
+        )
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        # The pool, its weight update log and the batches logged so far,
+        # swapped as one so a search never pairs a pool with another's count
+        self._snapshot_state: Tuple[
+            Optional[ProcessPoolExecutor], Optional[IO[str]], int
+        ] = (None, None, 0)
+        # Replaced pools and the paths of their update logs
+        self._retired_pools: Deque[Tuple[ProcessPoolExecutor, str]] = deque()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_debouncer = Debouncer(
+            self.refresh_snapshot, SNAPSHOT_DELAY, "routing-snapshot"
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.metrics = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "queued": 0,
+            "active": 0,
+            "max_queued": 0,
+            "total_queue_wait": 0.0,
+            "max_queue_wait": 0.0,
+            "total_run_time": 0.0,
+            "snapshots": 0,
+        }
+
+    def _search_pool(self) -> Executor:
+        if self.mode == "thread":
+            return self._thread_pool
+        if self._process_pool is None:
+            self.refresh_snapshot()
+        return self._process_pool
+
+    def refresh_snapshot(self):
+        """
+        Give process workers a fresh copy of the graph after it changed.
+        A new pool is started with the new snapshot and swapped in; jobs already
+        running on the old pool finish against the old snapshot. At most
+        MAX_RETIRED_POOLS old pools are left running.
+        """
+        if self.mode != "process":
+            return
+        if self.shared_store is not None:
+            # Workers attached to the shared graph pick up new versions themselves
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_init_worker,
+                    initargs=(None, self.shared_store.directory),
+                )
+            return
+        expired = []
+        with self._snapshot_lock:
+            # list() copies the items at once, edits from other threads
+            # can't change the dict mid-copy
+            snapshot = {
+                node: list(edges) for node, edges in list(self.dijkstra.graph.items())
+            }
+            update_log = tempfile.NamedTemporaryFile(
+                "w", prefix="routing-updates-", suffix=".jsonl", delete=False
+            )
+            old_pool, old_log, _ = self._snapshot_state
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(snapshot, None, update_log.name),
+            )
+            self._snapshot_state = (self._process_pool, update_log, 0)
+            self.metrics["snapshots"] += 1
+            if old_pool is not None:
+                old_pool.shutdown(wait=False)
+                old_log.close()
+                self._retired_pools.append((old_pool, old_log.name))
+            while len(self._retired_pools) > MAX_RETIRED_POOLS:
+                expired.append(self._retired_pools.popleft())
+        # Waited for outside the lock, weight updates need it meanwhile
+        for pool, log_path in expired:
+            pool.shutdown(wait=True)
+            _remove(log_path)
+
+    def schedule_snapshot(self):
+        """
+        refresh_snapshot after a small edit, on a background thread and once
+        per burst of edits (ROUTING_SNAPSHOT_DELAY). Until then process
+        workers keep answering from the previous snapshot.
+        """
+        if self.mode == "process" and self.shared_store is None:
+            self._snapshot_debouncer.trigger()
+
+    def update_edge_weights(self, updates: List[Tuple[str, str, float]]):
+        """
+        Pass (source, target, weight) updates already applied to self.dijkstra
+        on to process workers without a new snapshot: they are appended to the
+        snapshot's update log, and each worker applies the batches it hasn't
+        seen before its next search. After MAX_LOGGED_UPDATES batches the log
+        is folded into a new snapshot in the background.
+        """
+        if self.mode != "process" or self.shared_store is not None or not updates:
+            return
+        with self._snapshot_lock:
+            pool, update_log, logged = self._snapshot_state
+            if pool is None:
+                # The first snapshot will copy the graph with these weights
+                return
+            update_log.write(json.dumps(updates) + "\n")
+            update_log.flush()
+            logged += 1
+            self._snapshot_state = (pool, update_log, logged)
+        if logged >= MAX_LOGGED_UPDATES:
+            self.schedule_snapshot()
+
+    async def _submit(self, pool: Executor, fn: Callable, *args) -> Any:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        metrics = self.metrics
+        metrics["submitted"] += 1
+        metrics["queued"] += 1
+        metrics["max_queued"] = max(metrics["max_queued"], metrics["queued"])
+        queued_at = time.perf_counter()
+
+        async with self._semaphore:
+            wait = time.perf_counter() - queued_at
+            metrics["queued"] -= 1
+            metrics["active"] += 1
+            metrics["total_queue_wait"] += wait
+            metrics["max_queue_wait"] = max(metrics["max_queue_wait"], wait)
+
+            started_at = time.perf_counter()
+            try:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(pool, fn, *args)
+                metrics["completed"] += 1
+                return result
+            except Exception:
+                metrics["failed"] += 1
+                raise
+            finally:
+                metrics["active"] -= 1
+                metrics["total_run_time"] += time.perf_counter() - started_at
+
+    async def search(self, method: str, *args, **kwargs) -> Any:
+        """Run a DijkstraAlgorithm method (e.g. find_shortest_path) in the search pool"""
+        if self.mode == "process":
+            pool, logged = self._search_pool(), 0
+            if self.shared_store is None:
+                pool, _, logged = self._snapshot_state
+            return await self._submit(
+                pool, _search_in_worker, method, args, kwargs, logged
+            )
+        bound = getattr(self.dijkstra, method)
+        return await self.run_blocking(bound, *args, **kwargs)
+
+    async def run_blocking(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable (DB, HTTP, graph rebuild) in the thread pool"""
+        # Copy the context so contextvars set by the request (e.g. its profile)
+        # are visible in the thread
+        ctx = contextvars.copy_context()
+        return await self._submit(
+            self._thread_pool, lambda: ctx.run(profiling.call, fn, *args, **kwargs)
+        )
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Snapshot of the pool configuration and queueing metrics"""
+        metrics = dict(self.metrics)
+        finished = metrics["completed"] + metrics["failed"]
+        started = finished + metrics["active"]
+        metrics["avg_queue_wait"] = (
+            metrics["total_queue_wait"] / started if started else 0.0
+        )
+        metrics["avg_run_time"] = (
+            metrics["total_run_time"] / finished if finished else 0.0
+        )
+        metrics.update(
+            {
+                "mode": self.mode,
+                "workers": self.workers,
+                "max_concurrency": self.max_concurrency,
+                "retired_pools": len(self._retired_pools),
+            }
+        )
+        return metrics
+
+    def shutdown(self):
+        self._snapshot_debouncer.cancel()
+        self._thread_pool.shutdown(wait=False)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False)
+        _, update_log, _ = self._snapshot_state
+        if update_log is not None:
+            update_log.close()
+            _remove(update_log.name)
+        for _, log_path in self._retired_pools:
+            _remove(log_path)
@@ -1,4 +1,4 @@
-import { MapContainer, TileLayer, Marker, Popup, Polyline, useMapEvents } from 'react-leaflet';
+import { MapContainer, TileLayer, Marker, Popup, Polyline, CircleMarker, Tooltip as MapTooltip, useMapEvents } from 'react-leaflet';
 import { IconButton, Box, Typography, TextField, Button, Switch, FormControlLabel, Tooltip, CircularProgress, Slider } from '@mui/material';
 import DeleteIcon from '@mui/icons-material/Delete';
 import CloseIcon from '@mui/icons-material/Close';
@@ -6,6 +6,7 @@ import axios from 'axios';
 import 'leaflet/dist/leaflet.css';
 import { useState, useEffect } from 'react';
 import { useTranslation } from 'react-i18next';
+import { fetchViewportPages } from '../utils/viewport';
 
 function MapClickHandler({ onMapClick }) {
   useMapEvents({
@@ -16,6 +17,16 @@ function MapClickHandler({ onMapClick }) {
   return null;
 }
 
+function ViewportHandler({ onViewportChange }) {
+  const map = useMapEvents({
+    moveend: () => onViewportChange({ bounds: map.getBounds(), zoom: map.getZoom() }),
+  });
+  useEffect(() => {
+    onViewportChange({ bounds: map.getBounds(), zoom: map.getZoom() });
+  }, [map]);
+  return null;
+}
+
 function Map({ nodes, selectedPath, onNodeDelete, onNodeAdd, isLoading }) {
   const { t } = useTranslation();
   const center = [45.9432, 24.9668]; // Center of Romania
@@ -28,12 +39,31 @@ function Map({ nodes, selectedPath, onNodeDelete, onNodeAdd, isLoading }) {
   const [isUpdatingK, setIsUpdatingK] = useState(false);
   const [debouncedKValue, setDebouncedKValue] = useState(3);
   const [lastUpdatedK, setLastUpdatedK] = useState(3); // Add this to track the last successfully updated K value
+  const [viewport, setViewport] = useState(null);
+  const [visibleNodes, setVisibleNodes] = useState({});
+  const [clusters, setClusters] = useState([]);
 
-  // Add effect to fetch edges when nodes change
+  // Only the nodes and edges in view are fetched, again whenever the map
+  // moves or the nodes change; requests for the previous viewport are cancelled
   useEffect(() => {
-    console.log('Nodes changed, fetching edges...');
-    fetchEdges();
-  }, [nodes]);
+    if (!viewport) return;
+    const controller = new AbortController();
+    fetchVisibleNodes(controller.signal);
+    if (showAllEdges) fetchEdges(controller.signal);
+    return () => controller.abort();
+  }, [nodes, viewport, showAllEdges]);
+
+  const fetchVisibleNodes = async (signal) => {
+    try {
+      const zoom = Math.round(viewport.zoom);
+      const pages = await fetchViewportPages('http://localhost:8000/nodes/', viewport.bounds, { zoom }, { signal });
+      setVisibleNodes(Object.assign({}, ...pages.map(page => page.nodes)));
+      setClusters(pages.flatMap(page => page.clusters));
+    } catch (error) {
+      if (axios.isCancel(error)) return;
+      console.error('Error fetching nodes:', error);
+    }
+  };
 
   // Add debounce effect for K value updates
   useEffect(() => {
@@ -90,13 +120,16 @@ function Map({ nodes, selectedPath, onNodeDelete, onNodeAdd, isLoading }) {
     console.log('Edges updated:', allEdges);
   }, [allEdges]);
 
-  const fetchEdges = async () => {
+  const fetchEdges = async (signal) => {
+    if (!viewport) return null;
     try {
-      const response = await axios.get('http://localhost:8000/edges/');
-      console.log('Fetched edges:', response.data);
-      setAllEdges(response.data);
-      return response.data;
+      const pages = await fetchViewportPages('http://localhost:8000/edges/', viewport.bounds, {}, { signal });
+      const edges = pages.flatMap(page => page.edges);
+      console.log('Fetched edges:', edges);
+      setAllEdges(edges);
+      return edges;
     } catch (error) {
+      if (axios.isCancel(error)) return null;
       console.error('Error fetching edges:', error);
       return null;
     }
@@ -361,6 +394,7 @@ function Map({ nodes, selectedPath, onNodeDelete, onNodeAdd, isLoading }) {
           attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
         />
         <MapClickHandler onMapClick={handleMapClick} />
+        <ViewportHandler onViewportChange={setViewport} />
         
         {/* Draw all edges if enabled */}
         {showAllEdges && allEdges.map((edge, index) => {
@@ -410,8 +444,21 @@ function Map({ nodes, selectedPath, onNodeDelete, onNodeAdd, isLoading }) {
           />
         )}
 
+        {/* Draw clusters of nodes too close to tell apart at this zoom */}
+        {clusters.map((cluster) => (
+          <CircleMarker
+            key={`cluster-${cluster.latitude}-${cluster.longitude}`}
+            center={[cluster.latitude, cluster.longitude]}
+            radius={Math.min(10 + Math.log2(cluster.count) * 3, 30)}
+            color="#1976d2"
+            fillOpacity={0.5}
+          >
+            <MapTooltip permanent direction="center">{cluster.count}</MapTooltip>
+          </CircleMarker>
+        ))}
+
         {/* Draw nodes */}
-        {Object.entries(nodes).map(([name, coords]) => (
+        {Object.entries(visibleNodes).map(([name, coords]) => (
           <Marker
             key={name}
             position={[coords[0], coords[1]]}
@@ -13,8 +13,8 @@ import {
   Tab
 } from '@mui/material';
 import SendIcon from '@mui/icons-material/Send';
-import axios from 'axios';
 import { useTranslation } from 'react-i18next';
+import { streamNlpPath } from '../utils/nlpStream';
 
 function TypingIndicator() {
   return (
@@ -77,6 +77,34 @@ function NLPPathFinder({ nodes, selectedPath, onPathFound, onLoadingChange }) {
     scrollToBottom();
   }, [messages]);
 
+  // Streams an /nlp-path/ query: the route is shown as soon as it is computed,
+  // tourist info is merged in node by node as it arrives.
+  const runNlpQuery = async (body) => {
+    let route = null;
+    let reply = null;
+
+    await streamNlpPath(body, (event) => {
+      if (event.type === 'route') {
+        route = { path: event.path, distance: event.distance, tourist_info: {} };
+        onPathFound(route, {
+          text: t('routeInfo.title') + ': ' + event.path.join(' → '),
+          distance: event.distance
+        });
+      } else if (event.type === 'tourist_info' && route) {
+        route = { ...route, tourist_info: { ...route.tourist_info, [event.node]: event.info } };
+        onPathFound(route);
+      } else if (event.type === 'response' || event.type === 'message') {
+        reply = event.response || event.message;
+      } else if (event.type === 'error') {
+        const error = new Error(event.detail);
+        error.response = { data: { detail: event.detail } };
+        throw error;
+      }
+    });
+
+    return { route, reply };
+  };
+
   useEffect(() => {
     if (selectedPath && selectedPath.path && selectedPath.distance) {
       const { path, distance } = selectedPath;
@@ -109,25 +137,17 @@ function NLPPathFinder({ nodes, selectedPath, onPathFound, onLoadingChange }) {
     setMessages([]);
     
     try {
-      const response = await axios.post('http://localhost:8000/nlp-path/', { 
+      const { route, reply } = await runNlpQuery({
         query: t('nlpPathFinder.getRecommendations'),
         current_route: selectedPath
       });
-      
-      const { path, distance, tourist_info, message } = response.data;
-      
-      if (!path || path.length === 0 || !distance) {
+
+      if (!route) {
         setMessages([{
           type: 'assistant',
-          content: message || t('nlpPathFinder.calculateRouteFirst')
+          content: reply || t('nlpPathFinder.calculateRouteFirst')
         }]);
-        return;
       }
-      
-      onPathFound({ path, distance, tourist_info }, {
-        text: t('routeInfo.title') + ': ' + path.join(' → '),
-        distance: distance
-      });
     } catch (error) {
       setMessages([{
         type: 'assistant',
@@ -156,25 +176,16 @@ function NLPPathFinder({ nodes, selectedPath, onPathFound, onLoadingChange }) {
     setMessages(prev => [...prev, { type: 'typing' }]);
 
     try {
-      const response = await axios.post('http://localhost:8000/nlp-path/', {
+      // A new route, if any, is pushed to the map by runNlpQuery as it streams in
+      const { reply } = await runNlpQuery({
         query: userMessage,
         current_route: selectedPath,
         language: i18n.language
       });
 
-      const { path, distance, tourist_info, response: aiResponse } = response.data;
-
-      // If we got a new route, update it
-      if (path && path.length > 0 && distance) {
-        onPathFound({ path, distance, tourist_info }, {
-          text: t('routeInfo.title') + ': ' + path.join(' → '),
-          distance: distance
-        });
-      }
-
       setMessages(prev => prev.filter(msg => msg.type !== 'typing').concat({
         type: 'assistant',
-        content: aiResponse || response.data.message || t('nlpPathFinder.errorProcessingRequest')
+        content: reply || t('nlpPathFinder.errorProcessingRequest')
       }));
     } catch (error) {
       setMessages(prev => prev.filter(msg => msg.type !== 'typing').concat({
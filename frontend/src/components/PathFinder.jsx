@@ -3,6 +3,7 @@ import { TextField, Button, Box, Typography, Autocomplete, CircularProgress, But
 import ClearIcon from '@mui/icons-material/Clear';
 import axios from 'axios';
 import { useTranslation } from 'react-i18next';
+import { decodePolyline } from '../utils/polyline';
 
 function PathFinder({ nodes, onPathFound, onError, onLoadingChange, formState, onFormStateChange }) {
   const { t } = useTranslation();
@@ -44,10 +45,12 @@ function PathFinder({ nodes, onPathFound, onError, onLoadingChange, formState, o
         start: formState.start,
         end: formState.end,
         waypoints: formState.waypoints.length > 0 ? formState.waypoints : undefined,
-        avoid: formState.avoid.length > 0 ? formState.avoid : undefined
+        avoid: formState.avoid.length > 0 ? formState.avoid : undefined,
+        geometry: 'polyline'
       });
       
-      const { path, distance, duration, route_info, node_sequence } = response.data;
+      const { distance, duration, route_info, node_sequence } = response.data;
+      const path = decodePolyline(response.data.path);
       setResult({ path, distance, duration, route_info, node_sequence });
       onPathFound({ 
         path: node_sequence, 
@@ -0,0 +1,39 @@
+// Reads the NDJSON event stream returned by /nlp-path/stream and calls
+// onEvent for every event as soon as its line arrives.
+export async function streamNlpPath(body, onEvent) {
+  const response = await fetch('http://localhost:8000/nlp-path/stream', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body)
+  });
+
+  if (!response.ok) {
+    const data = await response.json().catch(() => ({}));
+    const error = new Error(data.detail || response.statusText);
+    error.response = { status: response.status, data };
+    throw error;
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let newline;
+    while ((newline = buffer.indexOf('\n')) >= 0) {
+      const line = buffer.slice(0, newline).trim();
+      buffer = buffer.slice(newline + 1);
+      if (line) {
+        onEvent(JSON.parse(line));
+      }
+    }
+  }
+
+  if (buffer.trim()) {
+    onEvent(JSON.parse(buffer));
+  }
+}
@@ -0,0 +1,27 @@
+// Decodes an encoded polyline (precision 5, as returned by /path/ with
+// geometry: 'polyline') into [lat, lon] pairs.
+export function decodePolyline(encoded) {
+  const points = [];
+  let index = 0;
+  let lat = 0;
+  let lon = 0;
+
+  const next = () => {
+    let result = 0;
+    let shift = 0;
+    let byte;
+    do {
+      byte = encoded.charCodeAt(index++) - 63;
+      result |= (byte & 0x1f) << shift;
+      shift += 5;
+    } while (byte >= 0x20);
+    return result & 1 ? ~(result >> 1) : result >> 1;
+  };
+
+  while (index < encoded.length) {
+    lat += next();
+    lon += next();
+    points.push([lat / 1e5, lon / 1e5]);
+  }
+  return points;
+}
@@ -0,0 +1,24 @@
+import axios from 'axios';
+
+// A dense viewport stops after this many pages instead of downloading every node
+export const MAX_VIEWPORT_PAGES = 3;
+
+// Fetches the pages of a /nodes/ or /edges/ query for the visible map area,
+// at most maxPages of them. Passing the signal of an AbortController cancels
+// the request in flight once the viewport has moved on.
+export async function fetchViewportPages(url, bounds, params = {}, { signal, maxPages = MAX_VIEWPORT_PAGES } = {}) {
+  const bbox = [
+    bounds.getSouth(),
+    bounds.getWest(),
+    bounds.getNorth(),
+    bounds.getEast()
+  ].join(',');
+  const pages = [];
+  let cursor;
+  do {
+    const response = await axios.get(url, { params: { ...params, bbox, cursor }, signal });
+    pages.push(response.data);
+    cursor = response.data.next_cursor;
+  } while (cursor && pages.length < maxPages);
+  return pages;
+}